@@ -0,0 +1,45 @@
+"""Script para listar e restaurar snapshots do cache de respostas.
+
+Uso:
+    python restore_cache.py --list
+    python restore_cache.py                 # restaura o snapshot mais recente
+    python restore_cache.py data/response_cache.backup.<timestamp>.db
+
+Pare a API antes de restaurar: cada worker mantém o índice do cache em memória.
+"""
+
+import argparse
+import sys
+
+from src.services.cache_service import CacheService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Restaura o cache de respostas a partir de um snapshot")
+    parser.add_argument("backup", nargs="?", help="Arquivo do snapshot (padrão: o mais recente)")
+    parser.add_argument("--list", action="store_true", help="Lista os snapshots disponíveis")
+    parser.add_argument("--cache-file", help="Banco do cache (padrão: data/response_cache.db)")
+    args = parser.parse_args()
+
+    cache_service = CacheService(args.cache_file)
+
+    if args.list:
+        backups = cache_service.list_backups()
+        if not backups:
+            print(f"[!] Nenhum snapshot em {cache_service.cache_file.parent}")
+        for backup in backups:
+            print(f"     - {backup}")
+        return 0
+
+    try:
+        restored = cache_service.restore_backup(args.backup)
+    except FileNotFoundError as e:
+        print(f"[ERRO] {e}")
+        return 1
+
+    print(f"[OK] Cache restaurado de {restored}: {len(cache_service.get_all_entries())} entradas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
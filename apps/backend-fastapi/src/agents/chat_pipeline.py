@@ -1,15 +1,10 @@
 from __future__ import annotations
 
-from typing import Any, AsyncIterator
+from typing import TYPE_CHECKING, Any, AsyncIterator
 
-# LangChain 1.0 - imports atualizados
-try:
-    from langchain_community.agent_toolkits import create_sql_agent
+# Só para anotação: importar o LangChain aqui pesava no import da API
+if TYPE_CHECKING:
     from langchain_core.language_models import BaseLanguageModel
-except ImportError:
-    # Fallback se não estiver disponível
-    create_sql_agent = None
-    BaseLanguageModel = Any
 
 from src.connectors.rag_document_store import RAGDocumentStore
 from src.domain.query_session import QuerySession
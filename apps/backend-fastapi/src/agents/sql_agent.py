@@ -1,26 +1,172 @@
 from __future__ import annotations
 
+import asyncio
+import re
+import threading
+import time
+from contextlib import aclosing, nullcontext
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, List, Optional, Sequence, Set
 import logging
 
-# LangChain 1.0 - imports atualizados
-try:
-    from langchain_community.agent_toolkits import create_sql_agent
-    from langchain_community.utilities import SQLDatabase
+# LangChain é importado sob demanda (_load_langchain): o toolkit SQL do
+# langchain_community leva ~0.7s para importar e não deve atrasar o startup da
+# API. Os nomes ficam no módulo (e podem ser substituídos com patch nos testes).
+create_sql_agent = None
+SQLDatabase = None
+get_usage_metadata_callback = None
+HumanMessage = SystemMessage = None
+
+if TYPE_CHECKING:
     from langchain_core.language_models import BaseLanguageModel
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    create_sql_agent = None
-    SQLDatabase = None
-    BaseLanguageModel = Any
-    ChatOpenAI = None
-
-from src.database import db
+
+
+def _load_langchain() -> None:
+    """Importa o toolkit SQL e as mensagens do LangChain, se ainda não carregados."""
+    global create_sql_agent, SQLDatabase, get_usage_metadata_callback, HumanMessage, SystemMessage
+    if create_sql_agent is None or SQLDatabase is None:
+        try:
+            from langchain_community.agent_toolkits import create_sql_agent as _create_sql_agent
+            from langchain_community.utilities import SQLDatabase as _SQLDatabase
+        except ImportError:
+            pass
+        else:
+            create_sql_agent = create_sql_agent or _create_sql_agent
+            SQLDatabase = SQLDatabase or _SQLDatabase
+    if HumanMessage is None or get_usage_metadata_callback is None:
+        try:
+            from langchain_core.callbacks import get_usage_metadata_callback as _usage_callback
+            from langchain_core.messages import HumanMessage as _HumanMessage, SystemMessage as _SystemMessage
+        except ImportError:
+            pass
+        else:
+            get_usage_metadata_callback = get_usage_metadata_callback or _usage_callback
+            HumanMessage, SystemMessage = _HumanMessage, _SystemMessage
+
+from src.database import QueryResult, Row, db
 from src.config import settings
+from src.observability.metrics import llm_metrics
+from src.services.schema_context_builder import SchemaContext, SchemaContextBuilder, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# Tabelas expostas ao SQLAgent e a descrição enviada ao LLM no lugar da reflexão
+INCLUDE_TABLES = ['leitos', 'especialidades', 'atendimentos']
+
+CUSTOM_TABLE_INFO = {
+    "leitos": """
+    Tabela de leitos hospitalares. Contém informações sobre leitos de UTI e enfermaria.
+    Colunas principais:
+    - leito_id: ID único do leito
+    - setor: Setor do leito (UTI_PEDIATRICA, UTI_ADULTO, ENFERMARIA)
+    - numero: Número do leito (ex: UTI-P-01)
+    - status: Status do leito (ocupado, disponivel)
+    - tipo: Tipo do leito (UTI, ENFERMARIA)
+    
+    IMPORTANTE: Para calcular TAXA de ocupação, sempre use esta fórmula:
+    ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual
+    
+    Exemplos de queries:
+    - Taxa de ocupação da UTI pediátrica (SEMPRE retornar em %): 
+      SELECT 
+        COUNT(*) FILTER (WHERE status = 'ocupado') as ocupados, 
+        COUNT(*) as total, 
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual 
+      FROM leitos WHERE setor = 'UTI_PEDIATRICA';
+    
+    - Leitos disponíveis por setor: 
+      SELECT setor, COUNT(*) as leitos_disponiveis 
+      FROM leitos WHERE status = 'disponivel' GROUP BY setor;
+    """,
+    "atendimentos": """
+    Tabela de atendimentos/procedimentos realizados. Contém informações sobre procedimentos médicos e valores.
+    Colunas principais:
+    - atendimento_id: ID único do atendimento
+    - especialidade_id: ID da especialidade
+    - valor: Valor do procedimento (em reais)
+    - data_atendimento: Data do atendimento
+    
+    Exemplos de queries:
+    - Total faturado: SELECT SUM(valor) as total_faturado FROM atendimentos;
+    - Receita média: SELECT AVG(valor) as receita_media FROM atendimentos;
+    - Total de procedimentos: SELECT COUNT(*) as total_procedimentos FROM atendimentos;
+    """,
+    "especialidades": """
+    Tabela de especialidades médicas.
+    Colunas principais:
+    - especialidade_id: ID único da especialidade
+    - nome: Nome da especialidade
+    """
+}
+
+
+# Prompt do modo single_shot (SQL_GENERATION_MODE): uma completion, sem ferramentas
+SINGLE_SHOT_SYSTEM_PROMPT = """Você é um especialista em SQL PostgreSQL de um sistema hospitalar.
+Gere UMA única query SELECT que responda à pergunta do usuário, usando apenas as tabelas abaixo.
+Responda somente com o SQL em um bloco ```sql```, sem explicações.
+Se a pergunta não puder ser respondida com essas tabelas, responda exatamente: INFORMAÇÃO NÃO DISPONÍVEL
+
+Tabelas disponíveis:
+{table_info}"""
+
+# Comandos aceitos por validate() e pelo single_shot (CTEs que alteram dados caem nas palavras bloqueadas)
+_READ_QUERY_PREFIXES = ("SELECT", "WITH")
+
+# Tokens do SQL (literais, comentários, parênteses e nomes) e nomes de CTEs, para validar o SQL do single_shot
+_SQL_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|[()]|[a-zA-Z_][\w.]*", re.DOTALL)
+_SQL_CTE_RE = re.compile(r"\b([a-zA-Z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def _strip_comment_lines(sql: str) -> str:
+    """Remove as linhas de comentário (``--``) do SQL."""
+    return "\n".join(line for line in sql.split("\n") if not line.strip().startswith("--")).strip()
+
+
+def _referenced_tables(sql: str) -> Set[str]:
+    """Tabelas após FROM/JOIN em nível de query.
+
+    O FROM dentro de chamadas de função (``EXTRACT(YEAR FROM data)``,
+    ``SUBSTRING(nome FROM 2)``, ``TRIM(BOTH FROM nome)``) não é tabela: só conta
+    quando o parêntese mais interno é a própria query ou uma subquery.
+    """
+    tables: Set[str] = set()
+    is_query = [True]  # um nível por parêntese aberto; o nível 0 é a query
+    just_opened = False
+    previous = None
+    for token in _SQL_TOKEN_RE.findall(sql):
+        if token.startswith(("'", "--", "/*")):
+            continue
+        if token == "(":
+            is_query.append(False)
+            just_opened, previous = True, None
+            continue
+        if token == ")":
+            if len(is_query) > 1:
+                is_query.pop()
+            just_opened, previous = False, None
+            continue
+        word = token.upper()
+        if just_opened:
+            is_query[-1] = word in _READ_QUERY_PREFIXES
+            just_opened = False
+        if previous in ("FROM", "JOIN") and is_query[-1]:
+            tables.add(token.split(".")[-1].lower())
+        previous = word
+    return tables
+
+# Recebe os passos intermediários da geração de SQL (ver _progress_from_event)
+ProgressCallback = Callable[[dict], None]
+
+# Tabelas relevantes da pergunta em andamento (ver _scope_table_names); None = todas as expostas
+_agent_table_scope: ContextVar[Optional[tuple]] = ContextVar("sql_agent_table_scope", default=None)
+
+# Ferramentas do agente SQL cuja entrada é o SQL rascunhado
+_SQL_DRAFT_TOOLS = ("sql_db_query_checker", "sql_db_query")
+
+# Construções que impedem um SELECT de rodar na réplica de leitura
+REPLICA_UNSAFE_PATTERNS = ("FOR SHARE", "FOR KEY SHARE", "NEXTVAL(", "SETVAL(", "PG_ADVISORY", " INTO ")
+
 
 @dataclass
 class SQLSuggestion:
@@ -31,7 +177,7 @@ class SQLSuggestion:
 
 @dataclass
 class SQLResult:
-    data: List[dict]
+    data: QueryResult
     row_count: int
     sql_executed: str
 
@@ -39,7 +185,17 @@ class SQLResult:
 class SQLAgentService:
     """Serviço para sugestão e execução de SQL com LangChain."""
 
+    # SQLDatabase do LangChain compartilhado pelo processo (engine SQLAlchemy,
+    # metadata refletida e table info renderado), recriado quando o schema muda
+    _shared_sql_db = None
+    _shared_sql_db_version: Optional[str] = None
+    _shared_sql_db_lock = threading.Lock()
+    # Um agente pronto por provedor: provider_id -> (llm, sql_db, agente)
+    _agents: dict[str, tuple[Any, Any, Any]] = {}
+    _agents_lock = threading.Lock()
+
     def __init__(self, llm: BaseLanguageModel | None = None, db_conn: Any = None):
+        _load_langchain()
         self.llm = llm
         self.db_conn = db_conn
         self.sql_agent = None
@@ -50,81 +206,175 @@ class SQLAgentService:
         if llm and db_conn:
             self._initialize_agent()
 
-    def _initialize_agent(self):
-        """Inicializa SQLAgent do LangChain com prompt customizado e contexto melhorado."""
-        if not create_sql_agent or not SQLDatabase:
-            return
-        
-        # Se o LLM mudou, precisa reinicializar
-        if self._initialized_llm != self.llm:
-            self.sql_agent = None
-            self.sql_db = None
-        
-        try:
+    @classmethod
+    def get_shared_sql_db(cls):
+        """Retorna o SQLDatabase compartilhado, recriando-o se a versão do schema mudou.
+
+        ``SQLDatabase.from_uri`` cria uma engine nova e reflete as tabelas; feito
+        uma vez por processo em vez de a cada request.
+        """
+        from src.services.schema_detector_service import SchemaDetectorService
+
+        version = SchemaDetectorService.get_schema_version()
+        with cls._shared_sql_db_lock:
+            current = cls._shared_sql_db
+            # Versão ainda desconhecida (schema não detectado) não invalida o que já existe
+            if current is not None and (version is None or cls._shared_sql_db_version in (None, version)):
+                cls._shared_sql_db_version = version or cls._shared_sql_db_version
+                return current
+
             # Ajusta URI para usar driver psycopg (v3) em vez de psycopg2
             db_uri = settings.DATABASE_URL
             if db_uri.startswith("postgresql://"):
                 db_uri = db_uri.replace("postgresql://", "postgresql+psycopg://", 1)
 
-            # Cria SQLDatabase do LangChain com mais informações
-            self.sql_db = SQLDatabase.from_uri(
+            started = time.perf_counter()
+            sql_db = SQLDatabase.from_uri(
                 db_uri,
-                include_tables=['leitos', 'especialidades', 'atendimentos'],
+                engine_args={
+                    # O agente faz poucas queries por request: o ping por checkout
+                    # é barato perto da chamada ao LLM e evita conexões mortas do NeonDB
+                    "pool_pre_ping": True,
+                    "pool_recycle": int(settings.DB_POOL_MAX_LIFETIME),
+                },
+                include_tables=INCLUDE_TABLES,
                 sample_rows_in_table_info=3,  # Mostra exemplos de dados
-                custom_table_info={
-                    "leitos": """
-                    Tabela de leitos hospitalares. Contém informações sobre leitos de UTI e enfermaria.
-                    Colunas principais:
-                    - leito_id: ID único do leito
-                    - setor: Setor do leito (UTI_PEDIATRICA, UTI_ADULTO, ENFERMARIA)
-                    - numero: Número do leito (ex: UTI-P-01)
-                    - status: Status do leito (ocupado, disponivel)
-                    - tipo: Tipo do leito (UTI, ENFERMARIA)
-                    
-                    IMPORTANTE: Para calcular TAXA de ocupação, sempre use esta fórmula:
-                    ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual
-                    
-                    Exemplos de queries:
-                    - Taxa de ocupação da UTI pediátrica (SEMPRE retornar em %): 
-                      SELECT 
-                        COUNT(*) FILTER (WHERE status = 'ocupado') as ocupados, 
-                        COUNT(*) as total, 
-                        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual 
-                      FROM leitos WHERE setor = 'UTI_PEDIATRICA';
-                    
-                    - Leitos disponíveis por setor: 
-                      SELECT setor, COUNT(*) as leitos_disponiveis 
-                      FROM leitos WHERE status = 'disponivel' GROUP BY setor;
-                    """,
-                    "atendimentos": """
-                    Tabela de atendimentos/procedimentos realizados. Contém informações sobre procedimentos médicos e valores.
-                    Colunas principais:
-                    - atendimento_id: ID único do atendimento
-                    - especialidade_id: ID da especialidade
-                    - valor: Valor do procedimento (em reais)
-                    - data_atendimento: Data do atendimento
-                    
-                    Exemplos de queries:
-                    - Total faturado: SELECT SUM(valor) as total_faturado FROM atendimentos;
-                    - Receita média: SELECT AVG(valor) as receita_media FROM atendimentos;
-                    - Total de procedimentos: SELECT COUNT(*) as total_procedimentos FROM atendimentos;
-                    """,
-                    "especialidades": """
-                    Tabela de especialidades médicas.
-                    Colunas principais:
-                    - especialidade_id: ID único da especialidade
-                    - nome: Nome da especialidade
-                    """
-                }
+                custom_table_info=CUSTOM_TABLE_INFO,
             )
-            
+            cls._memoize_table_info(sql_db)
+            cls._scope_table_names(sql_db)
+            cls._shared_sql_db = sql_db
+            cls._shared_sql_db_version = version
+            print(
+                f"[sql_agent] SQLDatabase compartilhado criado em {1000 * (time.perf_counter() - started):.0f}ms "
+                f"(schema {version or 'não detectado'})"
+            )
+
+        if current is not None:
+            # Agentes já criados podem continuar usando a engine antiga; dispose só fecha o pool ocioso
+            try:
+                current._engine.dispose()
+            except Exception:
+                pass
+        return sql_db
+
+    @staticmethod
+    def _memoize_table_info(sql_db) -> None:
+        """Memoiza ``get_table_info`` da instância: o resultado só muda com o schema."""
+        original = sql_db.get_table_info
+        rendered: dict = {}
+
+        def get_table_info(table_names=None):
+            key = tuple(sorted(table_names)) if table_names else None
+            if key not in rendered:
+                rendered[key] = original(table_names)
+            return rendered[key]
+
+        sql_db.get_table_info = get_table_info
+
+    @staticmethod
+    def _scope_table_names(sql_db) -> None:
+        """Restringe ao escopo da pergunta (``_agent_table_scope``) as tabelas que o agente vê.
+
+        ``sql_db_list_tables`` e o schema sem tabelas explícitas passam a trazer
+        só as tabelas relevantes, como o contexto do single_shot. O schema de
+        uma tabela exposta pedida pelo nome continua disponível, para o agente
+        se recuperar se a seleção deixou de fora uma tabela necessária.
+        """
+        usable_table_names = sql_db.get_usable_table_names
+        table_info = sql_db.get_table_info
+
+        def get_usable_table_names():
+            names = usable_table_names()
+            scope = _agent_table_scope.get()
+            return [name for name in names if name in scope] if scope else names
+
+        def get_table_info(table_names=None):
+            scope = _agent_table_scope.get()
+            # A validação dos nomes pedidos usa todas as tabelas expostas
+            token = _agent_table_scope.set(None)
+            try:
+                return table_info(table_names or (list(scope) if scope else None))
+            finally:
+                _agent_table_scope.reset(token)
+
+        sql_db.get_usable_table_names = get_usable_table_names
+        sql_db.get_table_info = get_table_info
+
+    @classmethod
+    def reset_shared_sql_db(cls) -> None:
+        """Descarta o SQLDatabase compartilhado (testes / troca de DATABASE_URL)."""
+        with cls._shared_sql_db_lock:
+            cls._shared_sql_db = None
+            cls._shared_sql_db_version = None
+
+    @classmethod
+    def get_agent(cls, llm: BaseLanguageModel, sql_db=None):
+        """Retorna o agente pré-construído do provedor de ``llm``, criando-o uma vez se preciso.
+
+        O agente é reaproveitado enquanto a instância do LLM e o SQLDatabase
+        compartilhado forem os mesmos; trocar de provedor vira um lookup no dict.
+        """
+        from src.services.llm_service import LLMService
+
+        sql_db = sql_db if sql_db is not None else cls.get_shared_sql_db()
+        key = LLMService.get_provider_id(llm) or f"llm-{id(llm)}"
+        with cls._agents_lock:
+            cached = cls._agents.get(key)
+            if cached is not None and cached[0] is llm and cached[1] is sql_db:
+                return cached[2]
+
             # Cria SQLAgent (o prompt customizado será adicionado via enhance_prompt)
-            self.sql_agent = create_sql_agent(
-                llm=self.llm,
-                db=self.sql_db,
+            agent = create_sql_agent(
+                llm=llm,
+                db=sql_db,
                 verbose=True,
                 agent_type="openai-tools"
             )
+            cls._agents[key] = (llm, sql_db, agent)
+            print(f"[sql_agent] Agente SQL construído para o provedor {key}")
+            return agent
+
+    @classmethod
+    def prebuild_agents(cls) -> int:
+        """Constrói (no startup) um agente para cada provedor com instância de LLM; retorna quantos."""
+        _load_langchain()
+        if not create_sql_agent or not SQLDatabase:
+            return 0
+        from src.services.llm_service import LLMService
+
+        built = 0
+        sql_db = cls.get_shared_sql_db()
+        for provider_id, llm in list(LLMService._llm_instances.items()):
+            try:
+                cls.get_agent(llm, sql_db)
+                built += 1
+            except Exception as e:
+                print(f"[sql_agent] Falha ao pré-construir agente para {provider_id}: {e}")
+        return built
+
+    @classmethod
+    def reset_agents(cls) -> None:
+        """Descarta os agentes pré-construídos (testes / troca de provedores)."""
+        with cls._agents_lock:
+            cls._agents.clear()
+
+    def _initialize_agent(self):
+        """Inicializa SQLAgent do LangChain com prompt customizado e contexto melhorado."""
+        if not create_sql_agent or not SQLDatabase:
+            return
+        
+        # Se o LLM mudou, precisa reinicializar
+        if self._initialized_llm != self.llm:
+            self.sql_agent = None
+            self.sql_db = None
+        
+        try:
+            # SQLDatabase compartilhado pelo processo (engine + metadata refletida)
+            self.sql_db = self.get_shared_sql_db()
+            
+            # Agente pré-construído do provedor (criado uma vez por processo)
+            self.sql_agent = self.get_agent(self.llm, self.sql_db)
             # Marca o LLM como inicializado
             self._initialized_llm = self.llm
         except Exception as e:
@@ -134,14 +384,32 @@ class SQLAgentService:
             self.sql_agent = None
             self._initialized_llm = None
 
-    async def suggest(self, prompt: str, tables: List[str] = None) -> SQLSuggestion:
-        """Gera SQL comentado baseado em prompt natural usando LangChain SQLAgent."""
+    async def suggest(
+        self,
+        prompt: str,
+        tables: List[str] = None,
+        hedge: bool = False,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> SQLSuggestion:
+        """Gera SQL comentado baseado em prompt natural usando LangChain SQLAgent.
+
+        Com ``hedge=True`` (ver ``LLMService.hedging_enabled``), se o provedor não
+        responder até o seu p90 a mesma geração é disparada no próximo provedor
+        saudável e vale a primeira resposta com SQL.
+
+        Com ``on_progress``, o agente é executado via ``astream_events`` e cada
+        passo intermediário (tabelas listadas, schema lido, SQL rascunhado,
+        tokens do LLM) é repassado como um dict ``{"step": ..., ...}`` assim que
+        acontece.
+        """
         
         logger.info(f"[sql_agent] 🔍 suggest() called with prompt: '{prompt[:60]}...'")
         print(f"[sql_agent] 🔍 suggest() called with prompt: '{prompt[:60]}...'")
         
         # T050-T052: Smart Detection Integration - Pre-generation analysis
         from src.config import settings
+        schema = None
+        analysis = None
         if settings.ENABLE_SMART_DETECTION:
             try:
                 from src.services.schema_detector_service import SchemaDetectorService
@@ -202,8 +470,21 @@ class SQLAgentService:
             except Exception as e:
                 print(f"[smart_detection] Error during analysis (continuing with SQL generation): {e}")
         
+        # Modo single_shot: uma completion com o schema em cache; o agente só entra
+        # se o SQL não passar na validação (ou a chamada falhar)
+        if settings.SQL_GENERATION_MODE == "single_shot" and self.llm and HumanMessage:
+            try:
+                suggestion = await self._suggest_single_shot(prompt, tables, analysis, schema, on_progress)
+                if suggestion is not None:
+                    return suggestion
+            except Exception as e:
+                logger.warning(f"[sql_agent] Single-shot falhou, usando o agente: {e}")
+                print(f"[sql_agent] ⚠️ Single-shot falhou, usando o agente: {e}")
+        
         # SEMPRE tenta usar LangChain primeiro se disponível
         if self.sql_agent:
+            # Definido antes do try: os fallbacks de provedor reutilizam a mesma poda
+            agent_tables: Optional[List[str]] = None
             try:
                 print(f"[sql_agent] Gerando SQL com LangChain SQLAgent para: '{prompt}'")
                 
@@ -216,19 +497,27 @@ class SQLAgentService:
                 # Captura SQL executado durante o processo
                 executed_sql = None
                 
-                # Invoca o SQLAgent do LangChain com timeout de 4 segundos
+                # Invoca o SQLAgent do LangChain com o timeout adaptativo do provedor
                 import asyncio
-                from src.config import settings
-                timeout_seconds = settings.LLM_REQUEST_TIMEOUT
+                from src.services.llm_service import LLMService
+                provider_id = LLMService.get_provider_id(self.llm)
+                timeout_seconds = LLMService.get_request_timeout(provider_id)
+                # Mesma poda de schema do single_shot: o agente só lista as tabelas relevantes
+                agent_tables = self._schema_context(prompt, tables, analysis, schema).tables
                 
                 # Captura SQL executado durante o processo (opcional)
                 executed_sql = None
                 
                 try:
-                    result = await asyncio.wait_for(
-                        self.sql_agent.ainvoke({"input": enhanced_prompt}),
-                        timeout=timeout_seconds
-                    )
+                    if hedge:
+                        result = await self._invoke_hedged(
+                            enhanced_prompt, timeout_seconds, on_progress, tables=agent_tables
+                        )
+                    else:
+                        result = await self._invoke_agent(
+                            self.sql_agent, provider_id, enhanced_prompt, timeout_seconds, on_progress,
+                            tables=agent_tables,
+                        )
                 except asyncio.TimeoutError:
                     raise TimeoutError(f"Timeout de {timeout_seconds}s ao gerar SQL com {self.llm.__class__.__name__}")
                 
@@ -296,35 +585,31 @@ class SQLAgentService:
                 logger.warning(f"[sql_agent] ⏱️ Timeout ao gerar SQL: {e}")
                 print(f"[sql_agent] ⏱️ Timeout ao gerar SQL: {e}")
                 # Marca o provedor como indisponível e tenta fallback
-                if self.llm:
+                from src.services.llm_service import LLMService
+                failed_provider_id = LLMService.get_provider_id(self.llm)
+                if failed_provider_id:
                     try:
-                        from src.services.llm_service import LLMService
-                        for provider_id, llm_instance in LLMService._llm_instances.items():
-                            if llm_instance == self.llm:
-                                LLMService._handle_provider_error(provider_id, e)
-                                break
+                        LLMService._handle_provider_error(failed_provider_id, e)
                     except:
                         pass
                 # Tenta fallback para outro provedor
                 try:
-                    from src.services.llm_service import LLMService
-                    failed_provider_id = None
-                    for provider_id, llm_instance in LLMService._llm_instances.items():
-                        if llm_instance == self.llm:
-                            failed_provider_id = provider_id
-                            break
                     if failed_provider_id:
                         logger.info(f"[sql_agent] 🔄 Tentando fallback após timeout de {failed_provider_id}...")
                         new_llm = LLMService.get_llm_with_fallback(failed_provider_id=failed_provider_id)
                         if new_llm and new_llm != self.llm:
                             self.llm = new_llm
-                            self._initialize_agent()
+                            self._initialize_agent()  # Lookup do agente pré-construído do provedor
                             # Tenta novamente com timeout
                             try:
                                 enhanced_prompt = self._enhance_prompt(prompt)
-                                result = await asyncio.wait_for(
-                                    self.sql_agent.ainvoke({"input": enhanced_prompt}),
-                                    timeout=timeout_seconds
+                                new_provider_id = LLMService.get_provider_id(new_llm)
+                                result = await self._invoke_agent(
+                                    self.sql_agent,
+                                    new_provider_id,
+                                    enhanced_prompt,
+                                    LLMService.get_request_timeout(new_provider_id),
+                                    tables=agent_tables,
                                 )
                                 sql_clean = self._extract_sql_from_response(str(result))
                                 if sql_clean and "SELECT" in sql_clean.upper():
@@ -355,16 +640,8 @@ class SQLAgentService:
                 # Se for erro de rate limit/quota, 404 (modelo não encontrado), ou timeout, tenta fazer fallback para outro provedor
                 if (is_rate_limit or is_not_found or is_timeout) and self.llm:
                     # Identifica qual provedor falhou
-                    failed_provider_id = None
-                    try:
-                        from src.services.llm_service import LLMService
-                        # Tenta identificar o provedor atual
-                        for provider_id, llm_instance in LLMService._llm_instances.items():
-                            if llm_instance == self.llm:
-                                failed_provider_id = provider_id
-                                break
-                    except:
-                        pass
+                    from src.services.llm_service import LLMService
+                    failed_provider_id = LLMService.get_provider_id(self.llm)
                     
                     if failed_provider_id:
                         error_type = "quota/rate limit" if is_rate_limit else ("modelo não encontrado" if is_not_found else "timeout")
@@ -378,13 +655,20 @@ class SQLAgentService:
                             if new_llm and new_llm != self.llm:
                                 logger.info(f"[sql_agent] ✅ Fallback para novo provedor LLM bem-sucedido")
                                 print(f"[sql_agent] ✅ Fallback para novo provedor LLM bem-sucedido")
-                                # Atualiza o LLM e tenta novamente
+                                # Atualiza o LLM e tenta novamente (agente do provedor já pronto)
                                 self.llm = new_llm
                                 self._initialize_agent()
                                 # Tenta novamente com o novo provedor
                                 try:
                                     enhanced_prompt = self._enhance_prompt(prompt)
-                                    result = await self.sql_agent.ainvoke({"input": enhanced_prompt})
+                                    new_provider_id = LLMService.get_provider_id(new_llm)
+                                    result = await self._invoke_agent(
+                                        self.sql_agent,
+                                        new_provider_id,
+                                        enhanced_prompt,
+                                        LLMService.get_request_timeout(new_provider_id),
+                                        tables=agent_tables,
+                                    )
                                     sql_clean = self._extract_sql_from_response(str(result))
                                     if sql_clean and "SELECT" in sql_clean.upper():
                                         logger.info(f"[sql_agent] ✅ SQL gerado com sucesso usando provedor de fallback")
@@ -415,6 +699,281 @@ class SQLAgentService:
             print(f"[sql_agent] Usando fallback mínimo...")
             return self._generate_minimal_fallback(prompt)
     
+    @staticmethod
+    def _schema_context(prompt: str, tables: Optional[List[str]] = None, analysis=None, schema=None) -> SchemaContext:
+        """Contexto de schema da pergunta: tabelas expostas relevantes, dentro do orçamento de tokens."""
+        allowed = [t for t in (tables or []) if t in INCLUDE_TABLES] or INCLUDE_TABLES
+        return SchemaContextBuilder.build(
+            prompt, allowed, descriptions=CUSTOM_TABLE_INFO, schema=schema, analysis=analysis
+        )
+
+    @staticmethod
+    def _record_token_usage(provider_id: Optional[str], usage, sent_text: str) -> None:
+        """Registra os tokens do request; sem ``usage_metadata`` do provedor, estima pelo texto enviado."""
+        if not provider_id:
+            return
+        reported = list(usage.usage_metadata.values()) if usage is not None else []
+        if reported:
+            prompt_tokens = sum(item.get("input_tokens", 0) for item in reported)
+            completion_tokens = sum(item.get("output_tokens", 0) for item in reported)
+        else:
+            prompt_tokens, completion_tokens = estimate_tokens(sent_text), 0
+        llm_metrics.record_token_usage(provider_id, prompt_tokens, completion_tokens)
+
+    @staticmethod
+    def _single_shot_problems(sql: str) -> List[str]:
+        """Motivos para rejeitar o SQL do single_shot (lista vazia = aceito)."""
+        if not sql or not _strip_comment_lines(sql).upper().startswith(_READ_QUERY_PREFIXES):
+            return ["resposta sem SELECT"]
+        if ";" in sql.strip().rstrip(";"):
+            return ["mais de um comando"]
+        ctes = {name.lower() for name in _SQL_CTE_RE.findall(sql)}
+        referenced = _referenced_tables(sql) - ctes
+        unknown = sorted(referenced - set(INCLUDE_TABLES))
+        if unknown:
+            return [f"tabelas desconhecidas: {', '.join(unknown)}"]
+        if not referenced:
+            return ["nenhuma tabela referenciada"]
+        return []
+
+    async def _suggest_single_shot(
+        self,
+        prompt: str,
+        tables: Optional[List[str]] = None,
+        analysis=None,
+        schema=None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Optional[SQLSuggestion]:
+        """Gera o SQL em uma única chamada ao LLM, sem o loop de ferramentas do agente.
+
+        Retorna None quando o SQL não valida (``suggest`` cai no agente).
+        """
+        from src.services.llm_service import LLMService
+
+        provider_id = LLMService.get_provider_id(self.llm)
+        context = self._schema_context(prompt, tables, analysis, schema)
+        if on_progress:
+            on_progress({"step": "schema_inspected", "tables": context.tables})
+        messages = [
+            SystemMessage(content=SINGLE_SHOT_SYSTEM_PROMPT.format(table_info=context.text)),
+            HumanMessage(content=self._enhance_prompt(prompt)),
+        ]
+        timeout = LLMService.get_request_timeout(provider_id)
+        started = time.perf_counter()
+        try:
+            with get_usage_metadata_callback() as usage:
+                response = await asyncio.wait_for(self.llm.ainvoke(messages), timeout=timeout)
+        except asyncio.TimeoutError:
+            if provider_id:
+                llm_metrics.record_call_timeout(provider_id, timeout)
+            raise
+        if provider_id:
+            llm_metrics.record_call_latency(provider_id, time.perf_counter() - started)
+        self._record_token_usage(provider_id, usage, "".join(str(m.content) for m in messages))
+
+        text = str(getattr(response, "content", response))
+        if self._is_unknown_response(text.lower()):
+            print(f"[sql_agent] ⚠️ Single-shot indicou que não encontrou a informação solicitada")
+            return self._generate_not_found_response(prompt)
+
+        sql = self._extract_sql_from_response(text)
+        if on_progress and sql:
+            on_progress({"step": "sql_drafted", "sql": sql})
+        problems = self._single_shot_problems(sql) or self.validate(sql)["errors"]
+        if problems:
+            print(f"[sql_agent] ⚠️ SQL do single-shot rejeitado ({'; '.join(problems)}), usando o agente")
+            return None
+        print(f"[sql_agent] ✅ SQL gerado em single-shot: {sql[:300]}...")
+        return SQLSuggestion(
+            sql=sql,
+            comments="SQL gerado em uma única chamada ao LLM (single_shot) com o schema em cache",
+            estimated_rows=None,
+        )
+
+    async def _invoke_agent(
+        self,
+        agent,
+        provider_id: Optional[str],
+        enhanced_prompt: str,
+        timeout: float,
+        on_progress: Optional[ProgressCallback] = None,
+        tables: Optional[Sequence[str]] = None,
+    ):
+        """Invoca o agente com timeout, registrando a latência da chamada no provedor.
+
+        Um timeout também entra nas latências (com o valor do timeout), para o
+        timeout adaptativo poder crescer. Com ``tables``, as ferramentas de
+        schema do agente só listam essas tabelas (ver ``_scope_table_names``).
+        """
+        started = time.perf_counter()
+        if on_progress:
+            call = self._stream_agent(agent, {"input": enhanced_prompt}, on_progress)
+        else:
+            call = agent.ainvoke({"input": enhanced_prompt})
+        # A task criada por wait_for copia o contexto: o escopo vale para todos os passos do agente
+        scope = _agent_table_scope.set(tuple(tables) if tables else None)
+        # Soma o usage_metadata de todos os turnos do agente (ferramentas incluídas)
+        try:
+            with get_usage_metadata_callback() if get_usage_metadata_callback else nullcontext() as usage:
+                result = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            if provider_id:
+                llm_metrics.record_call_timeout(provider_id, timeout)
+            raise
+        finally:
+            _agent_table_scope.reset(scope)
+        if provider_id:
+            llm_metrics.record_call_latency(provider_id, time.perf_counter() - started)
+        self._record_token_usage(provider_id, usage, enhanced_prompt)
+        return result
+
+    @classmethod
+    async def _stream_agent(cls, agent, agent_input: dict, on_progress: ProgressCallback):
+        """Executa o agente via ``astream_events``, repassando os passos; retorna a saída final."""
+        output = None
+        async for event in agent.astream_events(agent_input, version="v2"):
+            if event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output")
+                continue
+            progress = cls._progress_from_event(event)
+            if progress is not None:
+                on_progress(progress)
+        return output
+
+    @staticmethod
+    def _progress_from_event(event: dict) -> Optional[dict]:
+        """Converte um evento do LangChain em passo de progresso (None = não repassar)."""
+        kind = event["event"]
+        name = event.get("name", "")
+        data = event.get("data", {})
+        if kind == "on_tool_start":
+            tool_input = data.get("input") or {}
+            if name == "sql_db_schema":
+                tables = str(tool_input.get("table_names", "")) if isinstance(tool_input, dict) else str(tool_input)
+                return {"step": "schema_inspected", "tables": [t.strip() for t in tables.split(",") if t.strip()]}
+            if name in _SQL_DRAFT_TOOLS:
+                sql = tool_input.get("query", "") if isinstance(tool_input, dict) else str(tool_input)
+                return {"step": "sql_drafted", "sql": sql}
+            if name != "sql_db_list_tables":
+                return {"step": "tool", "name": name}
+        elif kind == "on_tool_end" and name == "sql_db_list_tables":
+            output = str(getattr(data.get("output"), "content", data.get("output", "")))
+            return {"step": "tables_listed", "tables": [t.strip() for t in output.split(",") if t.strip()]}
+        elif kind == "on_chat_model_stream":
+            text = getattr(data.get("chunk"), "content", "")
+            if isinstance(text, str) and text:
+                return {"step": "token", "text": text}
+        return None
+
+    def _result_has_sql(self, result: Any) -> bool:
+        """Indica se a resposta do agente contém um SELECT aproveitável."""
+        if isinstance(result, dict):
+            text = result.get("output") or result.get("answer") or result.get("result") or result.get("sql")
+        else:
+            text = result
+        return "SELECT" in self._extract_sql_from_response(str(text or "")).upper()
+
+    async def _invoke_hedged(
+        self,
+        enhanced_prompt: str,
+        timeout: float,
+        on_progress: Optional[ProgressCallback] = None,
+        tables: Optional[Sequence[str]] = None,
+    ):
+        """Invoca o agente com hedging entre provedores (``timeout`` vale para o principal).
+
+        Dispara o provedor atual; se ele não terminar em ``get_hedge_delay``
+        (p90 observado), dispara o próximo provedor saudável em paralelo. A
+        primeira resposta com SQL vence e a outra chamada é cancelada. Se o
+        reserva vencer, ``self.llm``/``self.sql_agent`` passam a apontar para ele.
+        Os passos de ``on_progress`` vêm só do provedor principal.
+        """
+        from src.services.llm_service import LLMService
+
+        primary_id = LLMService.get_provider_id(self.llm)
+        primary = asyncio.ensure_future(
+            self._invoke_agent(self.sql_agent, primary_id, enhanced_prompt, timeout, on_progress, tables=tables)
+        )
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=LLMService.get_hedge_delay(primary_id))
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        backup_id, backup_llm = LLMService.get_hedge_llm(primary_id)
+        backup_agent = None
+        if backup_llm is not None:
+            try:
+                backup_agent = self.get_agent(backup_llm, self.sql_db)
+            except Exception as e:
+                logger.warning(f"[sql_agent] Não foi possível preparar agente de hedge ({backup_id}): {e}")
+        if backup_agent is None:
+            return await primary
+
+        print(f"[sql_agent] ⏩ Hedge: {primary_id} sem resposta, disparando {backup_id} em paralelo")
+        backup = asyncio.ensure_future(
+            self._invoke_agent(
+                backup_agent, backup_id, enhanced_prompt, LLMService.get_request_timeout(backup_id), tables=tables
+            )
+        )
+        candidates = {primary: (primary_id, self.llm, self.sql_agent), backup: (backup_id, backup_llm, backup_agent)}
+        results: dict = {}
+        errors: dict = {}
+        pending = set(candidates)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Ordem estável: se os dois terminarem juntos, o principal tem preferência
+                for task in (primary, backup):
+                    if task not in done:
+                        continue
+                    if task.exception() is not None:
+                        errors[task] = task.exception()
+                    elif self._result_has_sql(task.result()):
+                        return self._hedge_winner(task, backup, candidates, errors)
+                    else:
+                        results[task] = task.result()
+
+            # Nenhuma resposta com SQL: devolve a do principal (ou do reserva) para o
+            # fluxo normal tratar "não encontrado"/fallback mínimo
+            llm_metrics.record_hedge(backup_id, won=False)
+            for task in (primary, backup):
+                if task in results:
+                    return self._hedge_winner(task, backup, candidates, errors, record=False)
+            self._report_hedge_errors(candidates, errors, skip=primary)
+            raise errors[primary]
+        finally:
+            for task in candidates:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_winner(self, task, backup, candidates: dict, errors: dict, record: bool = True):
+        """Adota o resultado da chamada vencedora do hedge."""
+        provider_id, llm, agent = candidates[task]
+        if record:
+            llm_metrics.record_hedge(candidates[backup][0], won=task is backup)
+        if task is backup:
+            print(f"[sql_agent] ✅ Hedge vencido por {provider_id}")
+            self.llm = llm
+            self.sql_agent = agent
+            self._initialized_llm = llm
+        self._report_hedge_errors(candidates, errors)
+        return task.result()
+
+    @staticmethod
+    def _report_hedge_errors(candidates: dict, errors: dict, skip=None) -> None:
+        """Registra no LLMService as falhas das chamadas do hedge que não serão relançadas."""
+        from src.services.llm_service import LLMService
+
+        for task, error in errors.items():
+            if task is skip:
+                continue
+            provider_id = candidates[task][0]
+            if provider_id:
+                LLMService._handle_provider_error(provider_id, error)
+
     def _enhance_prompt(self, prompt: str) -> str:
         """Melhora o prompt com contexto adicional e instruções claras."""
         prompt_lower = prompt.lower()
@@ -821,11 +1380,7 @@ SELECT
         sql_upper = sql.upper().strip()
         
         # Remove comentários do início para validação
-        lines = sql_upper.split('\n')
-        sql_without_comments = '\n'.join(
-            line for line in lines 
-            if not line.strip().startswith('--')
-        ).strip()
+        sql_without_comments = _strip_comment_lines(sql_upper)
         
         # Bloqueia comandos perigosos
         dangerous_keywords = ['DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE', 'INSERT', 'UPDATE']
@@ -833,20 +1388,37 @@ SELECT
             if keyword in sql_without_comments:
                 return {
                     "is_valid": False,
-                    "errors": [f"Comando {keyword} não permitido por segurança"]
+                    "errors": [f"Comando {keyword} não permitido por segurança"],
+                    "read_only": False,
                 }
         
-        # Verifica se é SELECT (após remover comentários)
-        if not sql_without_comments.startswith('SELECT'):
+        # Verifica se é SELECT ou WITH ... SELECT (após remover comentários)
+        if not sql_without_comments.startswith(_READ_QUERY_PREFIXES):
             return {
                 "is_valid": False,
-                "errors": ["Apenas queries SELECT são permitidas"]
+                "errors": ["Apenas queries SELECT (ou WITH ... SELECT) são permitidas"],
+                "read_only": False,
             }
         
-        return {"is_valid": True, "errors": []}
+        # SELECTs que travam linhas, mexem em sequences ou criam tabelas precisam do primário
+        read_only = not any(pattern in sql_without_comments for pattern in REPLICA_UNSAFE_PATTERNS)
+        return {"is_valid": True, "errors": [], "read_only": read_only}
+
+    async def execute(
+        self,
+        sql: str,
+        approved: bool = False,
+        prepare: bool = False,
+        timeout: float | None = None,
+        read_only: bool | None = None,
+    ) -> SQLResult:
+        """Executa SQL aprovado.
 
-    async def execute(self, sql: str, approved: bool = False) -> SQLResult:
-        """Executa SQL aprovado."""
+        ``prepare=True`` para SQL recorrente (ex.: entradas de cache), que passa
+        a usar o prepared statement da conexão. ``timeout`` é o statement timeout
+        da rota (padrão ``DB_STATEMENT_TIMEOUT``). ``read_only`` (padrão: a
+        classificação de ``validate``) envia a query para a réplica de leitura.
+        """
         if not approved:
             raise ValueError("SQL deve ser aprovado antes da execução")
         
@@ -857,7 +1429,9 @@ SELECT
         
         try:
             # Executa SQL no banco
-            results = await db.execute_query(sql)
+            if read_only is None:
+                read_only = validation["read_only"]
+            results = await db.execute_query(sql, prepare=prepare, timeout=timeout, read_only=read_only)
             
             return SQLResult(
                 data=results,
@@ -866,3 +1440,32 @@ SELECT
             )
         except Exception as e:
             raise ValueError(f"Erro ao executar SQL: {str(e)}")
+
+    async def execute_stream(
+        self,
+        sql: str,
+        approved: bool = False,
+        batch_size: int | None = None,
+        timeout: float | None = None,
+        read_only: bool | None = None,
+    ) -> AsyncIterator[Row]:
+        """Executa SQL aprovado produzindo as linhas conforme chegam do banco."""
+        if not approved:
+            raise ValueError("SQL deve ser aprovado antes da execução")
+
+        validation = self.validate(sql)
+        if not validation["is_valid"]:
+            raise ValueError(f"SQL inválido: {', '.join(validation['errors'])}")
+
+        rows = db.stream_query(
+            sql,
+            batch_size=batch_size,
+            timeout=timeout,
+            read_only=validation["read_only"] if read_only is None else read_only,
+        )
+        try:
+            async with aclosing(rows):
+                async for row in rows:
+                    yield row
+        except Exception as e:
+            raise ValueError(f"Erro ao executar SQL: {str(e)}")
@@ -1,18 +1,54 @@
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.api.routes import chat, sql, compliance, llm, cache, schema
 from src.database import db
-from src.services.llm_service import LLMService
+from src.services.llm_service import LANGCHAIN_AVAILABLE, LLMService
+
+# Quanto o startup com falha no banco espera a thread de inicialização dos provedores terminar
+PROVIDERS_INIT_WAIT_SECONDS = 10.0
+
+
+async def _prebuild_agents() -> None:
+    """Pré-constrói um agente SQL por provedor em background (fallback vira lookup).
+
+    Importa o LangChain e reflete o schema (``SQLDatabase.from_uri``): roda depois
+    do startup, sem atrasar a API; um request que chegue antes constrói o agente
+    do seu provedor sob demanda.
+    """
+    try:
+        from src.agents.sql_agent import SQLAgentService
+        built = await asyncio.to_thread(SQLAgentService.prebuild_agents)
+        print(f"[OK] {built} agente(s) SQL pré-construído(s)")
+    except Exception as e:
+        print(f"[!] Erro ao pré-construir agentes SQL: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia ciclo de vida da aplicação."""
     # Startup
-    await db.connect()
+    # Provedores de LLM (import do SDK + criação do cliente, bloqueante) são
+    # inicializados numa thread enquanto o banco conecta
+    providers_task = (
+        asyncio.create_task(asyncio.to_thread(LLMService._initialize_providers))
+        if LANGCHAIN_AVAILABLE
+        else None
+    )
+    try:
+        await db.connect()
+    except BaseException:
+        # A API não sobe sem banco. A thread dos provedores não pode ser interrompida
+        # (cancelar a task só abandona a espera): aguarda ela terminar antes de propagar
+        if providers_task:
+            done, _ = await asyncio.wait({providers_task}, timeout=PROVIDERS_INIT_WAIT_SECONDS)
+            if not done:
+                providers_task.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await providers_task
+        raise
     print("[OK] Banco de dados conectado")
     
     # Testa conexão
@@ -23,21 +59,21 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[!] Erro ao testar conexao: {e}")
     
+    prebuild_task = None
     # Inicializa LLM se disponível
-    from src.services.llm_service import LANGCHAIN_AVAILABLE
-    
     if not LANGCHAIN_AVAILABLE:
         print("[!] LLM nao disponivel (bibliotecas LangChain nao estao instaladas)")
         print("    Instale as dependencias: poetry install")
         print("    O sistema funcionara com SQL simples sem LangChain")
     else:
         # Primeiro verifica se há provedores configurados
-        LLMService._initialize_providers()
+        await providers_task
         if LLMService._providers:
             available_count = sum(1 for p in LLMService._providers.values() if p.is_available())
             llm_instance = LLMService.get_llm()
             if llm_instance:
                 print(f"[OK] LLM inicializado ({available_count}/{len(LLMService._providers)} provedores disponíveis)")
+                prebuild_task = asyncio.create_task(_prebuild_agents())
                 # Inicia health check periódico apenas se há provedores disponíveis
                 await LLMService.start_health_check()
             else:
@@ -55,6 +91,11 @@ async def lifespan(app: FastAPI):
             print("    Configure pelo menos uma chave de API (OPENAI_API_KEY, GOOGLE_API_KEY, etc.)")
             print("    O sistema funcionara com SQL simples sem LangChain")
     
+    # Uso e snapshots do cache de respostas gravados em background (fora do cache hit)
+    from src.services.cache_service import get_cache_service
+    cache_service = get_cache_service()
+    await cache_service.start_background_persistence()
+
     try:
         yield
     except asyncio.CancelledError:
@@ -62,12 +103,19 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Shutdown: para health check e desconecta banco de dados
+        if prebuild_task and not prebuild_task.done():
+            prebuild_task.cancel()
         try:
             await LLMService.stop_health_check()
         except (asyncio.CancelledError, Exception):
             # Ignora erros durante shutdown
             pass
         
+        try:
+            await cache_service.stop_background_persistence()
+        except (asyncio.CancelledError, Exception):
+            pass
+
         try:
             await db.disconnect()
             print("[OK] Banco de dados desconectado")
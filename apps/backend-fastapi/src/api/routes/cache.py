@@ -77,7 +77,7 @@ async def create_cache_entry(req: CreateEntryRequest):
         )
         
         # Adiciona ao cache
-        cache_service.add_entry(entry)
+        await cache_service.aadd_entry(entry)
         
         return CreateEntryResponse(
             entry_id=str(entry.entry_id),
@@ -160,5 +160,5 @@ async def delete_cache_entry(entry_id: UUID):
     if not entry:
         raise HTTPException(status_code=404, detail="Entrada não encontrada")
     
-    cache_service.delete_entry(entry_id)
+    await cache_service.adelete_entry(entry_id)
     return {"message": "Entrada removida com sucesso"}
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import uuid
+from collections.abc import Mapping
+
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -8,6 +12,9 @@ from pydantic import BaseModel
 from src.domain.privacy_guard import PrivacyGuard, Role
 from src.domain.query_session import QuerySession, QuerySessionRepository
 from src.agents.chat_pipeline import ChatPipeline
+from src.config import settings
+from src.database import QueryResult
+from src.observability.audit_logger import AUDIT_INSERT_SQL
 
 router = APIRouter(prefix="/v1/chat", tags=["chat"])
 
@@ -75,8 +82,11 @@ def _validate_sql(sql: str) -> bool:
     return True
 
 
-def _calculate_uti_occupation_from_rows(rows: list[dict], prompt: str) -> dict | None:
-    """Calcula ocupação de UTI quando o SQL retornou linhas individuais de leitos."""
+def _calculate_uti_occupation_from_rows(rows: QueryResult, prompt: str) -> dict | None:
+    """Calcula ocupação de UTI quando o SQL retornou linhas individuais de leitos.
+
+    Trabalha direto sobre as colunas ``setor``/``status``, sem montar um dict por leito.
+    """
     if not rows:
         return None
     
@@ -87,22 +97,24 @@ def _calculate_uti_occupation_from_rows(rows: list[dict], prompt: str) -> dict |
     is_uti_adulto = "adulto" in prompt_lower or "adulta" in prompt_lower
     is_uti = "uti" in prompt_lower
     
-    # Filtra leitos por setor se especificado
-    filtered_rows = rows
+    # Filtra leitos (posições) por setor se especificado
+    setores = rows.column("setor")
+    selected = range(len(rows))
     if is_uti_pediatrica:
-        filtered_rows = [r for r in rows if r.get("setor") == "UTI_PEDIATRICA"]
+        selected = [i for i, setor in enumerate(setores) if setor == "UTI_PEDIATRICA"]
     elif is_uti_adulto:
-        filtered_rows = [r for r in rows if r.get("setor") == "UTI_ADULTO"]
+        selected = [i for i, setor in enumerate(setores) if setor == "UTI_ADULTO"]
     elif is_uti:
         # Se só menciona UTI, pega todas as UTIs
-        filtered_rows = [r for r in rows if "UTI" in str(r.get("setor", "")).upper()]
+        selected = [i for i, setor in enumerate(setores) if "UTI" in str(setor or "").upper()]
     
-    if not filtered_rows:
+    if not selected:
         return None
     
     # Conta ocupados e totais
-    total = len(filtered_rows)
-    ocupados = sum(1 for r in filtered_rows if r.get("status", "").lower() == "ocupado")
+    status = rows.column("status", "")
+    total = len(selected)
+    ocupados = sum(1 for i in selected if str(status[i] or "").lower() == "ocupado")
     taxa = round(100.0 * ocupados / total, 2) if total > 0 else 0
     
     # Determina label do setor
@@ -113,7 +125,7 @@ def _calculate_uti_occupation_from_rows(rows: list[dict], prompt: str) -> dict |
     elif is_uti:
         setor_label = "UTI"
     else:
-        setor_label = filtered_rows[0].get("setor", "Setor consultado") if filtered_rows else "Setor"
+        setor_label = rows[selected[0]].get("setor", "Setor consultado")
     
     return {
         "tipo": "uti_ocupacao",
@@ -124,8 +136,11 @@ def _calculate_uti_occupation_from_rows(rows: list[dict], prompt: str) -> dict |
     }
 
 
-def _calculate_aggregation_from_rows(rows: list[dict], prompt: str) -> dict | None:
-    """Calcula agregação quando a pergunta pede mas o SQL retornou linhas individuais."""
+def _calculate_aggregation_from_rows(rows: QueryResult, prompt: str) -> dict | None:
+    """Calcula agregação quando a pergunta pede mas o SQL retornou linhas individuais.
+
+    Soma/média são feitas sobre a coluna de valor, sem materializar as linhas.
+    """
     if not rows:
         return None
     
@@ -133,7 +148,7 @@ def _calculate_aggregation_from_rows(rows: list[dict], prompt: str) -> dict | No
     
     # Procura coluna de valor/receita para somar
     value_key = None
-    for key in rows[0].keys():
+    for key in rows.columns:
         if any(term in key.lower() for term in ['valor', 'value', 'preco', 'price', 'receita', 'faturamento', 'faturado']):
             value_key = key
             break
@@ -143,7 +158,7 @@ def _calculate_aggregation_from_rows(rows: list[dict], prompt: str) -> dict | No
         if any(word in prompt_lower for word in ["total", "soma", "sum"]) and \
            any(word in prompt_lower for word in ["faturado", "faturamento", "receita", "valor"]):
             try:
-                total = sum(float(row.get(value_key, 0) or 0) for row in rows)
+                total = sum(float(value or 0) for value in rows.column(value_key))
                 return {
                     "tipo": "soma",
                     "label": "Total faturado",
@@ -156,7 +171,7 @@ def _calculate_aggregation_from_rows(rows: list[dict], prompt: str) -> dict | No
         # Calcula média
         if any(word in prompt_lower for word in ["media", "média", "average", "avg"]):
             try:
-                avg = sum(float(row.get(value_key, 0) or 0) for row in rows) / len(rows) if rows else 0
+                avg = sum(float(value or 0) for value in rows.column(value_key)) / len(rows) if rows else 0
                 label = "Receita média" if any(word in prompt_lower for word in ["receita", "faturamento"]) else "Média"
                 return {
                     "tipo": "media",
@@ -189,7 +204,7 @@ def _calculate_aggregation_from_rows(rows: list[dict], prompt: str) -> dict | No
     return None
 
 
-def _infer_summary_from_context(rows: list[dict], prompt: str) -> dict | None:
+def _infer_summary_from_context(rows: QueryResult, prompt: str) -> dict | None:
     """Tenta inferir um resumo do contexto quando não há agregação explícita."""
     if not rows:
         return None
@@ -220,7 +235,7 @@ def _infer_summary_from_context(rows: list[dict], prompt: str) -> dict | None:
     return None
 
 
-def _detect_aggregate_metric(row: dict, prompt: str) -> dict | None:
+def _detect_aggregate_metric(row: Mapping, prompt: str) -> dict | None:
     """Detecta automaticamente métricas agregadas (médias, somas, contagens) e gera SUMMARY."""
     prompt_lower = prompt.lower()
     
@@ -292,16 +307,91 @@ def _detect_aggregate_metric(row: dict, prompt: str) -> dict | None:
     return None
 
 
+async def _suggest_and_execute(sql_agent, prompt: str, on_progress=None, agent_steps: bool = True):
+    """
+    Gera o SQL e, se for uma consulta normal, já o executa.
+
+    É a unidade compartilhada entre requests idênticos simultâneos (ver
+    request_coalescer). Erros de execução são devolvidos em vez de lançados
+    para que cada stream os reporte no mesmo ponto do fluxo de sempre.
+    ``on_progress`` recebe os passos do agente (se ``agent_steps``) e, sempre,
+    ``{"step": "executing", "sql": ...}`` logo antes de executar o SQL.
+
+    Returns:
+        (suggestion, result, exec_error)
+    """
+    from src.services.llm_service import LLMService
+
+    suggestion = await sql_agent.suggest(
+        prompt, hedge=LLMService.hedging_enabled("chat"), on_progress=on_progress if agent_steps else None
+    )
+    sql = suggestion.sql
+    if sql and sql.strip().startswith("--SMART_RESPONSE_MARKER"):
+        return suggestion, None, None
+    if suggestion.comments and "INFO_NAO_DISPONIVEL" in suggestion.comments:
+        return suggestion, None, None
+    if on_progress:
+        on_progress({"step": "executing", "sql": sql})
+    try:
+        result = await sql_agent.execute(sql, approved=True, timeout=settings.DB_STATEMENT_TIMEOUT_CHAT)
+    except Exception as exec_err:
+        return suggestion, None, exec_err
+    return suggestion, result, None
+
+
+def _execution_notice(sql: str) -> list[str]:
+    """Mensagens enviadas ao começar a executar o SQL (aviso de match parcial/SQL suspeito)."""
+    frames = []
+    if sql and "--PARTIAL_MATCH" in sql:
+        frames.append("data: [PARTIAL_MATCH]\n\n")
+        frames.append("data: ⚠️ Alguns dados solicitados não estão disponíveis, mostrando informações parciais.\n\n")
+    # Valida se o SQL parece correto antes de executar
+    if not _validate_sql(sql):
+        frames.append(
+            "data: ⚠️ **Aviso:** O SQL gerado pode não estar correto.\n"
+            "data: Tentando executar mesmo assim...\n\n"
+        )
+    frames.append("data: Executando consulta...\n\n")
+    return frames
+
+
+def _sse_event(event: str, payload: dict) -> str:
+    """Evento SSE nomeado (``event: ...``); clientes que só usam ``onmessage`` o ignoram."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _stream_progress(task: asyncio.Future, queue: asyncio.Queue):
+    """Repassa os passos de progresso enfileirados enquanto ``task`` roda."""
+    while not task.done() or not queue.empty():
+        if not queue.empty():
+            yield queue.get_nowait()
+            continue
+        getter = asyncio.ensure_future(queue.get())
+        try:
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not getter.done():
+                # cancel() só pede o cancelamento: espera o getter terminar de fato
+                getter.cancel()
+                try:
+                    await getter
+                except asyncio.CancelledError:
+                    pass
+        if getter.done() and not getter.cancelled():
+            yield getter.result()
+
+
 @router.get("/stream")
 async def stream_chat_get(
     session_id: str = Query(..., description="ID da sessão"),
     prompt: str = Query(..., description="Pergunta do usuário")
 ):
     """Streama resposta do chat via SSE (GET para compatibilidade com EventSource)."""
-    import asyncio
     from src.agents.sql_agent import SQLAgentService
     from src.services.llm_service import LLMService
     from src.database import db
+    from src.services.request_coalescer import chat_coalescer, chat_coalescing_key
+    from src.services.schema_detector_service import SchemaDetectorService
     
     async def generate():
         import logging
@@ -331,10 +421,12 @@ async def stream_chat_get(
                 # Executa SQL do cache
                 try:
                     sql_agent_temp = SQLAgentService(llm=None, db_conn=db)
-                    result = await sql_agent_temp.execute(entry.sql, approved=True)
+                    result = await sql_agent_temp.execute(
+                        entry.sql, approved=True, prepare=True, timeout=settings.DB_STATEMENT_TIMEOUT_CHAT
+                    )
                     
                     # Verifica se é ocupação UTI e gera SUMMARY card
-                    if result.row_count > 0 and isinstance(result.data[0], dict):
+                    if result.row_count > 0 and isinstance(result.data[0], Mapping):
                         row0 = result.data[0]
                         print(f"[chat/generate] 📊 Cache SQL result keys: {list(row0.keys())}")
                         
@@ -370,7 +462,7 @@ async def stream_chat_get(
                     # Caso contrário, usa template de texto normal
                     response = entry.response_template
                     print(f"[chat/generate] 📄 Cache template: '{response[:100]}...'")
-                    if result.row_count > 0 and isinstance(result.data[0], dict):
+                    if result.row_count > 0 and isinstance(result.data[0], Mapping):
                         # Substitui placeholders no template
                         row = result.data[0]
                         for key, value in row.items():
@@ -438,7 +530,37 @@ async def stream_chat_get(
             logger.info(f"[chat/generate] 🔄 About to call sql_agent.suggest()...")
             print(f"[chat/generate] 🔄 About to call sql_agent.suggest()...")
             
-            suggestion = await sql_agent.suggest(prompt)
+            # Requests idênticos simultâneos (mesma pergunta normalizada e mesmo
+            # schema) compartilham uma única geração + execução
+            coalescing_key = chat_coalescing_key(prompt, SchemaDetectorService.get_schema_version())
+            # Passos do agente (tabelas, schema, SQL rascunhado) viram eventos
+            # "progress" assim que acontecem, em vez de silêncio até o fim; o
+            # coalescer os repassa também aos requests agregados a esta geração
+            progress = asyncio.Queue()
+            generation = asyncio.ensure_future(chat_coalescer.do(
+                coalescing_key,
+                lambda: _suggest_and_execute(
+                    sql_agent,
+                    prompt,
+                    lambda step: chat_coalescer.publish(coalescing_key, step),
+                    agent_steps=settings.CHAT_STREAM_PROGRESS,
+                ),
+                on_progress=progress.put_nowait,
+            ))
+            execution_announced = False
+            try:
+                async for step in _stream_progress(generation, progress):
+                    if step.get("step") == "executing":
+                        # Avisa antes de o SQL rodar, não depois do resultado
+                        for frame in _execution_notice(step.get("sql", "")):
+                            yield frame
+                        execution_announced = True
+                    if settings.CHAT_STREAM_PROGRESS:
+                        yield _sse_event("progress", step)
+                suggestion, coalesced_result, exec_error = await generation
+            finally:
+                # Cliente desconectou no meio: libera a inscrição no coalescer
+                generation.cancel()
             
             logger.info(f"[chat/generate] ✅ suggest() returned! Type: {type(suggestion)}")
             print(f"[chat/generate] ✅ suggest() returned! Type: {type(suggestion)}")
@@ -458,7 +580,6 @@ async def stream_chat_get(
                 parts = comments.split("|")
                 
                 # Get schema and generate smart response
-                from src.services.schema_detector_service import SchemaDetectorService
                 from src.services.question_analyzer_service import QuestionAnalyzerService
                 from src.services.suggestion_generator_service import SuggestionGeneratorService
                 
@@ -486,8 +607,9 @@ async def stream_chat_get(
                 yield "data: [DONE]\n\n"
                 return
             
-            # Handle partial match (some entities found, others not)
-            if sql and "--PARTIAL_MATCH" in sql:
+            # Handle partial match (some entities found, others not); com o SQL
+            # executado, o aviso já saiu junto com "Executando consulta..."
+            if sql and "--PARTIAL_MATCH" in sql and not execution_announced:
                 yield "data: [PARTIAL_MATCH]\n\n"
                 yield "data: ⚠️ Alguns dados solicitados não estão disponíveis, mostrando informações parciais.\n\n"
             
@@ -522,16 +644,11 @@ async def stream_chat_get(
                 yield "data: [DONE]\n\n"
                 return
             
-            # Valida se o SQL parece correto antes de executar
-            if not _validate_sql(sql):
-                yield (
-                    "data: ⚠️ **Aviso:** O SQL gerado pode não estar correto.\n"
-                    "data: Tentando executar mesmo assim...\n\n"
-                )
-            
-            # Executa SQL
-            yield "data: Executando consulta...\n\n"
-            result = await sql_agent.execute(sql, approved=True)
+            # SQL já executado junto com a geração ("Executando consulta..." saiu
+            # no passo "executing", antes da execução)
+            if exec_error is not None:
+                raise exec_error
+            result = coalesced_result
 
             # Analisa a pergunta para entender a intenção
             prompt_lower = prompt.lower()
@@ -543,7 +660,7 @@ async def stream_chat_get(
             summary_generated = False
             
             # Se houver resultados, SEMPRE tenta gerar resumo inteligente em card
-            if result.row_count > 0 and isinstance(result.data[0], dict):
+            if result.row_count > 0 and isinstance(result.data[0], Mapping):
                 row0 = result.data[0]
 
                 # 1) Ocupação de UTI (card especial)
@@ -628,10 +745,7 @@ async def stream_chat_get(
                     # Registra auditoria ANTES de retornar
                     try:
                         await db.execute_query(
-                            """
-                            INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis)
-                            VALUES (%s, %s, %s, %s, %s)
-                            """,
+                            AUDIT_INSERT_SQL,
                             (
                                 _ensure_valid_uuid(session_id),  # Converte para UUID válido
                                 "demo-user",
@@ -639,6 +753,7 @@ async def stream_chat_get(
                                 result.sql_executed,
                                 "legitimate_interest",
                             ),
+                            prepare=True,
                         )
                     except Exception as audit_err:
                         print(f"[audit] Falha ao registrar auditoria de chat: {audit_err}")
@@ -657,10 +772,7 @@ async def stream_chat_get(
                     # Registra auditoria ANTES de retornar
                     try:
                         await db.execute_query(
-                            """
-                            INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis)
-                            VALUES (%s, %s, %s, %s, %s)
-                            """,
+                            AUDIT_INSERT_SQL,
                             (
                                 _ensure_valid_uuid(session_id),  # Converte para UUID válido
                                 "demo-user",
@@ -668,6 +780,7 @@ async def stream_chat_get(
                                 result.sql_executed,
                                 "legitimate_interest",
                             ),
+                            prepare=True,
                         )
                     except Exception as audit_err:
                         print(f"[audit] Falha ao registrar auditoria de chat: {audit_err}")
@@ -732,10 +845,7 @@ async def stream_chat_get(
             # Registra auditoria UMA ÚNICA VEZ no final (garantindo que sempre registra)
             try:
                 await db.execute_query(
-                    """
-                    INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
+                    AUDIT_INSERT_SQL,
                     (
                         session_id,
                         "demo-user",
@@ -743,6 +853,7 @@ async def stream_chat_get(
                         result.sql_executed,
                         "legitimate_interest",
                     ),
+                    prepare=True,
                 )
             except Exception as audit_err:
                 print(f"[audit] Falha ao registrar auditoria de chat: {audit_err}")
@@ -5,8 +5,9 @@ from fastapi import APIRouter, Query
 from fastapi.responses import Response
 
 from src.services.audit_exporter import AuditExporter
-from src.observability.metrics import chat_metrics
+from src.observability.metrics import chat_metrics, llm_metrics
 from src.observability.feature_flags import flags
+from src.services.request_coalescer import chat_coalescer
 
 router = APIRouter(prefix="/v1", tags=["compliance", "observability"])
 
@@ -55,6 +56,8 @@ async def health_check():
     # Verifica status dos LLM providers
     llm_providers = []
     llm_count_healthy = 0
+    from src.services.completion_cache import get_completion_cache
+    completion_cache = get_completion_cache()
     try:
         from src.services.llm_service import LLMService
         providers_list = LLMService.get_providers_status()  # Retorna lista diretamente
@@ -136,7 +139,8 @@ async def health_check():
             "status": "connected" if db_status == "connected" else "disconnected",
             "version": db_version[:80] if len(db_version) > 80 else db_version,
             "last_check": datetime.utcnow().isoformat(),
-            "healthy": db_status == "connected"
+            "healthy": db_status == "connected",
+            "pool": db.get_pool_stats(),
         },
         
         # Dados detalhados dos LLM providers
@@ -145,7 +149,10 @@ async def health_check():
             "total_providers": len(llm_providers),
             "active_providers": llm_count_healthy,
             "status": "healthy" if llm_count_healthy > 0 else "degraded",
-            "last_check": datetime.utcnow().isoformat()
+            "last_check": datetime.utcnow().isoformat(),
+            "hedging": llm_metrics.get_hedge_stats(),
+            "provider_stats": llm_metrics.get_all_stats(),
+            "completion_cache": completion_cache.get_stats() if completion_cache else {"mode": "off"},
         },
         
         # Métricas detalhadas
@@ -155,6 +162,8 @@ async def health_check():
             "total_requests": stats.get('total_requests', 0),
             "successful_requests": stats.get('successful_requests', 0),
             "failed_requests": stats.get('failed_requests', 0),
+            # Requests de chat idênticos atendidos por uma chamada já em andamento
+            "coalescing": chat_coalescer.get_stats(),
         },
         
         # Features ativas
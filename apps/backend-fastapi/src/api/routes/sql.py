@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import json
+import uuid
+from contextlib import aclosing
+
 from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from src.agents.sql_agent import SQLAgentService
 from src.connectors.neondb_schema_service import NeonDBSchemaService
 from src.services.llm_service import LLMService
+from src.config import settings
 from src.database import db
+from src.observability.audit_logger import AUDIT_INSERT_SQL
 
 router = APIRouter(prefix="/v1/sql", tags=["sql"])
 
@@ -21,6 +29,10 @@ class ExecuteRequest(BaseModel):
     approved: bool
 
 
+class ExecuteStreamRequest(ExecuteRequest):
+    batch_size: int | None = None
+
+
 class SQLSuggestion(BaseModel):
     sql: str
     comments: str
@@ -32,7 +44,7 @@ async def assist_sql(req: AssistRequest):
     """Gera sugestão de SQL comentado baseado em prompt natural."""
     llm = LLMService.get_llm()
     service = SQLAgentService(llm=llm, db_conn=db)
-    suggestion = await service.suggest(req.prompt, req.tables)
+    suggestion = await service.suggest(req.prompt, req.tables, hedge=LLMService.hedging_enabled("sql_assist"))
     return SQLSuggestion(
         sql=suggestion.sql,
         comments=suggestion.comments,
@@ -48,23 +60,64 @@ async def execute_sql(req: ExecuteRequest):
     
     llm = LLMService.get_llm()
     service = SQLAgentService(llm=llm, db_conn=db)
-    result = await service.execute(req.sql, approved=True)
+    result = await service.execute(req.sql, approved=True, timeout=settings.DB_STATEMENT_TIMEOUT_WORKBENCH)
+
+    await _record_workbench_audit(req.sql)
+
+    return {"results": result.data.as_dicts(), "row_count": result.row_count}
 
-    # Registra auditoria básica da execução no banco
+
+@router.post("/execute/stream")
+async def execute_sql_stream(req: ExecuteStreamRequest):
+    """Executa SQL aprovado e streama as linhas em NDJSON conforme chegam do banco.
+
+    Cada linha é um objeto JSON: ``{"type": "row", "data": {...}}`` por registro e
+    ``{"type": "end", "row_count": N}`` ao final (ou ``{"type": "error", ...}``).
+    """
+    if not req.approved:
+        raise HTTPException(status_code=400, detail="SQL deve ser aprovado antes da execução")
+
+    service = SQLAgentService(db_conn=db)
+    validation = service.validate(req.sql)
+    if not validation["is_valid"]:
+        raise HTTPException(status_code=400, detail=f"SQL inválido: {', '.join(validation['errors'])}")
+
+    async def generate():
+        row_count = 0
+        rows = service.execute_stream(
+            req.sql,
+            approved=True,
+            batch_size=req.batch_size,
+            timeout=settings.DB_STATEMENT_TIMEOUT_WORKBENCH,
+        )
+        try:
+            async with aclosing(rows):
+                async for row in rows:
+                    row_count += 1
+                    yield json.dumps({"type": "row", "data": jsonable_encoder(dict(row))}, ensure_ascii=False) + "\n"
+        except ValueError as e:
+            yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+            return
+
+        await _record_workbench_audit(req.sql)
+        yield json.dumps({"type": "end", "row_count": row_count}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def _record_workbench_audit(sql: str) -> None:
+    """Registra auditoria básica da execução no banco."""
     try:
         await db.execute_query(
-            """
-            INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis)
-            VALUES (gen_random_uuid(), %s, %s, %s, %s)
-            """,
+            AUDIT_INSERT_SQL,
             (
+                str(uuid.uuid4()),
                 "workbench-user",
                 "[SQL Workbench] Execução manual de SQL",
-                req.sql,
+                sql,
                 "contract_execution",
             ),
+            prepare=True,
         )
     except Exception as audit_err:
         print(f"[audit] Falha ao registrar auditoria de SQL: {audit_err}")
-
-    return {"results": result.data, "row_count": result.row_count}
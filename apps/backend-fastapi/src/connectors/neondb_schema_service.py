@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from typing import Dict, List, Optional, Any
-from src.database import Database
+from src.database import Database, QueryResult
 
 
 class SchemaRegistry:
@@ -24,7 +24,7 @@ class SchemaRegistry:
             ORDER BY table_name
         """
         try:
-            tables = await self.db.execute_query(query, (schema,))
+            tables = await self.db.execute_query(query, (schema,), read_only=True)
             self._cache[cache_key] = tables
             return tables
         except Exception as e:
@@ -40,7 +40,7 @@ class SchemaRegistry:
             ORDER BY ordinal_position
         """
         try:
-            columns = await self.db.execute_query(query, (schema, table))
+            columns = await self.db.execute_query(query, (schema, table), read_only=True)
             return columns
         except Exception as e:
             print(f"Erro ao buscar colunas: {e}")
@@ -74,7 +74,7 @@ class NeonDBSchemaService:
             table_name = table_info["table_name"]
             columns = await self.registry.get_columns(table_name, schema)
             result[table_name] = {
-                "columns": columns,
+                "columns": columns.as_dicts() if isinstance(columns, QueryResult) else columns,
                 "masking_rules": {
                     col["column_name"]: self.registry.get_masking_rules(col["column_name"])
                     for col in columns
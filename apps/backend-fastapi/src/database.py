@@ -4,10 +4,15 @@ from __future__ import annotations
 
 import sys
 import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
 import psycopg
 from psycopg import AsyncConnection
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Iterator, Optional
 
 # Fix para Windows
 if sys.platform == 'win32':
@@ -16,99 +21,679 @@ if sys.platform == 'win32':
 from src.config import settings
 
 
-class Database:
-    """Gerenciador de conexões com o banco de dados."""
+class PoolTimeout(TimeoutError):
+    """Nenhuma conexão do pool ficou livre dentro do timeout de aquisição."""
 
-    def __init__(self, connection_string: str):
-        self.connection_string = connection_string
-        self._conn: AsyncConnection | None = None
 
-    async def connect(self) -> None:
-        """Cria conexão com o banco."""
-        if self._conn is None:
-            self._conn = await psycopg.AsyncConnection.connect(self.connection_string)
+class QueryTimeoutError(TimeoutError):
+    """A query excedeu o statement timeout e foi cancelada no servidor."""
 
-    async def disconnect(self) -> None:
-        """Fecha conexão com o banco."""
-        if self._conn:
+
+@dataclass
+class _PooledConnection:
+    """Conexão física mantida pelo pool com seus metadados de ciclo de vida."""
+
+    conn: AsyncConnection
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+    # Textos dos statements preparados nesta conexão, em ordem LRU
+    prepared: OrderedDict[str, None] = field(default_factory=OrderedDict)
+
+
+class ConnectionPool:
+    """Pool assíncrono de conexões psycopg com tamanho mínimo/máximo.
+
+    - ``max_size`` limita conexões abertas (em uso + ociosas) via semáforo;
+    - ``timeout`` limita quanto tempo um request espera por uma conexão livre;
+    - ``max_lifetime`` recicla conexões antigas (NeonDB derruba conexões longas);
+    - ``max_idle`` fecha conexões ociosas acima de ``min_size``;
+    - ``check_interval`` testa em background conexões ociosas há mais tempo que isso;
+    - ``prepared_max`` mantém até N prepared statements por conexão (LRU), usados
+      pelas queries executadas com ``prepare=True`` (0 desativa).
+
+    A verificação de liveness não acontece no caminho do request (cada probe é
+    um round trip extra até o NeonDB). Conexões que quebram durante o uso são
+    descartadas na devolução e o ``Database`` refaz a operação em outra conexão.
+    ``check_on_checkout`` reativa o probe por empréstimo, se necessário.
+    """
+
+    def __init__(
+        self,
+        conninfo: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 300.0,
+        maintenance_interval: float = 30.0,
+        check_interval: float = 60.0,
+        check_on_checkout: bool = False,
+        prepared_max: int = 0,
+        name: str = "primary",
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Tamanhos de pool inválidos: min={min_size}, max={max_size}")
+        self.conninfo = conninfo
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.maintenance_interval = maintenance_interval
+        self.check_interval = check_interval
+        self.check_on_checkout = check_on_checkout
+        self.prepared_max = prepared_max
+        self.name = name
+
+        self._idle: deque[_PooledConnection] = deque()
+        self._checked_out: dict[int, _PooledConnection] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._opened = False
+
+        # Estatísticas
+        self._in_use = 0
+        self._waiting = 0
+        self._requests = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._connections_created = 0
+        self._connections_closed = 0
+        self._connections_checked = 0
+        self._checks_failed = 0
+        self._prepared_hits = 0
+        self._prepared_misses = 0
+        self._prepared_evictions = 0
+
+    @property
+    def closed(self) -> bool:
+        return not self._opened
+
+    async def open(self) -> None:
+        """Abre o pool, cria ``min_size`` conexões e inicia a manutenção em background."""
+        if self._opened:
+            return
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._opened = True
+        try:
+            await self._fill_min_size()
+        except Exception:
+            await self.close()
+            raise
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def close(self) -> None:
+        """Fecha todas as conexões ociosas e para a manutenção."""
+        self._opened = False
+        if self._maintenance_task and not self._maintenance_task.done():
+            self._maintenance_task.cancel()
             try:
-                await self._conn.close()
-            except:
+                await self._maintenance_task
+            except (asyncio.CancelledError, Exception):
                 pass
-            finally:
-                self._conn = None
+        self._maintenance_task = None
+        while self._idle:
+            await self._close_conn(self._idle.popleft())
 
     @asynccontextmanager
-    async def get_connection(self) -> AsyncGenerator[AsyncConnection, None]:
-        """Context manager para obter conexão com retry automático em caso de perda."""
-        # Reconecta se necessário
-        if self._conn is None or self._conn.closed:
-            await self.connect()
-        
-        # Garante que a conexão está ativa e testa com uma query simples
+    async def connection(self) -> AsyncGenerator[AsyncConnection, None]:
+        """Empresta uma conexão do pool, devolvendo-a ao sair do contexto."""
+        pooled = await self._acquire()
+        try:
+            yield pooled.conn
+        except psycopg.OperationalError as e:
+            # Erro de conexão durante o uso: a conexão não volta para o pool
+            if not isinstance(e, psycopg.errors.QueryCanceled):
+                await self._close_conn(pooled)
+            raise
+        finally:
+            await self._release(pooled)
+
+    async def _acquire(self) -> _PooledConnection:
+        if not self._opened:
+            await self.open()
+
+        self._requests += 1
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeout(
+                f"Timeout de {self.timeout}s aguardando conexão do pool '{self.name}' "
+                f"({self._in_use}/{self.max_size} em uso, {self._waiting - 1} aguardando)"
+            )
+        finally:
+            self._waiting -= 1
+            waited = time.perf_counter() - started
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            pooled = await self._take_idle()
+            if pooled is None:
+                pooled = await self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._in_use += 1
+        self._checked_out[id(pooled.conn)] = pooled
+        return pooled
+
+    async def _release(self, pooled: _PooledConnection) -> None:
+        self._in_use -= 1
+        self._checked_out.pop(id(pooled.conn), None)
+        try:
+            conn = pooled.conn
+            if not self._opened or conn.closed or conn.broken or self._expired(pooled):
+                await self._close_conn(pooled)
+                return
+            if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+                # Conexão devolvida no meio de uma transação: descarta o estado
+                try:
+                    await conn.rollback()
+                except Exception:
+                    await self._close_conn(pooled)
+                    return
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    async def _take_idle(self) -> Optional[_PooledConnection]:
+        """Retorna a conexão ociosa mais recente que ainda esteja utilizável."""
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.conn.closed or pooled.conn.broken or self._expired(pooled):
+                await self._close_conn(pooled)
+                continue
+            if self.check_on_checkout and not await self._is_alive(pooled):
+                # Conexão perdida ou inválida: descarta e tenta a próxima
+                await self._close_conn(pooled)
+                continue
+            return pooled
+        return None
+
+    async def _is_alive(self, pooled: _PooledConnection) -> bool:
+        self._connections_checked += 1
         try:
-            if self._conn.closed:
-                await self.connect()
-            # Testa a conexão com uma query simples
-            async with self._conn.cursor() as cur:
+            async with pooled.conn.cursor() as cur:
                 await cur.execute("SELECT 1")
                 await cur.fetchone()
+            # Encerra a transação implícita do probe para que o próximo
+            # conn.transaction() seja de nível superior (e faça COMMIT de verdade)
+            await pooled.conn.rollback()
+            pooled.last_checked = time.monotonic()
+            return True
         except Exception as e:
-            # Conexão perdida ou inválida, reconecta
-            print(f"[database] Conexão perdida, reconectando... Erro: {e}")
+            self._checks_failed += 1
+            print(f"[database] Conexão perdida no pool '{self.name}', descartando... Erro: {e}")
+            return False
+
+    async def _create(self) -> _PooledConnection:
+        if self.prepared_max > 0:
+            # Só prepara o que for pedido explicitamente (prepare=True): SQL gerado
+            # pelo LLM roda uma vez e não deve ocupar o cache da conexão
+            conn = await psycopg.AsyncConnection.connect(self.conninfo, prepare_threshold=None)
+            conn.prepared_max = self.prepared_max
+        else:
+            conn = await psycopg.AsyncConnection.connect(self.conninfo)
+        self._connections_created += 1
+        return _PooledConnection(conn=conn)
+
+    def track_prepared(self, conn: AsyncConnection, query: str) -> bool:
+        """Registra o uso de um statement preparado em ``conn``; retorna True se já estava preparado.
+
+        Espelha o LRU do psycopg (mesmo tamanho, mesma ordem de uso) para
+        contabilizar hits/misses/evictions por texto do statement.
+        """
+        pooled = self._checked_out.get(id(conn))
+        if pooled is None or self.prepared_max <= 0:
+            return False
+        if query in pooled.prepared:
+            pooled.prepared.move_to_end(query)
+            self._prepared_hits += 1
+            return True
+        self._prepared_misses += 1
+        pooled.prepared[query] = None
+        if len(pooled.prepared) > self.prepared_max:
+            pooled.prepared.popitem(last=False)
+            self._prepared_evictions += 1
+        return False
+
+    async def _close_conn(self, pooled: _PooledConnection) -> None:
+        if pooled.conn.closed:
+            return
+        self._connections_closed += 1
+        try:
+            await pooled.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pooled: _PooledConnection) -> bool:
+        return time.monotonic() - pooled.created_at > self.max_lifetime
+
+    async def _fill_min_size(self) -> None:
+        while self._opened and len(self._idle) + self._in_use < self.min_size:
+            self._idle.append(await self._create())
+
+    async def _maintenance_loop(self) -> None:
+        """Recicla conexões expiradas/ociosas, testa as ociosas e repõe o mínimo periodicamente."""
+        while self._opened:
+            await asyncio.sleep(self.maintenance_interval)
             try:
-                await self.disconnect()
-            except:
-                pass
+                await self._reap_idle()
+                await self._check_idle()
+                await self._fill_min_size()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[database] Erro na manutenção do pool '{self.name}': {e}")
+
+    async def _reap_idle(self) -> None:
+        now = time.monotonic()
+        keep: deque[_PooledConnection] = deque()
+        while self._idle:
+            pooled = self._idle.popleft()
+            idle_for = now - pooled.last_used
+            over_min = len(keep) + self._in_use >= self.min_size
+            if (
+                pooled.conn.closed
+                or pooled.conn.broken
+                or self._expired(pooled)
+                or (over_min and idle_for > self.max_idle)
+            ):
+                await self._close_conn(pooled)
+            else:
+                keep.append(pooled)
+        self._idle.extend(keep)
+
+    async def _check_idle(self) -> None:
+        """Executa o probe de liveness nas conexões ociosas fora do caminho do request."""
+        now = time.monotonic()
+        stale = [p for p in self._idle if now - max(p.last_used, p.last_checked) >= self.check_interval]
+        for pooled in stale:
+            # Retira da fila durante o probe para que nenhum request a receba em paralelo
+            try:
+                self._idle.remove(pooled)
+            except ValueError:
+                continue
+            if await self._is_alive(pooled):
+                self._idle.append(pooled)
+            else:
+                await self._close_conn(pooled)
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do pool para dimensionamento."""
+        return {
+            "name": self.name,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "connections_in_use": self._in_use,
+            "connections_idle": len(self._idle),
+            "requests_waiting": self._waiting,
+            "requests_total": self._requests,
+            "requests_timed_out": self._timeouts,
+            "wait_time_avg_ms": round(1000 * self._wait_time_total / self._requests, 3) if self._requests else 0.0,
+            "wait_time_max_ms": round(1000 * self._wait_time_max, 3),
+            "connections_created": self._connections_created,
+            "connections_closed": self._connections_closed,
+            "connections_checked": self._connections_checked,
+            "checks_failed": self._checks_failed,
+            "prepared_max": self.prepared_max,
+            "prepared_cached": sum(len(p.prepared) for p in self._idle)
+            + sum(len(p.prepared) for p in self._checked_out.values()),
+            "prepared_hits": self._prepared_hits,
+            "prepared_misses": self._prepared_misses,
+            "prepared_evictions": self._prepared_evictions,
+        }
+
+
+class Row(Mapping):
+    """Linha de resultado com acesso por nome de coluna.
+
+    Guarda apenas a tupla de valores e uma referência ao índice de colunas do
+    resultado, compartilhado por todas as linhas (nada de um dict por linha).
+    """
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: dict[str, int], values: tuple):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._index[key]]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self)!r})"
+
+
+class QueryResult(Sequence):
+    """Resultado de query em formato compacto: um cabeçalho de colunas + linhas em tupla.
+
+    Indexar ou iterar devolve ``Row`` (acesso tipo dict, para os chamadores
+    existentes); ``column()`` devolve os valores de uma coluna sem criar linhas.
+    Para serializar em JSON use ``as_dicts()``.
+    """
+
+    __slots__ = ("columns", "rows", "_index")
+
+    def __init__(self, columns: Sequence[str] = (), rows: list[tuple] | None = None):
+        self.columns = tuple(columns)
+        self.rows = rows if rows is not None else []
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            result = QueryResult.__new__(QueryResult)
+            result.columns, result.rows, result._index = self.columns, self.rows[i], self._index
+            return result
+        return Row(self._index, self.rows[i])
+
+    def __iter__(self) -> Iterator[Row]:
+        index = self._index
+        return (Row(index, values) for values in self.rows)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, QueryResult):
+            return self.columns == other.columns and self.rows == other.rows
+        if isinstance(other, list):
+            return self.as_dicts() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns!r}, rows={len(self.rows)})"
+
+    def column(self, name: str, default: Any = None) -> list:
+        """Valores de uma coluna (``default`` em todas as linhas se ela não existir)."""
+        i = self._index.get(name)
+        if i is None:
+            return [default] * len(self.rows)
+        return [values[i] for values in self.rows]
+
+    def as_dicts(self) -> list[dict]:
+        """Converte para ``list[dict]`` (respostas JSON da API)."""
+        columns = self.columns
+        return [dict(zip(columns, values)) for values in self.rows]
+
+
+class Database:
+    """Gerenciador de conexões com o banco de dados.
+
+    Com ``replica_connection_string`` configurada, queries marcadas como
+    ``read_only`` vão para o pool da réplica; escritas ficam no primário. Se a
+    réplica falhar, ela é marcada indisponível por ``DB_REPLICA_RETRY_INTERVAL``
+    segundos e as leituras voltam para o primário nesse período.
+    """
+
+    def __init__(self, connection_string: str, replica_connection_string: str | None = None):
+        self.connection_string = connection_string
+        self.replica_connection_string = replica_connection_string
+        self._pool: ConnectionPool | None = None
+        self._replica_pool: ConnectionPool | None = None
+        self._replica_down_until = 0.0
+        self._replica_failovers = 0
+
+    def _build_pool(self, conninfo: str | None = None, name: str = "primary") -> ConnectionPool:
+        return ConnectionPool(
+            conninfo or self.connection_string,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+            max_idle=settings.DB_POOL_MAX_IDLE,
+            check_interval=settings.DB_POOL_CHECK_INTERVAL,
+            check_on_checkout=settings.DB_POOL_CHECK_ON_CHECKOUT,
+            prepared_max=settings.DB_PREPARED_CACHE_SIZE,
+            name=name,
+        )
+
+    async def connect(self) -> None:
+        """Abre o pool de conexões com o banco (e o da réplica, se configurada)."""
+        if self._pool is None:
+            self._pool = self._build_pool()
+        await self._pool.open()
+
+        if self.replica_connection_string:
+            if self._replica_pool is None:
+                self._replica_pool = self._build_pool(self.replica_connection_string, name="replica")
+            try:
+                await self._replica_pool.open()
+            except Exception as e:
+                # Réplica fora do ar não impede o startup: leituras vão para o primário
+                self._mark_replica_unhealthy(e)
+
+    async def disconnect(self) -> None:
+        """Fecha os pools de conexões com o banco."""
+        for attr in ("_pool", "_replica_pool"):
+            pool = getattr(self, attr)
+            if pool:
+                try:
+                    await pool.close()
+                except Exception:
+                    pass
+                finally:
+                    setattr(self, attr, None)
+
+    def replica_available(self) -> bool:
+        """Indica se leituras devem ir para a réplica (configurada e saudável)."""
+        return self._replica_pool is not None and time.monotonic() >= self._replica_down_until
+
+    def _mark_replica_unhealthy(self, error: Exception) -> None:
+        self._replica_failovers += 1
+        self._replica_down_until = time.monotonic() + settings.DB_REPLICA_RETRY_INTERVAL
+        print(
+            f"[database] Réplica indisponível ({error}); leituras no primário pelos próximos "
+            f"{settings.DB_REPLICA_RETRY_INTERVAL}s"
+        )
+
+    @staticmethod
+    def _is_connection_error(error: Exception) -> bool:
+        error_str = str(error).lower()
+        return any(
+            phrase in error_str
+            for phrase in ["connection", "conexão", "lost", "perdida", "closed", "broken", "timeout"]
+        )
+
+    @asynccontextmanager
+    async def get_connection(self, read_only: bool = False) -> AsyncGenerator[AsyncConnection, None]:
+        """Context manager que empresta uma conexão do pool (da réplica se ``read_only`` e disponível)."""
+        async with (await self._pool_for(read_only)).connection() as conn:
+            yield conn
+
+    async def _pool_for(self, read_only: bool) -> ConnectionPool:
+        if self._pool is None or self._pool.closed:
             await self.connect()
-        
-        yield self._conn
+        if read_only and self.replica_available():
+            return self._replica_pool
+        return self._pool
+
+    def get_pool_stats(self) -> dict:
+        """Retorna estatísticas do pool (em uso, aguardando, tempo de espera)."""
+        if self._pool is None:
+            return {"status": "closed"}
+        stats = self._pool.get_stats()
+        if self._replica_pool is not None:
+            stats["replica"] = {
+                **self._replica_pool.get_stats(),
+                "healthy": self.replica_available(),
+                "failovers": self._replica_failovers,
+            }
+        return stats
+
+    async def execute_query(
+        self,
+        query: str,
+        params: tuple = (),
+        prepare: bool = False,
+        timeout: float | None = None,
+        read_only: bool = False,
+    ) -> QueryResult:
+        """Executa query e retorna um ``QueryResult`` (colunas + linhas em tupla) com retry automático.
 
-    async def execute_query(self, query: str, params: tuple = ()) -> list[dict]:
-        """Executa query e retorna resultados como lista de dicionários com retry automático."""
+        ``prepare=True`` usa um prepared statement da conexão (parse/plan só na
+        primeira execução); indicado para SQL recorrente, como a inserção de
+        auditoria e o SQL das entradas de cache.
+
+        ``timeout`` (segundos, padrão ``DB_STATEMENT_TIMEOUT``; 0 desativa) limita a
+        execução: ao estourar, ou se a task for cancelada, a query é cancelada no
+        servidor e a conexão volta limpa para o pool.
+
+        ``read_only=True`` envia a query para a réplica, se houver; em erro de
+        conexão na réplica a nova tentativa vai para o primário.
+        """
+        timeout = settings.DB_STATEMENT_TIMEOUT if timeout is None else timeout
         max_retries = 2
         for attempt in range(max_retries):
+            pool = await self._pool_for(read_only)
             try:
-                async with self.get_connection() as conn:
+                async with pool.connection() as conn:
                     # Usa autocommit para evitar idle-in-transaction timeout
                     # psycopg3 faz commit automático quando o cursor fecha, mas garantimos com transaction
                     async with conn.transaction():
                         async with conn.cursor() as cur:
-                            await cur.execute(query, params)
+                            if prepare and pool.prepared_max > 0:
+                                pool.track_prepared(conn, query)
+                                await self._run_cancellable(conn, cur.execute(query, params, prepare=True), timeout)
+                            else:
+                                await self._run_cancellable(conn, cur.execute(query, params), timeout)
                             if cur.description:
                                 columns = [desc[0] for desc in cur.description]
                                 rows = await cur.fetchall()
                                 # Transaction faz commit automático ao sair do context
-                                return [dict(zip(columns, row)) for row in rows]
-                            return []
+                                return QueryResult(columns, rows)
+                            return QueryResult()
+            except (PoolTimeout, QueryTimeoutError):
+                # Pool saturado ou query lenta demais: retry só aumentaria a carga
+                raise
             except Exception as e:
-                error_str = str(e).lower()
-                is_connection_error = any(
-                    phrase in error_str 
-                    for phrase in ["connection", "conexão", "lost", "perdida", "closed", "broken", "timeout"]
-                )
-                
+                is_connection_error = self._is_connection_error(e)
+                if is_connection_error and pool is self._replica_pool:
+                    self._mark_replica_unhealthy(e)
+
                 if is_connection_error and attempt < max_retries - 1:
+                    # Reconexão no uso: a conexão quebrada já foi descartada pelo
+                    # pool, a nova tentativa pega outra (ou abre uma nova)
                     print(f"[database] Erro de conexão detectado (tentativa {attempt + 1}/{max_retries}): {e}")
-                    # Força desconexão e reconexão
-                    try:
-                        await self.disconnect()
-                    except:
-                        pass
-                    # Aguarda um pouco antes de tentar novamente
-                    import asyncio
-                    await asyncio.sleep(0.5)
                     continue
                 else:
                     # Re-lança o erro se não for erro de conexão ou esgotou tentativas
                     raise
 
-    async def execute_one(self, query: str, params: tuple = ()) -> dict | None:
+    async def stream_query(
+        self,
+        query: str,
+        params: tuple = (),
+        batch_size: int | None = None,
+        timeout: float | None = None,
+        read_only: bool = False,
+    ) -> AsyncIterator[Row]:
+        """Executa query via cursor nomeado (server-side) e produz as linhas em lotes.
+
+        Apenas ``batch_size`` linhas ficam em memória por vez, então o consumidor
+        pode começar a enviar resultados antes de a query terminar de ser lida.
+        A conexão fica emprestada enquanto o iterador estiver aberto; fechar o
+        iterador (ou cancelar a task) encerra o cursor e devolve a conexão.
+        ``timeout`` vale para cada lote buscado (ver ``execute_query``).
+        Com ``read_only=True`` lê da réplica; se ela falhar antes da primeira
+        linha, o stream recomeça no primário.
+        """
+        batch_size = batch_size or settings.DB_STREAM_BATCH_SIZE
+        timeout = settings.DB_STATEMENT_TIMEOUT if timeout is None else timeout
+        pool = await self._pool_for(read_only)
+        if pool is self._replica_pool:
+            started = False
+            try:
+                # aclosing: se o consumidor parar no meio, o cursor e a conexão são liberados já
+                async with aclosing(self._stream_from(pool, query, params, batch_size, timeout)) as rows:
+                    async for row in rows:
+                        started = True
+                        yield row
+                return
+            except Exception as e:
+                if started or not self._is_connection_error(e):
+                    raise
+                self._mark_replica_unhealthy(e)
+            pool = await self._pool_for(False)
+
+        async with aclosing(self._stream_from(pool, query, params, batch_size, timeout)) as rows:
+            async for row in rows:
+                yield row
+
+    async def _stream_from(
+        self, pool: ConnectionPool, query: str, params: tuple, batch_size: int, timeout: float
+    ) -> AsyncIterator[Row]:
+        async with pool.connection() as conn:
+            # Cursores nomeados só existem dentro de uma transação
+            async with conn.transaction():
+                async with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                    await self._run_cancellable(conn, cur.execute(query, params), timeout)
+                    index = None
+                    while True:
+                        rows = await self._run_cancellable(conn, cur.fetchmany(batch_size), timeout)
+                        if not rows:
+                            break
+                        if index is None:
+                            index = {desc[0]: i for i, desc in enumerate(cur.description)}
+                        for row in rows:
+                            yield Row(index, row)
+
+    async def _run_cancellable(self, conn: AsyncConnection, operation: Awaitable[Any], timeout: float | None) -> Any:
+        """Aguarda uma operação do cursor; no timeout ou cancelamento da task cancela a query no servidor.
+
+        Sem isso, ``wait_for``/desconexão do cliente só abandonaria o await: a
+        query continuaria rodando no NeonDB segurando a conexão e CPU.
+        """
+        task = asyncio.ensure_future(operation)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=timeout or None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if not task.done():
+                await self._cancel_backend(conn)
+            # Espera a query abortar (QueryCanceled) para a conexão voltar utilizável
+            try:
+                await task
+            except Exception:
+                pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise QueryTimeoutError(f"Query excedeu o tempo limite de {timeout}s e foi cancelada") from None
+
+    async def _cancel_backend(self, conn: AsyncConnection) -> None:
+        """Envia o cancelamento da query em execução ao servidor."""
+        try:
+            if hasattr(conn, "cancel_safe"):
+                await conn.cancel_safe()
+            else:
+                # psycopg < 3.2: cancel() é bloqueante
+                await asyncio.to_thread(conn.cancel)
+        except Exception as e:
+            print(f"[database] Falha ao cancelar query no servidor: {e}")
+
+    async def execute_one(self, query: str, params: tuple = ()) -> Row | None:
         """Executa query e retorna um único resultado."""
         results = await self.execute_query(query, params)
         return results[0] if results else None
 
 
 # Instância global do banco de dados
-db = Database(settings.DATABASE_URL)
-
+db = Database(settings.DATABASE_URL, settings.DATABASE_REPLICA_URL)
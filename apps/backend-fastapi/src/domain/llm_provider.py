@@ -18,6 +18,7 @@ class ProviderType(str, Enum):
     GOOGLE = "google"
     HUGGINGFACE = "huggingface"
     OPENROUTER = "openrouter"
+    LOCAL_FAKE = "local_fake"  # Stand-in local e determinístico (testes de carga, sem rede)
 
 
 class ProviderStatus(str, Enum):
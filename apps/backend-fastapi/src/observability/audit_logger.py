@@ -6,6 +6,12 @@ import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
+# Texto único da inserção de auditoria: o mesmo statement em todas as rotas
+# permite reaproveitar o prepared statement de cada conexão
+AUDIT_INSERT_SQL = (
+    "INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
 
 class AuditLogger:
     """Base logger responsável por gerar eventos imutáveis e gravá-los no storage local/S3."""
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from typing import Callable
 
+from src.config import settings
+
 
 class ChatMetrics:
     """Métricas de latência e performance do chat."""
@@ -52,11 +54,32 @@ class ChatMetrics:
 class LLMMetrics:
     """Métricas de uso e performance de provedores de LLM."""
 
-    def __init__(self) -> None:
+    # Janela de latências de chamadas reais por provedor (base dos percentis)
+    CALL_LATENCY_WINDOW = 200
+
+    def __init__(self, ewma_alpha: float = 0.3) -> None:
         self._provider_usage: dict[str, int] = defaultdict(int)
         self._provider_failures: dict[str, int] = defaultdict(int)
         self._provider_latencies: dict[str, list[float]] = defaultdict(list)
         self._circuit_breaker_opens: dict[str, int] = defaultdict(int)
+        self._call_latencies: dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=self.CALL_LATENCY_WINDOW)
+        )
+        self._call_timeouts: dict[str, int] = defaultdict(int)
+        # Timeouts seguidos, sem nenhuma chamada concluída entre eles
+        self._consecutive_timeouts: dict[str, int] = defaultdict(int)
+        self._hedges_fired: dict[str, int] = defaultdict(int)
+        self._hedges_won: dict[str, int] = defaultdict(int)
+        # Tokens por request (prompt da janela recente + totais)
+        self._prompt_tokens: dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=self.CALL_LATENCY_WINDOW)
+        )
+        self._prompt_tokens_total: dict[str, int] = defaultdict(int)
+        self._completion_tokens_total: dict[str, int] = defaultdict(int)
+        # Estimativas com decaimento exponencial (EWMA) usadas no roteamento "fastest"
+        self.ewma_alpha = ewma_alpha
+        self._ewma_latency: dict[str, float] = {}
+        self._ewma_error_rate: dict[str, float] = {}
 
     def record_usage(self, provider_id: str, latency: float) -> None:
         """Registra uso bem-sucedido de um provedor."""
@@ -66,11 +89,75 @@ class LLMMetrics:
     def record_failure(self, provider_id: str) -> None:
         """Registra falha de um provedor."""
         self._provider_failures[provider_id] += 1
+        self._update_ewma(self._ewma_error_rate, provider_id, 1.0)
 
     def record_circuit_breaker_open(self, provider_id: str) -> None:
         """Registra abertura de circuit breaker."""
         self._circuit_breaker_opens[provider_id] += 1
 
+    def record_call_latency(self, provider_id: str, latency: float) -> None:
+        """Registra latência de uma chamada concluída ao provedor (geração de SQL)."""
+        self._call_latencies[provider_id].append(latency)
+        self._consecutive_timeouts[provider_id] = 0
+        self._update_ewma(self._ewma_latency, provider_id, latency)
+        self._update_ewma(self._ewma_error_rate, provider_id, 0.0)
+
+    def record_call_timeout(self, provider_id: str, timeout: float) -> None:
+        """Registra uma chamada interrompida pelo timeout.
+
+        Não entra na janela de latências: um provedor fora do ar só estoura
+        timeouts, e contá-los como latência faria o percentil (e o timeout
+        adaptativo) subir até o teto. Conta como erro e nos timeouts seguidos
+        (ver ``consecutive_timeouts``).
+        """
+        self._call_timeouts[provider_id] += 1
+        self._consecutive_timeouts[provider_id] += 1
+        self._update_ewma(self._ewma_error_rate, provider_id, 1.0)
+
+    def consecutive_timeouts(self, provider_id: str) -> int:
+        """Timeouts seguidos do provedor desde a última chamada concluída."""
+        return self._consecutive_timeouts.get(provider_id, 0)
+
+    def _update_ewma(self, estimates: dict[str, float], provider_id: str, value: float) -> None:
+        """Atualiza a média com decaimento exponencial (a primeira amostra inicializa)."""
+        previous = estimates.get(provider_id)
+        if previous is None:
+            estimates[provider_id] = value
+        else:
+            estimates[provider_id] = self.ewma_alpha * value + (1 - self.ewma_alpha) * previous
+
+    def expected_completion_time(self, provider_id: str, failure_penalty: float) -> float | None:
+        """Tempo esperado até uma resposta do provedor (EWMA), ou None sem chamadas medidas.
+
+        Cada falha custa ``failure_penalty`` segundos (tipicamente o timeout
+        gasto antes do fallback), ponderado pela taxa de erro decaída.
+        """
+        latency = self._ewma_latency.get(provider_id)
+        if latency is None:
+            return None
+        return latency + self._ewma_error_rate.get(provider_id, 0.0) * failure_penalty
+
+    def latency_percentile(self, provider_id: str, percentile: float, min_samples: int = 1) -> float | None:
+        """Percentil da latência de chamadas recentes, ou None se houver poucas amostras."""
+        samples = self._call_latencies.get(provider_id)
+        if not samples or len(samples) < min_samples:
+            return None
+        sorted_values = sorted(samples)
+        index = min(int(len(sorted_values) * percentile), len(sorted_values) - 1)
+        return sorted_values[index]
+
+    def record_hedge(self, provider_id: str, won: bool) -> None:
+        """Registra um hedge disparado no provedor reserva provider_id (e se ele venceu)."""
+        self._hedges_fired[provider_id] += 1
+        if won:
+            self._hedges_won[provider_id] += 1
+
+    def record_token_usage(self, provider_id: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Registra os tokens de um request (somando todos os turnos do agente)."""
+        self._prompt_tokens[provider_id].append(prompt_tokens)
+        self._prompt_tokens_total[provider_id] += prompt_tokens
+        self._completion_tokens_total[provider_id] += completion_tokens
+
     def get_provider_stats(self, provider_id: str) -> dict:
         """Retorna estatísticas de um provedor."""
         total_requests = self._provider_usage[provider_id] + self._provider_failures[provider_id]
@@ -81,6 +168,7 @@ class LLMMetrics:
         )
         latencies = self._provider_latencies[provider_id]
         avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        prompt_tokens = self._prompt_tokens.get(provider_id)
 
         return {
             "total_requests": total_requests,
@@ -89,14 +177,39 @@ class LLMMetrics:
             "failure_rate": round(failure_rate, 4),
             "average_latency": round(avg_latency, 3),
             "circuit_breaker_opens": self._circuit_breaker_opens[provider_id],
+            "call_latency_p90": self.latency_percentile(provider_id, 0.90),
+            "call_timeouts": self._call_timeouts[provider_id],
+            "ewma_latency": round(self._ewma_latency[provider_id], 3) if provider_id in self._ewma_latency else None,
+            "ewma_error_rate": round(self._ewma_error_rate.get(provider_id, 0.0), 4),
+            "hedges_fired": self._hedges_fired[provider_id],
+            "hedges_won": self._hedges_won[provider_id],
+            "avg_prompt_tokens": round(sum(prompt_tokens) / len(prompt_tokens), 1) if prompt_tokens else None,
+            "prompt_tokens_total": self._prompt_tokens_total[provider_id],
+            "completion_tokens_total": self._completion_tokens_total[provider_id],
+        }
+
+    def get_hedge_stats(self) -> dict:
+        """Totais de hedging entre provedores."""
+        fired = sum(self._hedges_fired.values())
+        won = sum(self._hedges_won.values())
+        return {
+            "fired": fired,
+            "won": won,
+            "win_rate": round(won / fired, 4) if fired else 0.0,
         }
 
     def get_all_stats(self) -> dict[str, dict]:
         """Retorna estatísticas de todos os provedores."""
-        all_providers = set(self._provider_usage.keys()) | set(self._provider_failures.keys())
+        all_providers = (
+            set(self._provider_usage.keys())
+            | set(self._provider_failures.keys())
+            | set(self._call_latencies.keys())
+            | set(self._hedges_fired.keys())
+            | set(self._prompt_tokens.keys())
+        )
         return {provider_id: self.get_provider_stats(provider_id) for provider_id in all_providers}
 
 
 # Instâncias globais
 chat_metrics = ChatMetrics()
-llm_metrics = LLMMetrics()
+llm_metrics = LLMMetrics(ewma_alpha=settings.LLM_EWMA_ALPHA)
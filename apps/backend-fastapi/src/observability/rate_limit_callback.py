@@ -0,0 +1,64 @@
+"""Callback LangChain que consome a quota (rpm/rpd) do provedor a cada chamada ao modelo.
+
+Ligado em cada instância de chat model por ``LLMService._create_llm_instance``
+(``llm.callbacks``), então conta cada geração — inclusive cada passo de tool
+calling do agente — e só as que chegam ao provedor: obter a instância com
+``get_llm`` sem chamá-la (rotas que só executam SQL, warm-up, requests
+coalescidos) não gasta quota.
+
+O LangChain dispara ``on_chat_model_start`` antes de consultar o cache de
+completions, então o request é registrado no início (uma chamada cortada por
+timeout também conta) e devolvido no fim quando a geração veio do cache (ou o
+cache em modo replay não a tinha).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+    LANGCHAIN_CORE_AVAILABLE = True
+except ImportError:
+    BaseCallbackHandler = object
+    LANGCHAIN_CORE_AVAILABLE = False
+
+from src.observability.rate_limiter import ProviderRateLimiter, provider_rate_limiter
+from src.services.completion_cache import CACHE_HIT_INFO_KEY, CompletionCacheMiss
+
+
+def _served_from_cache(response: Any) -> bool:
+    """Se todas as gerações do resultado vieram do cache de completions."""
+    generations = [generation for batch in getattr(response, "generations", []) for generation in batch]
+    return bool(generations) and all(
+        (generation.generation_info or {}).get(CACHE_HIT_INFO_KEY) for generation in generations
+    )
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """Registra no ``ProviderRateLimiter`` um request do provedor a cada geração que chega ao modelo."""
+
+    # Só desconta tokens: roda na própria thread/loop da chamada, sem executor
+    run_inline = True
+
+    def __init__(self, provider_id: str, limiter: Optional[ProviderRateLimiter] = None):
+        self.provider_id = provider_id
+        self.limiter = limiter
+
+    @property
+    def _limiter(self) -> ProviderRateLimiter:
+        return self.limiter or provider_rate_limiter
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, **kwargs: Any) -> None:
+        self._limiter.record_request(self.provider_id)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> None:
+        self._limiter.record_request(self.provider_id)
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        if _served_from_cache(response):
+            self._limiter.refund_request(self.provider_id)
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        if isinstance(error, CompletionCacheMiss):
+            self._limiter.refund_request(self.provider_id)
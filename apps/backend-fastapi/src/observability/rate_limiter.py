@@ -0,0 +1,154 @@
+"""Rate limiting por provedor de LLM com token buckets (requests/min e requests/dia)."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Balde de tokens com reposição contínua.
+
+    Começa cheio com ``capacity`` tokens e repõe ``capacity`` tokens a cada
+    ``period`` segundos (proporcionalmente ao tempo decorrido).
+    """
+
+    def __init__(self, capacity: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.period = period
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.capacity / self.period)
+            self._updated_at = now
+
+    def available(self) -> float:
+        """Tokens disponíveis agora."""
+        self._refill()
+        return self._tokens
+
+    def consume(self, tokens: float = 1.0) -> None:
+        """Consome tokens mesmo sem saldo (o request já aconteceu): o saldo negativo é reposto antes do próximo."""
+        self._refill()
+        self._tokens -= tokens
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """Devolve tokens consumidos por um request que não chegou ao provedor."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class ProviderRateLimiter:
+    """Limites de requests/min e requests/dia por provedor.
+
+    ``LLMService`` consulta o limiter (``admit``) antes de escolher um provedor, de
+    modo que o failover acontece antes de o provedor responder 429. A quota só é
+    consumida quando o modelo é de fato chamado (``record_request``, pelo
+    ``RateLimitCallbackHandler`` de cada instância): um agente com vários passos
+    gasta um request por passo, obter a instância sem chamá-la não gasta nada e
+    gerações servidas pelo cache de completions são devolvidas (``refund_request``).
+    Provedores sem limite configurado nunca são barrados.
+    """
+
+    MINUTE = 60.0
+    DAY = 86400.0
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._throttled: Dict[str, int] = {}
+        self.configure(limits or {})
+
+    @staticmethod
+    def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+        """Lê limites no formato "google:15/1500,openrouter:20/50" (rpm/rpd; 0 = sem limite)."""
+        limits: Dict[str, Tuple[int, int]] = {}
+        for item in (spec or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                provider_id, values = item.split(":", 1)
+                rpm, _, rpd = values.partition("/")
+                limits[provider_id.strip().lower()] = (int(rpm or 0), int(rpd or 0))
+            except ValueError:
+                logger.warning(f"Limite de LLM inválido ignorado: '{item}' (use provedor:rpm/rpd)")
+        return limits
+
+    def configure(self, limits: Dict[str, Tuple[int, int]]) -> None:
+        """(Re)cria os buckets a partir de {provider_id: (rpm, rpd)}."""
+        with self._lock:
+            self._buckets = {}
+            for provider_id, (rpm, rpd) in limits.items():
+                buckets = {}
+                if rpm > 0:
+                    buckets["rpm"] = TokenBucket(rpm, self.MINUTE, self._clock)
+                if rpd > 0:
+                    buckets["rpd"] = TokenBucket(rpd, self.DAY, self._clock)
+                if buckets:
+                    self._buckets[provider_id] = buckets
+
+    def has_capacity(self, provider_id: str) -> bool:
+        """Indica se o provedor aceitaria mais um request agora (sem consumir)."""
+        with self._lock:
+            buckets = self._buckets.get(provider_id)
+            if not buckets:
+                return True
+            return all(bucket.available() >= 1 for bucket in buckets.values())
+
+    def admit(self, provider_id: str) -> bool:
+        """Como ``has_capacity``, mas conta em ``throttled`` quando o provedor é recusado."""
+        with self._lock:
+            buckets = self._buckets.get(provider_id)
+            if not buckets:
+                return True
+            if all(bucket.available() >= 1 for bucket in buckets.values()):
+                return True
+            self._throttled[provider_id] = self._throttled.get(provider_id, 0) + 1
+            return False
+
+    def record_request(self, provider_id: str) -> None:
+        """Desconta um request feito ao provedor de todos os seus limites."""
+        with self._lock:
+            for bucket in self._buckets.get(provider_id, {}).values():
+                bucket.consume()
+
+    def refund_request(self, provider_id: str) -> None:
+        """Devolve um request registrado que foi servido sem chamar o provedor (cache)."""
+        with self._lock:
+            for bucket in self._buckets.get(provider_id, {}).values():
+                bucket.refund()
+
+    def remaining_fraction(self, provider_id: str) -> float:
+        """Fração restante da quota mais apertada do provedor (1.0 = sem limite ou cheia)."""
+        with self._lock:
+            buckets = self._buckets.get(provider_id)
+            if not buckets:
+                return 1.0
+            return min(bucket.available() / bucket.capacity for bucket in buckets.values())
+
+    def get_stats(self, provider_id: str) -> Dict[str, object]:
+        """Limites e saldo atual do provedor."""
+        with self._lock:
+            buckets = self._buckets.get(provider_id, {})
+            stats: Dict[str, object] = {"throttled": self._throttled.get(provider_id, 0)}
+            for name, bucket in buckets.items():
+                stats[f"{name}_limit"] = bucket.capacity
+                stats[f"{name}_available"] = int(bucket.available())
+            return stats
+
+
+# Instância global (limites de LLM_RATE_LIMITS)
+provider_rate_limiter = ProviderRateLimiter(ProviderRateLimiter.parse_limits(settings.LLM_RATE_LIMITS))
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import csv
 import json
+from collections.abc import Mapping
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
@@ -66,11 +67,11 @@ class AuditExporter:
             rows = await db.execute_query(query, tuple(params))
             
             # Remove duplicatas baseado em (session_id, prompt, sql_executed, timestamp)
-            # O execute_query já retorna lista de dicionários
+            # O execute_query retorna linhas com acesso por nome (Row)
             seen = set()
             unique_rows = []
             for row in rows:
-                if not isinstance(row, dict):
+                if not isinstance(row, Mapping):
                     continue
                 
                 # Cria chave única para detectar duplicatas
@@ -83,7 +84,7 @@ class AuditExporter:
                 
                 if key not in seen:
                     seen.add(key)
-                    unique_rows.append(row)
+                    unique_rows.append(dict(row))
             
             rows = unique_rows
         except Exception as e:
@@ -2,17 +2,23 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import logging
 import os
-import shutil
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
 from uuid import UUID
 
+from src.config import settings
 from src.domain.cache_entry import CacheEntry
 from src.domain.validation_result import ValidationResult, ValidationStatus
+from src.services.cache_store import create_cache_store
 
 logger = logging.getLogger(__name__)
 
@@ -73,7 +79,7 @@ class ResponseValidator:
         # Valida formato bÃ¡sico dos resultados
         if results:
             for i, row in enumerate(results[:5]):  # Valida primeiras 5 linhas
-                if not isinstance(row, dict):
+                if not isinstance(row, Mapping):
                     errors.append(f"Linha {i+1} nÃ£o Ã© um dicionÃ¡rio")
                     continue
 
@@ -177,71 +183,111 @@ class ResponseValidator:
 
 
 class CacheService:
-    """Gerencia cache de perguntas e respostas conhecidas."""
+    """Gerencia cache de perguntas e respostas conhecidas.
+
+    O índice em memória (``_entries``) é copy-on-write: cada mutação monta um
+    dict novo e troca a referência sob ``_write_lock``, então leitores nunca
+    veem um índice pela metade enquanto uma gravação acontece. Nas rotas, use
+    as variantes ``a*`` (``aadd_entry``, ``adelete_entry``...): a serialização
+    e o I/O rodam na thread dedicada de gravação, fora do event loop.
+
+    Com ``CACHE_BACKEND=redis`` o store é compartilhado entre workers: as
+    mudanças dos outros chegam por notificação e são aplicadas entrada a
+    entrada no índice local (``_on_store_change``).
+    """
 
     def __init__(self, cache_file: Optional[str] = None):
-        """Inicializa serviÃ§o de cache."""
+        """Inicializa serviço de cache.
+
+        Args:
+            cache_file: Banco SQLite do cache; com sufixo ``.json`` (formato legado),
+                usa o ``.db`` ao lado e importa o JSON na primeira abertura. Com
+                CACHE_BACKEND=redis, é o cache local importado na primeira vez
+        """
+        base_dir = Path(__file__).parent.parent.parent
         if cache_file is None:
-            # Caminho padrÃ£o relativo ao diretÃ³rio do projeto
-            base_dir = Path(__file__).parent.parent.parent
-            cache_file = base_dir / "data" / "response_cache.json"
-        
-        self.cache_file = Path(cache_file)
-        self.cache_data: dict = {"version": "1.0", "last_updated": None, "entries": []}
+            # Caminho padrão relativo ao diretório do projeto
+            cache_file = base_dir / "data" / "response_cache.db"
+
+        cache_file = Path(cache_file)
+        self.legacy_file = cache_file if cache_file.suffix == ".json" else cache_file.with_suffix(".json")
+        self.cache_file = cache_file.with_suffix(".db")
+        self.store = create_cache_store(self.cache_file, legacy_json=self.legacy_file)
         self._entries: dict[UUID, CacheEntry] = {}
+        # Thread única de gravação: tira o I/O do event loop e mantém a ordem das gravações
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+        # Write-behind do uso: hits só acumulam o delta; flush_usage grava em lote
+        self._pending_usage: dict[UUID, int] = {}
+        self._usage_lock = threading.Lock()
+        # Serializa gravações e a troca do índice (remoção não pode ser desfeita pelo flush)
+        self._write_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Snapshots: tirados em background a cada N gravações ou intervalo (ver backup_due)
+        self._writes_since_backup = 0
+        self._last_backup_at = time.monotonic()
+        # Compactação: remoções liberam páginas só no compact, feito em background (ver compact_due)
+        self._deletes_since_compact = 0
+        self._last_compact_at = time.monotonic()
         self._load_cache()
+        self.store.subscribe(self._on_store_change)
 
     def _load_cache(self) -> None:
-        """Carrega cache do arquivo JSON."""
-        if not self.cache_file.exists():
-            logger.info(f"Arquivo de cache nÃ£o encontrado: {self.cache_file}. Criando novo.")
-            self._save_cache()
-            return
-
-        try:
-            with open(self.cache_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.cache_data = data
-                
-                # Converte entradas para objetos CacheEntry
-                self._entries = {}
-                for entry_dict in data.get("entries", []):
-                    try:
-                        entry = CacheEntry(**entry_dict)
-                        self._entries[entry.entry_id] = entry
-                    except Exception as e:
-                        logger.warning(f"Erro ao carregar entrada de cache: {e}")
-                        continue
-                
-                logger.info(f"Cache carregado: {len(self._entries)} entradas")
-        except Exception as e:
-            logger.error(f"Erro ao carregar cache: {e}")
-            self.cache_data = {"version": "1.0", "last_updated": None, "entries": []}
-            self._entries = {}
+        """Carrega as entradas do banco para o índice em memória."""
+        entries: dict[UUID, CacheEntry] = {}
+        for entry_dict in self.store.load_all():
+            try:
+                entry = CacheEntry(**entry_dict)
+                entries[entry.entry_id] = entry
+            except Exception as e:
+                logger.warning(f"Erro ao carregar entrada de cache: {e}")
+                continue
+        self._entries = entries
+        logger.info(f"Cache carregado: {len(self._entries)} entradas")
 
-    def _save_cache(self) -> None:
-        """Salva cache no arquivo JSON de forma atÃ´mica."""
+    def _save_entry(self, entry: CacheEntry) -> None:
+        """Grava só a entrada alterada e a publica no índice (chamar com ``_write_lock``)."""
         try:
-            # Cria diretÃ³rio se nÃ£o existir
-            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Atualiza timestamp
-            self.cache_data["last_updated"] = datetime.utcnow().isoformat()
-            self.cache_data["entries"] = [
-                entry.model_dump(mode='json') for entry in self._entries.values()
-            ]
-            
-            # Escreve em arquivo temporÃ¡rio primeiro
-            temp_file = self.cache_file.with_suffix(".tmp")
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(self.cache_data, f, indent=2, ensure_ascii=False)
-            
-            # Move arquivo temporÃ¡rio para o arquivo final (operaÃ§Ã£o atÃ´mica)
-            shutil.move(str(temp_file), str(self.cache_file))
-            logger.debug(f"Cache salvo: {len(self._entries)} entradas")
+            self.store.upsert(entry.model_dump(mode="json"))
         except Exception as e:
-            logger.error(f"Erro ao salvar cache: {e}")
+            logger.error(f"Erro ao salvar entrada de cache {entry.entry_id}: {e}")
             raise
+        self._entries = {**self._entries, entry.entry_id: entry}
+        # O store mantém o uso gravado numa atualização: o pendente segue para o flush
+        self._writes_since_backup += 1
+
+    def _on_store_change(self, op: str, entry_ids: list[str]) -> None:
+        """Aplica ao índice local uma mudança feita por outro worker (notificação do store)."""
+        with self._write_lock:
+            if op == "reload":
+                # Restore: o uso pendente era das entradas substituídas
+                with self._usage_lock:
+                    self._pending_usage.clear()
+                self._load_cache()
+                return
+            if op == "resync":
+                self._load_cache()
+                with self._usage_lock:
+                    for entry_id, count in self._pending_usage.items():
+                        if entry_id in self._entries:
+                            self._entries[entry_id].usage_count += count
+                return
+            entries = dict(self._entries)
+            for raw_id in entry_ids:
+                entry_id = UUID(raw_id)
+                data = self.store.get(raw_id) if op != "delete" else None
+                if data is None:
+                    entries.pop(entry_id, None)
+                    continue
+                entry = CacheEntry(**data)
+                # Usos deste worker ainda não gravados continuam valendo
+                entry.usage_count += self._pending_usage.get(entry_id, 0)
+                entries[entry_id] = entry
+            self._entries = entries
+
+    async def _run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Executa ``func`` na thread de gravação do cache."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
 
     def get_entry(self, entry_id: UUID) -> Optional[CacheEntry]:
         """Retorna entrada de cache por ID."""
@@ -253,11 +299,8 @@ class CacheService:
 
     def add_entry(self, entry: CacheEntry) -> None:
         """Adiciona nova entrada ao cache."""
-        # Cria backup antes de adicionar
-        self.create_backup()
-        
-        self._entries[entry.entry_id] = entry
-        self._save_cache()
+        with self._write_lock:
+            self._save_entry(entry)
         logger.info(f"Entrada adicionada ao cache: {entry.entry_id}")
 
     def update_entry(self, entry: CacheEntry) -> None:
@@ -265,27 +308,122 @@ class CacheService:
         if entry.entry_id not in self._entries:
             raise ValueError(f"Entrada {entry.entry_id} nÃ£o encontrada no cache")
         
-        self._entries[entry.entry_id] = entry
-        self._save_cache()
+        with self._write_lock:
+            self._save_entry(entry)
         logger.debug(f"Entrada atualizada no cache: {entry.entry_id}")
 
+    async def aadd_entry(self, entry: CacheEntry) -> None:
+        """``add_entry`` fora do event loop."""
+        await self._run(self.add_entry, entry)
+
+    async def aupdate_entry(self, entry: CacheEntry) -> None:
+        """``update_entry`` fora do event loop."""
+        await self._run(self.update_entry, entry)
+
+    async def adelete_entry(self, entry_id: UUID) -> None:
+        """``delete_entry`` fora do event loop."""
+        await self._run(self.delete_entry, entry_id)
+
+    async def aflush_usage(self) -> int:
+        """``flush_usage`` fora do event loop."""
+        return await self._run(self.flush_usage)
+
+    async def acleanup_cache(self, max_size_mb: float = 10.0, max_age_days: int = 30) -> int:
+        """``cleanup_cache`` fora do event loop."""
+        return await self._run(self.cleanup_cache, max_size_mb, max_age_days)
+
+    async def acreate_backup(self) -> Optional[Path]:
+        """``create_backup`` fora do event loop."""
+        return await self._run(self.create_backup)
+
+    async def acompact(self) -> None:
+        """``compact`` fora do event loop."""
+        await self._run(self.compact)
+
     def increment_usage(self, entry_id: UUID) -> None:
-        """Incrementa contador de uso de uma entrada."""
+        """Incrementa contador de uso de uma entrada.
+
+        Só altera a entrada em memória (sem I/O no caminho do cache hit); o
+        contador vai para o disco no próximo ``flush_usage``.
+        """
         entry = self._entries.get(entry_id)
         if entry:
             entry.increment_usage()
-            self._save_cache()
+            with self._usage_lock:
+                self._pending_usage[entry_id] = self._pending_usage.get(entry_id, 0) + 1
+
+    def flush_usage(self) -> int:
+        """Soma no store, numa transação, o uso pendente das entradas; retorna quantas.
+
+        Grava deltas (não o valor absoluto): workers que compartilham o store
+        não sobrescrevem os usos uns dos outros.
+        """
+        with self._usage_lock:
+            pending, self._pending_usage = self._pending_usage, {}
+        if not pending:
+            return 0
+        with self._write_lock:
+            usage = {
+                str(entry_id): (count, self._entries[entry_id].last_used.isoformat())
+                for entry_id, count in pending.items()
+                if entry_id in self._entries and self._entries[entry_id].last_used
+            }
+            try:
+                self.store.add_usage(usage)
+            except Exception as e:
+                # Devolve para a próxima tentativa
+                with self._usage_lock:
+                    for entry_id, count in pending.items():
+                        self._pending_usage[entry_id] = self._pending_usage.get(entry_id, 0) + count
+                logger.error(f"Erro ao gravar uso do cache: {e}")
+                return 0
+            self._writes_since_backup += len(usage)
+        logger.debug(f"Uso do cache gravado: {len(usage)} entradas")
+        return len(usage)
+
+    async def _persistence_loop(self, interval: float) -> None:
+        """A cada ``interval`` segundos grava o uso pendente e, se devidos, tira um snapshot e compacta."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.aflush_usage()
+                if self.backup_due():
+                    await self.acreate_backup()
+                if self.compact_due():
+                    await self.acompact()
+            except Exception as e:
+                logger.error(f"Erro na persistência periódica do cache: {e}")
+
+    async def start_background_persistence(self, interval: Optional[float] = None) -> None:
+        """Inicia o flush periódico do uso (CACHE_USAGE_FLUSH_SECONDS) e dos snapshots."""
+        interval = interval if interval is not None else settings.CACHE_USAGE_FLUSH_SECONDS
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._persistence_loop(interval))
+            logger.info(f"Persistência do cache em background iniciada (a cada {interval:g}s)")
+
+    async def stop_background_persistence(self) -> None:
+        """Para a persistência periódica e grava o uso que estiver pendente."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.aflush_usage()
 
     def delete_entry(self, entry_id: UUID) -> None:
         """Remove entrada do cache."""
         if entry_id in self._entries:
-            del self._entries[entry_id]
-            self._save_cache()
+            with self._write_lock:
+                self.store.delete(str(entry_id))
+                self._entries = {k: v for k, v in self._entries.items() if k != entry_id}
+                self._writes_since_backup += 1
+                self._deletes_since_compact += 1
             logger.info(f"Entrada removida do cache: {entry_id}")
 
     def cleanup_cache(self, max_size_mb: float = 10.0, max_age_days: int = 30) -> int:
         """Limpa cache removendo entradas antigas ou menos usadas."""
-        cache_size_mb = self.cache_file.stat().st_size / (1024 * 1024)
+        cache_size_mb = self.store.size_bytes() / (1024 * 1024)
         
         if cache_size_mb <= max_size_mb:
             return 0
@@ -294,8 +432,9 @@ class CacheService:
         cutoff_date = datetime.utcnow() - timedelta(days=max_age_days)
         
         # Remove entradas antigas ou pouco usadas
+        current = self._entries
         entries_to_remove = []
-        for entry in self._entries.values():
+        for entry in current.values():
             should_remove = False
             
             # Remove se muito antiga e pouco usada
@@ -314,10 +453,10 @@ class CacheService:
                 entries_to_remove.append(entry.entry_id)
         
         # MantÃ©m pelo menos 50 entradas mais usadas
-        if len(self._entries) - len(entries_to_remove) < 50:
+        if len(current) - len(entries_to_remove) < 50:
             # Ordena por uso e mantÃ©m as top 50
             sorted_entries = sorted(
-                self._entries.values(),
+                current.values(),
                 key=lambda x: x.usage_count,
                 reverse=True
             )
@@ -327,62 +466,121 @@ class CacheService:
             ]
         
         # Remove entradas selecionadas
-        for entry_id in entries_to_remove:
-            del self._entries[entry_id]
-            removed_count += 1
+        removed = set(entries_to_remove)
+        with self._write_lock:
+            if removed:
+                self.store.delete_many(str(entry_id) for entry_id in removed)
+                self._entries = {k: v for k, v in self._entries.items() if k not in removed}
+                removed_count = len(removed)
+                self._writes_since_backup += removed_count
+                # O espaço é liberado pelo compact em background, fora do request
+                self._deletes_since_compact += removed_count
         
         if removed_count > 0:
-            self._save_cache()
             logger.info(f"Cache limpo: {removed_count} entradas removidas")
         
         return removed_count
 
-    def create_backup(self) -> Path:
-        """Cria backup do cache com timestamp."""
-        if not self.cache_file.exists():
-            return None
-        
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        backup_file = self.cache_file.parent / f"{self.cache_file.stem}.backup.{timestamp}.json"
-        
+    def backup_due(self) -> bool:
+        """Se há gravações desde o último snapshot e já passou o intervalo ou o limite de gravações."""
+        if self._writes_since_backup == 0:
+            return False
+        return (
+            self._writes_since_backup >= settings.CACHE_BACKUP_EVERY_WRITES
+            or time.monotonic() - self._last_backup_at >= settings.CACHE_BACKUP_INTERVAL_SECONDS
+        )
+
+    def compact_due(self) -> bool:
+        """Se houve remoções desde a última compactação e já passou CACHE_COMPACT_INTERVAL_SECONDS."""
+        if self._deletes_since_compact == 0:
+            return False
+        return time.monotonic() - self._last_compact_at >= settings.CACHE_COMPACT_INTERVAL_SECONDS
+
+    def compact(self) -> None:
+        """Libera o espaço das entradas removidas (roda em background, ver ``_persistence_loop``)."""
+        deletes = self._deletes_since_compact
         try:
-            shutil.copy2(self.cache_file, backup_file)
+            self.store.compact()
+        except Exception as e:
+            logger.error(f"Erro ao compactar o cache: {e}")
+            return
+        self._deletes_since_compact = max(0, self._deletes_since_compact - deletes)
+        self._last_compact_at = time.monotonic()
+        logger.debug(f"Cache compactado após {deletes} remoções")
+
+    def create_backup(self) -> Optional[Path]:
+        """Cria snapshot do cache com timestamp.
+
+        Roda em background (``_persistence_loop``) e não bloqueia as gravações:
+        no SQLite, lê um snapshot do WAL por uma conexão própria; no Redis,
+        grava as entradas num arquivo SQLite. Cada snapshot é uma cópia completa
+        (ver ``SQLiteCacheStore.backup``); o custo é limitado pela frequência.
+        """
+        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        backup_file = self.cache_file.parent / f"{self.cache_file.stem}.backup.{timestamp}.db"
+        writes = self._writes_since_backup
+
+        try:
+            self.store.backup(backup_file)
+            self._writes_since_backup = max(0, self._writes_since_backup - writes)
+            self._last_backup_at = time.monotonic()
             logger.info(f"Backup criado: {backup_file}")
-            
-            # Limpa backups antigos (mantÃ©m Ãºltimos 5)
-            self._cleanup_old_backups(keep=5)
-            
+
+            # Limpa backups antigos
+            self._cleanup_old_backups(keep=settings.CACHE_BACKUP_KEEP)
+
             return backup_file
         except Exception as e:
             logger.error(f"Erro ao criar backup: {e}")
             return None
 
+    def list_backups(self) -> list[Path]:
+        """Snapshots existentes, do mais recente para o mais antigo."""
+        return sorted(self.cache_file.parent.glob(f"{self.cache_file.stem}.backup.*.db"), reverse=True)
+
     def _cleanup_old_backups(self, keep: int = 5) -> None:
-        """Remove backups antigos, mantendo apenas os Ãºltimos N."""
-        backup_pattern = f"{self.cache_file.stem}.backup.*.json"
-        backups = sorted(
-            self.cache_file.parent.glob(backup_pattern),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
-        
-        # Remove backups alÃ©m do limite
-        for backup in backups[keep:]:
+        """Remove backups antigos, mantendo apenas os últimos N."""
+        # Remove backups além do limite (o timestamp no nome ordena por data)
+        for backup in self.list_backups()[keep:]:
             try:
                 backup.unlink()
                 logger.debug(f"Backup antigo removido: {backup}")
             except Exception as e:
                 logger.warning(f"Erro ao remover backup {backup}: {e}")
 
+    def restore_backup(self, backup_file: Optional[Path] = None) -> Path:
+        """Restaura o cache a partir de um snapshot (padrão: o mais recente) e recarrega o índice.
+
+        Raises:
+            FileNotFoundError: Se não houver snapshot
+        """
+        if backup_file is None:
+            backups = self.list_backups()
+            if not backups:
+                raise FileNotFoundError(f"Nenhum backup de {self.cache_file.name} em {self.cache_file.parent}")
+            backup_file = backups[0]
+        backup_file = Path(backup_file)
+        if not backup_file.exists():
+            raise FileNotFoundError(f"Backup não encontrado: {backup_file}")
+
+        with self._write_lock:
+            with self._usage_lock:
+                self._pending_usage.clear()
+            self.store.restore(backup_file)
+            self._load_cache()
+        logger.info(f"Cache restaurado de {backup_file}: {len(self._entries)} entradas")
+        return backup_file
+
     def get_stats(self) -> dict:
         """Retorna estatÃ­sticas do cache."""
         total_requests = sum(e.usage_count for e in self._entries.values())
-        cache_size_bytes = self.cache_file.stat().st_size if self.cache_file.exists() else 0
+        cache_size_bytes = self.store.size_bytes()
         
         return {
             "total_entries": len(self._entries),
             "total_requests": total_requests,
             "cache_size_bytes": cache_size_bytes,
+            "pending_usage_writes": len(self._pending_usage),
             "cache_hit_rate": 0.0,  # SerÃ¡ calculado externamente
         }
 
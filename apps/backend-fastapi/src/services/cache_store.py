@@ -0,0 +1,267 @@
+"""Persistência incremental do cache de respostas (``CacheService``).
+
+Cada entrada é uma linha de uma tabela SQLite em modo WAL: adicionar, atualizar
+ou remover uma entrada grava só aquela linha (O(1)), em vez de reescrever o
+arquivo JSON inteiro. O WAL é reincorporado ao banco pelo checkpoint automático
+do SQLite e ``compact`` devolve ao disco o espaço das linhas removidas, então o
+carregamento lê apenas as entradas vivas.
+
+O ``response_cache.json`` legado é importado na primeira abertura do banco.
+
+Com ``CACHE_BACKEND=redis``, ``create_cache_store`` devolve um
+``RedisCacheStore`` (mesma interface), compartilhado entre workers e nós.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    entry_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+)
+"""
+
+
+def read_legacy_json(json_path: str | Path) -> list[dict[str, Any]]:
+    """Entradas de um ``response_cache.json`` (formato legado); vazio se não existir."""
+    json_path = Path(json_path)
+    if not json_path.exists():
+        return []
+    try:
+        with open(json_path, "r", encoding="utf-8-sig") as f:
+            entries = json.load(f).get("entries", [])
+    except Exception as e:
+        logger.error(f"Erro ao importar cache legado {json_path}: {e}")
+        return []
+    return [entry for entry in entries if isinstance(entry, dict) and entry.get("entry_id")]
+
+
+def read_sqlite_entries(db_path: str | Path) -> list[dict[str, Any]]:
+    """Entradas de um banco/snapshot SQLite do cache, aberto só para leitura."""
+    conn = sqlite3.connect(f"file:{Path(db_path)}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT data FROM entries ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+    return [json.loads(data) for (data,) in rows]
+
+
+class SQLiteCacheStore:
+    """Entradas do cache de respostas em um arquivo SQLite (WAL), uma linha por entrada."""
+
+    def __init__(self, path: str | Path, legacy_json: Optional[str | Path] = None):
+        """Abre (ou cria) o banco em ``path``.
+
+        Args:
+            path: Arquivo SQLite do cache
+            legacy_json: ``response_cache.json`` importado se o banco ainda não existir
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists()
+
+        self._lock = threading.Lock()
+        # Autocommit: cada comando é uma transação; a conexão é compartilhada
+        # entre threads e serializada por _lock
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        if is_new:
+            # Só tem efeito antes da primeira tabela; permite compactar sem VACUUM completo
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # Em WAL, NORMAL só perde as últimas transações numa queda de energia, nunca corrompe
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(SCHEMA)
+
+        if is_new and legacy_json is not None:
+            self.import_json(legacy_json)
+
+    def load_all(self) -> list[dict[str, Any]]:
+        """Retorna todas as entradas (dicts no formato de ``CacheEntry.model_dump``)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT entry_id, data FROM entries ORDER BY rowid").fetchall()
+        entries = []
+        for entry_id, data in rows:
+            try:
+                entries.append(json.loads(data))
+            except ValueError as e:
+                logger.warning(f"Entrada de cache ilegível ignorada ({entry_id}): {e}")
+        return entries
+
+    def get(self, entry_id: str) -> Optional[dict[str, Any]]:
+        """Retorna uma entrada, ou None se não existir."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM entries WHERE entry_id = ?", (str(entry_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, entry: dict[str, Any]) -> None:
+        """Grava (insere ou substitui) uma entrada."""
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries: Iterable[dict[str, Any]]) -> None:
+        """Grava várias entradas numa única transação.
+
+        Numa entrada existente, ``usage_count`` e ``last_used`` gravados são
+        mantidos: o uso só muda por ``add_usage``.
+        """
+        rows = [(str(entry["entry_id"]), json.dumps(entry, ensure_ascii=False)) for entry in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO entries (entry_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(entry_id) DO UPDATE SET data = json_set(excluded.data, "
+                    "'$.usage_count', COALESCE(json_extract(entries.data, '$.usage_count'), 0), "
+                    "'$.last_used', json_extract(entries.data, '$.last_used')), "
+                    "updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')",
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def delete(self, entry_id: str) -> None:
+        """Remove uma entrada (sem erro se não existir)."""
+        self.delete_many([entry_id])
+
+    def delete_many(self, entry_ids: Iterable[str]) -> None:
+        """Remove várias entradas numa única transação."""
+        rows = [(str(entry_id),) for entry_id in entry_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("DELETE FROM entries WHERE entry_id = ?", rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def add_usage(self, usage: dict[str, tuple[int, str]]) -> None:
+        """Soma usos às entradas numa única transação.
+
+        Args:
+            usage: entry_id -> (usos a somar, ``last_used`` em ISO 8601)
+        """
+        rows = [(count, last_used, str(entry_id)) for entry_id, (count, last_used) in usage.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # Incremento no próprio banco: outro processo usando o mesmo arquivo não perde usos
+                self._conn.executemany(
+                    "UPDATE entries SET data = json_set(data, "
+                    "'$.usage_count', COALESCE(json_extract(data, '$.usage_count'), 0) + ?, "
+                    "'$.last_used', ?) WHERE entry_id = ?",
+                    rows,
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def subscribe(self, handler: Callable[[str, list[str]], None]) -> None:
+        """Sem notificação de mudanças: o arquivo é local ao processo."""
+
+    def count(self) -> int:
+        """Número de entradas gravadas."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def import_json(self, json_path: str | Path) -> int:
+        """Importa as entradas de um ``response_cache.json`` (formato legado); retorna quantas."""
+        entries = read_legacy_json(json_path)
+        self.upsert_many(entries)
+        logger.info(f"Cache legado importado de {json_path}: {len(entries)} entradas")
+        return len(entries)
+
+    def compact(self) -> None:
+        """Reincorpora o WAL ao banco e libera as páginas de entradas removidas."""
+        with self._lock:
+            # Cada passo do pragma libera uma página; executescript roda até o fim
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def backup(self, dest: str | Path) -> None:
+        """Copia o banco (com o conteúdo do WAL) para ``dest`` pela API de backup do SQLite.
+
+        Usa uma conexão de leitura própria: em WAL ela vê um snapshot consistente
+        e as gravações seguem durante a cópia. Grava num temporário e renomeia.
+
+        A cópia é completa de propósito, não um segmento incremental: os frames
+        do WAL somem no checkpoint automático (um segmento perderia gravações),
+        linhas alteradas exigiriam marcas de remoção e restaurar uma cadeia base +
+        segmentos, e reflink (copy-on-write) depende do sistema de arquivos. O
+        cache tem poucos MB e a cópia roda em background no máximo a cada
+        CACHE_BACKUP_INTERVAL_SECONDS / CACHE_BACKUP_EVERY_WRITES, então cada
+        snapshot fica autossuficiente (restaurar e podar = um arquivo).
+        """
+        dest = Path(dest)
+        tmp = dest.with_name(dest.name + ".tmp")
+        source = sqlite3.connect(str(self.path))
+        target = sqlite3.connect(str(tmp))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp, dest)
+
+    def restore(self, source_path: str | Path) -> None:
+        """Substitui o conteúdo do banco pelo de um backup."""
+        source = sqlite3.connect(str(source_path))
+        try:
+            with self._lock:
+                source.backup(self._conn)
+        finally:
+            source.close()
+
+    def size_bytes(self) -> int:
+        """Tamanho em disco (banco + WAL)."""
+        wal = self.path.with_name(self.path.name + "-wal")
+        return sum(p.stat().st_size for p in (self.path, wal) if p.exists())
+
+    def close(self) -> None:
+        """Fecha a conexão (faz checkpoint do WAL)."""
+        with self._lock:
+            self._conn.close()
+
+
+def create_cache_store(path: str | Path, legacy_json: Optional[str | Path] = None):
+    """Cria o store configurado em CACHE_BACKEND (``sqlite`` ou ``redis``).
+
+    Raises:
+        RuntimeError: Se CACHE_BACKEND=redis sem REDIS_URL ou sem o pacote ``redis``
+    """
+    if settings.CACHE_BACKEND != "redis":
+        return SQLiteCacheStore(path, legacy_json=legacy_json)
+
+    # Não cai para o SQLite local: cada worker teria um cache próprio e divergente
+    if not settings.REDIS_URL:
+        raise RuntimeError("CACHE_BACKEND=redis requer REDIS_URL")
+
+    from src.services.redis_cache_store import RedisCacheStore, redis_client_from_url
+
+    client = redis_client_from_url(settings.REDIS_URL)
+    if client is None:
+        raise RuntimeError("CACHE_BACKEND=redis requer o pacote redis (poetry install -E redis)")
+    store = RedisCacheStore(client, prefix=settings.CACHE_REDIS_PREFIX)
+    store.import_once(local_db=path, legacy_json=legacy_json)
+    return store
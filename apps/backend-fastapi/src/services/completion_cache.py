@@ -0,0 +1,219 @@
+"""Cache persistente de completions de LLM (record/replay), abaixo do SQLAgent.
+
+Implementa a interface ``BaseCache`` do LangChain e é ligado em cada instância
+de chat model (``llm.cache``), então cobre também os turnos intermediários de
+tool calling do agente. A chave é o hash de (prompt serializado, parâmetros do
+modelo — inclui modelo, temperatura e ferramentas — e versão do schema).
+
+Modos (LLM_COMPLETION_CACHE_MODE):
+- ``off``: desligado
+- ``record``: lê do cache e grava o que faltar
+- ``replay``: só lê; um miss levanta ``CompletionCacheMiss`` (benchmarks sem rede)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+try:
+    from langchain_core.caches import BaseCache
+    from langchain_core.messages import message_to_dict, messages_from_dict
+    from langchain_core.outputs import ChatGeneration, Generation
+    LANGCHAIN_CORE_AVAILABLE = True
+except ImportError:
+    BaseCache = object
+    LANGCHAIN_CORE_AVAILABLE = False
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+# Marca (generation_info) das gerações servidas pelo cache, sem chamar o modelo
+CACHE_HIT_INFO_KEY = "completion_cache_hit"
+
+
+class CompletionCacheMiss(LookupError):
+    """Completion ausente no cache em modo replay."""
+
+
+class CompletionCache(BaseCache):
+    """Cache de completions em disco, endereçado por conteúdo, com limite de tamanho (LRU)."""
+
+    def __init__(self, directory: str, max_bytes: int, mode: str = "record"):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cache inválido: {mode} (use {', '.join(MODES)})")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._lock = threading.Lock()
+        # chave -> tamanho em bytes, da menos para a mais recentemente usada (ordem LRU);
+        # reconstruído do disco na inicialização
+        self._index: Dict[str, int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+        self._load_index()
+
+    # ------------------------------------------------------------------ chave / disco
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str, schema_version: Optional[str] = None) -> str:
+        """Hash do prompt + parâmetros do modelo + versão do schema."""
+        payload = json.dumps([prompt, llm_string, schema_version or ""], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        if not self.directory.exists():
+            return
+        entries = [(path.stat(), path.stem) for path in self.directory.glob("*/*.json")]
+        for stat, key in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            self._index[key] = stat.st_size
+            self._bytes += stat.st_size
+
+    @staticmethod
+    def _schema_version() -> Optional[str]:
+        from src.services.schema_detector_service import SchemaDetectorService
+
+        return SchemaDetectorService.get_schema_version()
+
+    # ------------------------------------------------------------------ serialização
+
+    @staticmethod
+    def _dump(generations: Sequence[Any]) -> list:
+        items = []
+        for generation in generations:
+            item = {"text": generation.text}
+            if isinstance(generation, ChatGeneration):
+                item["message"] = message_to_dict(generation.message)
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _load(items: list) -> list:
+        generations = []
+        info = {CACHE_HIT_INFO_KEY: True}
+        for item in items:
+            if "message" in item:
+                message = messages_from_dict([item["message"]])[0]
+                generations.append(ChatGeneration(message=message, generation_info=info))
+            else:
+                generations.append(Generation(text=item["text"], generation_info=info))
+        return generations
+
+    # ------------------------------------------------------------------ BaseCache
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        """Retorna as gerações gravadas ou None (em replay, levanta CompletionCacheMiss)."""
+        if self.mode == "off":
+            return None
+        key = self.make_key(prompt, llm_string, self._schema_version())
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    items = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                items = None
+            if items is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._index[key] = self._index.pop(key, None) or path.stat().st_size
+        if items is None:
+            if self.mode == "replay":
+                raise CompletionCacheMiss(f"Completion {key[:12]} não gravada (LLM_COMPLETION_CACHE_MODE=replay)")
+            return None
+        return self._load(items)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        """Grava as gerações (somente em modo record)."""
+        if self.mode != "record":
+            return
+        key = self.make_key(prompt, llm_string, self._schema_version())
+        data = json.dumps(self._dump(return_val), ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            self._writes += 1
+            self._evict_locked()
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove todas as completions gravadas."""
+        with self._lock:
+            for key in list(self._index):
+                self._remove_locked(key)
+
+    # ------------------------------------------------------------------ eviction
+
+    def _remove_locked(self, key: str) -> None:
+        self._bytes -= self._index.pop(key)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict_locked(self) -> None:
+        """Remove as entradas menos usadas até ficar em 90% do limite."""
+        if self.max_bytes <= 0 or self._bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key in list(self._index):
+            if self._bytes <= target:
+                break
+            self._remove_locked(key)
+            self._evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "mode": self.mode,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "writes": self._writes,
+                "evictions": self._evictions,
+            }
+
+
+_completion_cache: Optional[CompletionCache] = None
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Cache global conforme LLM_COMPLETION_CACHE_*; None se desligado ou sem LangChain."""
+    global _completion_cache
+    mode = settings.LLM_COMPLETION_CACHE_MODE.lower()
+    if mode == "off" or not LANGCHAIN_CORE_AVAILABLE:
+        return None
+    if _completion_cache is None or _completion_cache.mode != mode:
+        _completion_cache = CompletionCache(
+            settings.LLM_COMPLETION_CACHE_DIR,
+            max_bytes=int(settings.LLM_COMPLETION_CACHE_MAX_MB * 1024 * 1024),
+            mode=mode,
+        )
+        logger.info(f"Cache de completions LLM ativo ({mode}) em {settings.LLM_COMPLETION_CACHE_DIR}")
+    return _completion_cache
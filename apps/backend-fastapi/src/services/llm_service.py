@@ -3,42 +3,48 @@
 from __future__ import annotations
 
 import asyncio
+import importlib
+import importlib.util
 import logging
-from datetime import datetime, date
-from typing import Optional
+import random
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Optional
 
-# Importa bibliotecas LangChain de forma independente
-# Se pelo menos langchain-core estiver disponível, consideramos LangChain disponível
-try:
+# LangChain é considerado disponível se langchain-core estiver instalado. Só checa
+# a presença do pacote: importar o LangChain e os SDKs dos provedores custa ~1s e
+# fica para quando um provedor configurado for de fato instanciado
+LANGCHAIN_AVAILABLE = importlib.util.find_spec("langchain_core") is not None
+
+if TYPE_CHECKING:
     from langchain_core.language_models import BaseLanguageModel
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    BaseLanguageModel = object
-    LANGCHAIN_AVAILABLE = False
 
-# Importa provedores específicos (opcionais)
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    ChatOpenAI = None
+# Classe LangChain de cada provedor: (módulo, classe), importada sob demanda
+PROVIDER_CLASSES = {
+    "ChatOpenAI": ("langchain_openai", "ChatOpenAI"),
+    "ChatAnthropic": ("langchain_anthropic", "ChatAnthropic"),
+    "ChatGoogleGenerativeAI": ("langchain_google_genai", "ChatGoogleGenerativeAI"),
+}
+_provider_class_cache: dict[str, Any] = {}
 
-try:
-    from langchain_anthropic import ChatAnthropic
-except ImportError:
-    ChatAnthropic = None
 
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-except ImportError:
-    ChatGoogleGenerativeAI = None
+def load_provider_class(name: str) -> Any:
+    """Importa a classe LangChain ``name`` (ver PROVIDER_CLASSES) na primeira chamada.
+
+    Returns:
+        A classe, ou None se o pacote do provedor não estiver instalado
+    """
+    if name not in _provider_class_cache:
+        module_name, attr = PROVIDER_CLASSES[name]
+        try:
+            _provider_class_cache[name] = getattr(importlib.import_module(module_name), attr)
+        except ImportError:
+            _provider_class_cache[name] = None
+    return _provider_class_cache[name]
 
-try:
-    from langchain_huggingface import HuggingFaceEndpoint
-except ImportError:
-    HuggingFaceEndpoint = None
 
 from src.config import settings
 from src.domain.llm_provider import LLMProvider, ProviderType, ProviderStatus
+from src.observability.rate_limiter import provider_rate_limiter
 
 # Tenta importar métricas, mas não falha se não existir
 try:
@@ -49,6 +55,13 @@ except ImportError:
         def record_usage(self, provider_id, latency): pass
         def record_failure(self, provider_id): pass
         def record_circuit_breaker_open(self, provider_id): pass
+        def record_call_latency(self, provider_id, latency): pass
+        def record_call_timeout(self, provider_id, timeout): pass
+        def latency_percentile(self, provider_id, percentile, min_samples=1): return None
+        def consecutive_timeouts(self, provider_id): return 0
+        def record_hedge(self, provider_id, won): pass
+        def expected_completion_time(self, provider_id, failure_penalty): return None
+        def record_token_usage(self, provider_id, prompt_tokens, completion_tokens): pass
     llm_metrics = MockMetrics()
 
 logger = logging.getLogger(__name__)
@@ -63,6 +76,10 @@ class LLMService:
     _health_check_task: Optional[asyncio.Task] = None
     _initialized: bool = False
     _usage_tracking: dict[str, dict] = {}  # Rastreia uso diário/mensal por provedor
+    _client_timeouts: dict[str, float] = {}  # Timeout do cliente HTTP com que cada instância foi criada
+
+    # Diferença relativa entre o timeout efetivo e o do cliente HTTP que faz o health check recriar a instância
+    CLIENT_TIMEOUT_TOLERANCE = 0.2
 
     @classmethod
     def _initialize_providers(cls) -> None:
@@ -174,6 +191,24 @@ class LLMService:
                 cls._providers["openrouter"] = provider
                 priority += 1
 
+            # Stand-in local (testes de carga/latência sem rede nem quota)
+            elif provider_id == "local_fake":
+                provider = LLMProvider(
+                    provider_id="local_fake",
+                    provider_type=ProviderType.LOCAL_FAKE,
+                    priority=priority,
+                    enabled=True,
+                )
+                llm = cls._create_llm_instance(provider)
+                if llm:
+                    cls._llm_instances["local_fake"] = llm
+                    provider.mark_available()
+                else:
+                    provider.mark_unavailable()
+                cls._providers["local_fake"] = provider
+                priority += 1
+                logger.warning("⚠️ Provedor local_fake habilitado: respostas simuladas, não use em produção")
+
             # OpenAI (fallback)
             elif provider_id == "openai":
                 if not settings.OPENAI_API_KEY:
@@ -211,14 +246,47 @@ class LLMService:
 
     @classmethod
     def _create_llm_instance(cls, provider: LLMProvider) -> Optional[BaseLanguageModel]:
+        """Cria instância LangChain para o provedor e liga o cache de completions (se ativo).
+
+        A instância recebe o callback que desconta a quota (rpm/rpd) do provedor
+        a cada chamada ao modelo.
+        """
+        llm = cls._build_llm_instance(provider)
+        if llm is None:
+            return None
+        from src.observability.rate_limit_callback import RateLimitCallbackHandler
+        from src.services.completion_cache import get_completion_cache
+
+        llm.callbacks = [*(llm.callbacks or []), RateLimitCallbackHandler(provider.provider_id, provider_rate_limiter)]
+
+        completion_cache = get_completion_cache()
+        if completion_cache is not None:
+            # Cache por instância: cobre todas as gerações do agente, inclusive tool calling
+            llm.cache = completion_cache
+        return llm
+
+    @classmethod
+    def _build_llm_instance(cls, provider: LLMProvider) -> Optional[BaseLanguageModel]:
         """Cria instância LangChain para o provedor especificado com timeout configurado."""
         if not LANGCHAIN_AVAILABLE:
             return None
         
-        # Timeout padrão de 4 segundos por requisição
-        timeout_seconds = settings.LLM_REQUEST_TIMEOUT
+        # Timeout padrão de 4 segundos por requisição. Com timeout adaptativo, o cliente
+        # HTTP usa o timeout efetivo atual do provedor; o health check recria a instância
+        # quando ele muda (ver _refresh_client_timeout)
+        timeout_seconds = cls.get_request_timeout(provider.provider_id)
+        cls._client_timeouts[provider.provider_id] = timeout_seconds
         max_retries = settings.LLM_MAX_RETRIES
-            
+
+        # SDK só do provedor que está sendo criado (provedores sem chave nunca chegam aqui)
+        ChatOpenAI = ChatAnthropic = ChatGoogleGenerativeAI = None
+        if provider.provider_type == ProviderType.GOOGLE:
+            ChatGoogleGenerativeAI = load_provider_class("ChatGoogleGenerativeAI")
+        elif provider.provider_type == ProviderType.ANTHROPIC:
+            ChatAnthropic = load_provider_class("ChatAnthropic")
+        elif provider.provider_type in (ProviderType.OPENAI, ProviderType.OPENROUTER):
+            ChatOpenAI = load_provider_class("ChatOpenAI")
+
         try:
             if provider.provider_type == ProviderType.GOOGLE and ChatGoogleGenerativeAI:
                 # Google Gemini: usa gemini-1.5-flash (gratuito, rápido e amplamente disponível)
@@ -311,6 +379,9 @@ class LLMService:
                     timeout=timeout_seconds,
                     max_retries=max_retries,
                 )
+            elif provider.provider_type == ProviderType.LOCAL_FAKE:
+                from src.services.local_fake_llm import LocalFakeChatModel
+                return LocalFakeChatModel.from_settings() if LocalFakeChatModel else None
             elif provider.provider_type == ProviderType.OPENAI and ChatOpenAI:
                 # Modelos OpenAI: gpt-4o, gpt-4-turbo, gpt-4, gpt-3.5-turbo
                 # Usando gpt-3.5-turbo como padrão (mais barato e estável)
@@ -394,6 +465,7 @@ class LLMService:
                             # verificamos se instância existe e circuit breaker está fechado
                             if not provider.circuit_breaker_open:
                                 provider.mark_available()
+                            cls._refresh_client_timeout(provider)
                             logger.debug(f"Health check OK para {provider_id}")
                     except Exception as e:
                         cls._handle_provider_error(provider_id, e)
@@ -401,15 +473,37 @@ class LLMService:
             except Exception as e:
                 logger.error(f"Erro no health check: {e}")
 
+    @classmethod
+    def _refresh_client_timeout(cls, provider: LLMProvider) -> bool:
+        """Recria a instância do provedor se o timeout efetivo se afastou do timeout do cliente HTTP.
+
+        Os SDKs fixam o timeout do cliente na criação; sem isso o cliente
+        continuaria cortando (ou esperando) pelo valor antigo.
+        """
+        provider_id = provider.provider_id
+        current = cls._client_timeouts.get(provider_id)
+        if current is None or provider_id not in cls._llm_instances:
+            return False
+        target = cls.get_request_timeout(provider_id)
+        if abs(target - current) <= current * cls.CLIENT_TIMEOUT_TOLERANCE:
+            return False
+        llm = cls._create_llm_instance(provider)
+        if llm is None:
+            return False
+        cls._llm_instances[provider_id] = llm
+        logger.info(f"Timeout do cliente de {provider_id} ajustado de {current:g}s para {target:g}s")
+        return True
+
     @classmethod
     def _rotate_providers(cls) -> str:
         """Rotaciona entre provedores habilitados conforme estratégia configurada."""
         strategy = settings.LLM_ROTATION_STRATEGY.lower()
 
+        # Provedores sem quota (rpm/rpd) ficam de fora antes de tomarem 429
         available_providers = [
             (p.provider_id, p)
             for p in sorted(cls._providers.values(), key=lambda x: x.priority)
-            if p.is_available()
+            if p.is_available() and provider_rate_limiter.has_capacity(p.provider_id)
         ]
 
         if not available_providers:
@@ -422,12 +516,39 @@ class LLMService:
             return available_providers[cls._current_provider_index][0]
         elif strategy == "priority":
             return available_providers[0][0]  # Sempre usa o de maior prioridade
+        elif strategy in ("fastest", "ewma"):
+            return cls._pick_fastest([provider_id for provider_id, _ in available_providers])
         elif strategy == "least_used":
-            # TODO: Implementar rastreamento de uso
-            return available_providers[0][0]
+            # Provedor com maior fração de quota restante (empate: prioridade)
+            return max(
+                available_providers,
+                key=lambda item: provider_rate_limiter.remaining_fraction(item[0]),
+            )[0]
         else:
             return available_providers[0][0]
 
+    @classmethod
+    def _pick_fastest(cls, provider_ids: list[str]) -> str:
+        """Escolhe o provedor com menor tempo esperado de resposta (EWMA de latência e erros).
+
+        Provedores ainda sem medição são tentados primeiro (por prioridade) e,
+        com probabilidade LLM_EXPLORATION_RATE, um provedor aleatório é usado
+        para manter as estimativas dos demais atualizadas.
+        """
+        if len(provider_ids) > 1 and random.random() < settings.LLM_EXPLORATION_RATE:
+            return random.choice(provider_ids)
+
+        best_id, best_time = provider_ids[0], None
+        for provider_id in provider_ids:
+            expected = llm_metrics.expected_completion_time(
+                provider_id, failure_penalty=settings.LLM_REQUEST_TIMEOUT
+            )
+            if expected is None:
+                return provider_id
+            if best_time is None or expected < best_time:
+                best_id, best_time = provider_id, expected
+        return best_id
+
     @classmethod
     def get_llm(cls) -> Optional[BaseLanguageModel]:
         """Retorna instância do LLM disponível ou None se nenhum estiver disponível.
@@ -478,6 +599,10 @@ class LLMService:
             
             # Verifica se instância existe e está válida
             llm_instance = cls._llm_instances.get(provider_id)
+            # Só confere a quota: ela é consumida a cada chamada ao modelo (RateLimitCallbackHandler)
+            if llm_instance and not provider_rate_limiter.admit(provider_id):
+                logger.info(f"Provedor {provider_id} sem quota (rpm/rpd), tentando o próximo...")
+                continue
             if llm_instance:
                 # Registra métricas de uso
                 latency = time.perf_counter() - start_time
@@ -544,6 +669,9 @@ class LLMService:
             
             # Verifica se instância existe e está válida
             llm_instance = cls._llm_instances.get(provider_id)
+            if llm_instance and not provider_rate_limiter.admit(provider_id):
+                logger.info(f"Provedor {provider_id} sem quota (rpm/rpd), pulando no fallback...")
+                continue
             if llm_instance:
                 provider.mark_available()
                 logger.info(f"✅ Usando provedor LLM (fallback): {provider_id}")
@@ -553,6 +681,84 @@ class LLMService:
         logger.error("❌ Nenhum provedor de LLM disponível após fallback")
         return None
 
+    @classmethod
+    def get_provider_id(cls, llm: Optional[BaseLanguageModel]) -> Optional[str]:
+        """Retorna o provider_id da instância de LLM (comparação por identidade) ou None."""
+        if llm is None:
+            return None
+        for provider_id, llm_instance in cls._llm_instances.items():
+            if llm_instance is llm:
+                return provider_id
+        return None
+
+    @classmethod
+    def hedging_enabled(cls, route: str) -> bool:
+        """Indica se a rota (ex.: "chat", "sql_assist") usa hedging entre provedores."""
+        routes = {r.strip().lower() for r in settings.LLM_HEDGE_ROUTES.split(",") if r.strip()}
+        return route.lower() in routes
+
+    @classmethod
+    def get_hedge_delay(cls, provider_id: Optional[str]) -> float:
+        """Quanto esperar pelo provedor antes de disparar o hedge.
+
+        Usa o percentil configurado (p90) das latências observadas do provedor;
+        sem histórico suficiente, espera metade do LLM_REQUEST_TIMEOUT.
+        """
+        observed = None
+        if provider_id:
+            observed = llm_metrics.latency_percentile(
+                provider_id,
+                settings.LLM_HEDGE_PERCENTILE,
+                min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            )
+        timeout = cls.get_request_timeout(provider_id)
+        if observed is None:
+            observed = timeout / 2
+        return min(max(observed, settings.LLM_HEDGE_MIN_DELAY), timeout)
+
+    @classmethod
+    def get_request_timeout(cls, provider_id: Optional[str]) -> float:
+        """Timeout efetivo (s) de uma geração no provedor.
+
+        Com LLM_ADAPTIVE_TIMEOUT, é o p99 (LLM_TIMEOUT_PERCENTILE) das latências
+        recentes do provedor vezes LLM_TIMEOUT_FACTOR, limitado a
+        [LLM_TIMEOUT_MIN, LLM_TIMEOUT_MAX]; é recalculado a cada chamada. Sem
+        histórico suficiente, vale LLM_REQUEST_TIMEOUT. Timeouts não entram nas
+        latências: após LLM_TIMEOUT_FAIL_FAST_AFTER timeouts seguidos, o
+        provedor (provavelmente fora do ar) falha rápido com LLM_TIMEOUT_MIN.
+        """
+        default = float(settings.LLM_REQUEST_TIMEOUT)
+        if not settings.LLM_ADAPTIVE_TIMEOUT or not provider_id:
+            return default
+        if llm_metrics.consecutive_timeouts(provider_id) >= settings.LLM_TIMEOUT_FAIL_FAST_AFTER:
+            return float(settings.LLM_TIMEOUT_MIN)
+        observed = llm_metrics.latency_percentile(
+            provider_id,
+            settings.LLM_TIMEOUT_PERCENTILE,
+            min_samples=settings.LLM_TIMEOUT_MIN_SAMPLES,
+        )
+        if observed is None:
+            return default
+        adaptive = observed * settings.LLM_TIMEOUT_FACTOR
+        return round(min(max(adaptive, settings.LLM_TIMEOUT_MIN), settings.LLM_TIMEOUT_MAX), 3)
+
+    @classmethod
+    def get_hedge_llm(cls, exclude_provider_id: Optional[str]) -> tuple[Optional[str], Optional[BaseLanguageModel]]:
+        """Próximo provedor saudável (por prioridade) diferente de exclude_provider_id.
+
+        Ao contrário de get_llm_with_fallback, não marca o provedor principal
+        como indisponível: ele continua sendo aguardado em paralelo.
+        """
+        for provider in sorted(cls._providers.values(), key=lambda x: x.priority):
+            if provider.provider_id == exclude_provider_id:
+                continue
+            if not provider.enabled or provider.circuit_breaker_open or not provider.is_available():
+                continue
+            llm_instance = cls._llm_instances.get(provider.provider_id)
+            if llm_instance and provider_rate_limiter.admit(provider.provider_id):
+                return provider.provider_id, llm_instance
+        return None, None
+
     @classmethod
     def is_available(cls) -> bool:
         """Verifica se pelo menos um LLM está disponível."""
@@ -592,9 +798,18 @@ class LLMService:
         
         if today not in cls._usage_tracking[provider_id]:
             cls._usage_tracking[provider_id][today] = 0
+            cls._prune_usage(provider_id)
         
         cls._usage_tracking[provider_id][today] += 1
 
+    @classmethod
+    def _prune_usage(cls, provider_id: str, keep_days: int = 30) -> None:
+        """Remove contadores diários fora da janela mensal (roda na virada do dia)."""
+        cutoff = (date.today() - timedelta(days=keep_days - 1)).isoformat()
+        days = cls._usage_tracking.get(provider_id, {})
+        for day in [d for d in days if d < cutoff]:
+            del days[day]
+
     @classmethod
     def get_usage_stats(cls, provider_id: str) -> dict:
         """Retorna estatísticas de uso de um provedor."""
@@ -605,9 +820,10 @@ class LLMService:
         daily = cls._usage_tracking[provider_id].get(today, 0)
         
         # Calcula uso mensal (últimos 30 dias)
+        cutoff = (date.today() - timedelta(days=29)).isoformat()
         monthly = sum(
             count for date_str, count in cls._usage_tracking[provider_id].items()
-            if (datetime.fromisoformat(date_str) - datetime.now()).days <= 30
+            if date_str >= cutoff
         )
         
         return {"daily": daily, "monthly": monthly}
@@ -629,6 +845,8 @@ class LLMService:
                     p.last_health_check.isoformat() if p.last_health_check else None
                 ),
                 "usage": cls.get_usage_stats(p.provider_id),
+                "effective_timeout": cls.get_request_timeout(p.provider_id),
+                "rate_limit": provider_rate_limiter.get_stats(p.provider_id),
             }
             for p in sorted(cls._providers.values(), key=lambda x: x.priority)
         ]
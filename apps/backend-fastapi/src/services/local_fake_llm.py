@@ -0,0 +1,232 @@
+"""Provedor LLM local e determinístico (ProviderType.LOCAL_FAKE) para testes de carga e latência.
+
+Responde aos prompts do SQLAgent a partir de uma tabela de regras (pergunta ->
+SQL) ou de um arquivo de fixtures gravado, sem rede e sem consumir quota.
+Latência e erros podem ser injetados de forma reprodutível (seed fixa).
+Opcionalmente emula os turnos de ferramentas do agente SQL (listar tabelas,
+ler schema) antes da resposta final, e reporta uso de tokens estimado.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, List, Optional
+
+from pydantic import Field, PrivateAttr, model_validator
+
+try:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    LANGCHAIN_CORE_AVAILABLE = True
+except ImportError:
+    BaseChatModel = object
+    LANGCHAIN_CORE_AVAILABLE = False
+
+from src.config import settings
+from src.services.schema_context_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Resposta para perguntas sem regra: cai no fluxo "informação não encontrada"
+UNKNOWN_ANSWER = "Não encontrei essa informação no banco de dados."
+
+_OCCUPATION_SQL = (
+    "SELECT COUNT(*) FILTER (WHERE status = 'ocupado') as leitos_ocupados, COUNT(*) as total_leitos, "
+    "ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual "
+    "FROM leitos WHERE setor = '{setor}';"
+)
+
+# Regras padrão (regex sobre a pergunta normalizada, sem acentos e minúscula); a primeira que casar vence
+DEFAULT_RULES: List[dict] = [
+    {"pattern": r"(?=.*(taxa|ocupacao))(?=.*pediatric)", "sql": _OCCUPATION_SQL.format(setor="UTI_PEDIATRICA")},
+    {"pattern": r"(?=.*(taxa|ocupacao))(?=.*adult)", "sql": _OCCUPATION_SQL.format(setor="UTI_ADULTO")},
+    {
+        "pattern": r"ocupacao",
+        "sql": (
+            "SELECT setor, COUNT(*) FILTER (WHERE status = 'ocupado') as leitos_ocupados, COUNT(*) as total_leitos, "
+            "ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'ocupado') / NULLIF(COUNT(*), 0), 2) as taxa_ocupacao_percentual "
+            "FROM leitos GROUP BY setor;"
+        ),
+    },
+    {
+        "pattern": r"disponive|livre",
+        "sql": "SELECT setor, COUNT(*) as leitos_disponiveis FROM leitos WHERE status = 'disponivel' GROUP BY setor;",
+    },
+    {"pattern": r"(?=.*media)(?=.*(receita|faturamento|valor))", "sql": "SELECT AVG(valor) as receita_media FROM atendimentos;"},
+    {"pattern": r"faturad|faturamento|receita", "sql": "SELECT SUM(valor) as total_faturado FROM atendimentos;"},
+    {"pattern": r"procedimento|atendimento", "sql": "SELECT COUNT(*) as total_procedimentos FROM atendimentos;"},
+    {"pattern": r"especialidade", "sql": "SELECT nome FROM especialidades ORDER BY nome;"},
+    {"pattern": r"leito", "sql": "SELECT COUNT(*) as total_leitos FROM leitos;"},
+]
+
+
+# Tabelas citadas no SQL de uma regra (para o turno sql_db_schema emulado)
+_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+([a-zA-Z_][\w.]*)", re.IGNORECASE)
+
+
+def _tool_name(tool: Any) -> str:
+    """Nome da ferramenta: string, objeto com ``name`` ou schema OpenAI (``bind(tools=...)``)."""
+    if isinstance(tool, dict):
+        return tool.get("function", tool).get("name", "")
+    return getattr(tool, "name", str(tool))
+
+
+def _normalize(text: str) -> str:
+    nfkd = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in nfkd if not unicodedata.combining(c)).lower()
+
+
+def load_rules(path: Optional[str]) -> List[dict]:
+    """Carrega regras de um arquivo JSON (lista de {"pattern", "sql" | "answer"}); sem arquivo, as padrão."""
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(Path(path), encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Fixture do local_fake deve ser uma lista de regras: {path}")
+    return rules
+
+
+class LocalFakeChatModel(BaseChatModel):
+    """Chat model LangChain que responde por regras, com latência/erros injetados.
+
+    A última mensagem humana (o input do agente) tem a pergunta original no
+    primeiro parágrafo; ela é casada com as regras e a resposta final já traz o
+    SQL em um bloco ```sql``` (sem chamar ferramentas), que o
+    ``SQLAgentService`` extrai normalmente.
+    """
+
+    rules: List[dict] = Field(default_factory=lambda: list(DEFAULT_RULES))
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 42
+    emulate_tools: bool = False  # Emula list_tables -> schema antes da resposta (turnos do agente real)
+
+    _rng: random.Random = PrivateAttr()
+    _compiled: list = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+
+    @model_validator(mode="after")
+    def _init_local_fake(self) -> "LocalFakeChatModel":
+        self._rng = random.Random(self.seed)
+        self._compiled = [(re.compile(rule["pattern"]), rule) for rule in self.rules]
+        return self
+
+    @classmethod
+    def from_settings(cls) -> "LocalFakeChatModel":
+        """Cria o modelo a partir das variáveis LLM_FAKE_*."""
+        return cls(
+            rules=load_rules(settings.LLM_FAKE_FIXTURE_PATH),
+            latency_ms=settings.LLM_FAKE_LATENCY_MS,
+            jitter_ms=settings.LLM_FAKE_JITTER_MS,
+            error_rate=settings.LLM_FAKE_ERROR_RATE,
+            seed=settings.LLM_FAKE_SEED,
+            emulate_tools=settings.LLM_FAKE_EMULATE_TOOLS,
+        )
+
+    @property
+    def calls(self) -> int:
+        """Gerações atendidas (útil nos testes de carga)."""
+        return self._calls
+
+    @property
+    def _llm_type(self) -> str:
+        return "local_fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        """Parâmetros que distinguem o modelo (entram na chave do cache de completions)."""
+        return {
+            "rules": self.rules,
+            "seed": self.seed,
+            "error_rate": self.error_rate,
+            "emulate_tools": self.emulate_tools,
+        }
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        """Aceita ferramentas do agente; chegam a ``_generate`` em ``tools``."""
+        return self.bind(tools=[getattr(tool, "name", tool) for tool in tools])
+
+    def answer(self, question: str) -> str:
+        """Resposta da regra que casa com a pergunta."""
+        normalized = _normalize(question)
+        for pattern, rule in self._compiled:
+            if pattern.search(normalized):
+                if rule.get("sql"):
+                    return f"```sql\n{rule['sql']}\n```"
+                return rule.get("answer", UNKNOWN_ANSWER)
+        return UNKNOWN_ANSWER
+
+    def _draw(self) -> tuple[float, bool]:
+        """Sorteia (latência em s, falhar?) com o RNG de seed fixa."""
+        self._calls += 1
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        delay = max(self.latency_ms + jitter, 0.0) / 1000
+        fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        return delay, fail
+
+    def _next_tool_call(self, messages: List["BaseMessage"], answer: str, tools: List[str]) -> Optional[dict]:
+        """Próxima chamada de ferramenta emulada, ou None quando é hora da resposta final."""
+        done = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            done += isinstance(message, ToolMessage)
+        if done == 0 and "sql_db_list_tables" in tools:
+            return {"name": "sql_db_list_tables", "args": {"tool_input": ""}, "id": "local_fake_0"}
+        tables = sorted({table.split(".")[-1] for table in _TABLES_RE.findall(answer)})
+        if done == 1 and tables and "sql_db_schema" in tools:
+            return {"name": "sql_db_schema", "args": {"table_names": ", ".join(tables)}, "id": "local_fake_1"}
+        return None
+
+    def _respond(self, messages: List["BaseMessage"], fail: bool, tools: Optional[List[str]] = None) -> "ChatResult":
+        if fail:
+            raise RuntimeError("429 rate limit (erro injetado pelo provedor local_fake)")
+        question = ""
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                question = str(message.content).split("\n\n", 1)[0]
+                break
+        answer = self.answer(question)
+        tool_call = None
+        if self.emulate_tools and tools:
+            tool_call = self._next_tool_call(messages, answer, [_tool_name(tool) for tool in tools])
+        content = "" if tool_call else answer
+        input_tokens = estimate_tokens("".join(str(message.content) for message in messages))
+        output_tokens = estimate_tokens(content or str(tool_call))
+        message = AIMessage(
+            content=content,
+            tool_calls=[tool_call] if tool_call else [],
+            response_metadata={"model_name": "local_fake"},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> "ChatResult":
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        return self._respond(messages, fail, tools)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> "ChatResult":
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._respond(messages, fail, tools)
+
+
+if not LANGCHAIN_CORE_AVAILABLE:
+    LocalFakeChatModel = None  # noqa: F811
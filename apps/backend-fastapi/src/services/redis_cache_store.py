@@ -0,0 +1,474 @@
+"""Cache de respostas compartilhado no Redis (``CACHE_BACKEND=redis``).
+
+Todos os workers e nós leem e gravam as mesmas chaves (prefixo CACHE_REDIS_PREFIX):
+
+- ``<prefix>:entries``: hash entry_id -> JSON da entrada
+- ``<prefix>:usage``: hash entry_id -> usage_count (HINCRBY, sem perder usos entre workers)
+- ``<prefix>:last_used``: hash entry_id -> último uso (ISO 8601)
+- ``<prefix>:changes``: canal pub/sub com cada mudança (``{"op", "ids", "origin"}``)
+
+Cada worker mantém o próprio índice em memória (``CacheService``) e aplica as
+notificações dos outros entrada a entrada, sem recarregar tudo. Se a assinatura
+cair, ela é refeita e o índice é recarregado inteiro (``resync``).
+
+``InMemoryRedis`` implementa o subconjunto de comandos usado aqui, num único
+processo: é o substituto local do servidor para testes e desenvolvimento
+(``REDIS_URL=memory://``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+from uuid import uuid4
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from src.services.cache_store import SQLiteCacheStore, read_legacy_json, read_sqlite_entries
+
+logger = logging.getLogger(__name__)
+
+# Validade da trava de importação: se o worker que importa cair, outro tenta depois disso
+IMPORT_LOCK_SECONDS = 300
+
+
+def redis_client_from_url(url: str) -> Any:
+    """Cliente Redis para ``url``; ``memory://<nome>`` usa o InMemoryRedis.
+
+    Returns:
+        O cliente, ou None se o pacote ``redis`` não estiver instalado
+    """
+    if url.startswith("memory://"):
+        return InMemoryRedis.from_url(url)
+    if redis is None:
+        return None
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+class RedisCacheStore:
+    """Entradas do cache de respostas no Redis, com notificação de mudanças via pub/sub."""
+
+    def __init__(self, client: Any, prefix: str = "response_cache"):
+        """
+        Args:
+            client: Cliente Redis com ``decode_responses=True`` (ou InMemoryRedis)
+            prefix: Prefixo das chaves e do canal
+        """
+        self.client = client
+        self.prefix = prefix
+        self.entries_key = f"{prefix}:entries"
+        self.usage_key = f"{prefix}:usage"
+        self.last_used_key = f"{prefix}:last_used"
+        self.channel = f"{prefix}:changes"
+        # Identifica as notificações deste processo (ignoradas ao recebê-las)
+        self.origin = uuid4().hex
+        self._handler: Optional[Callable[[str, list[str]], None]] = None
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def _merge(self, data: str, usage: Optional[str], last_used: Optional[str]) -> dict[str, Any]:
+        """JSON da entrada com o uso atual (que vive nos hashes de uso)."""
+        entry = json.loads(data)
+        if usage is not None:
+            entry["usage_count"] = int(usage)
+        if last_used:
+            entry["last_used"] = last_used
+        return entry
+
+    def _publish(self, op: str, entry_ids: list[str]) -> None:
+        try:
+            self.client.publish(self.channel, json.dumps({"op": op, "ids": entry_ids, "origin": self.origin}))
+        except Exception as e:
+            # Os dados já foram gravados; os outros workers só demoram a ver a mudança
+            logger.warning(f"Erro ao notificar mudança no cache ({op}): {e}")
+
+    def load_all(self) -> list[dict[str, Any]]:
+        """Retorna todas as entradas com o uso atual."""
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.entries_key)
+        pipe.hgetall(self.usage_key)
+        pipe.hgetall(self.last_used_key)
+        entries, usage, last_used = pipe.execute()
+        result = []
+        for entry_id, data in entries.items():
+            try:
+                result.append(self._merge(data, usage.get(entry_id), last_used.get(entry_id)))
+            except ValueError as e:
+                logger.warning(f"Entrada de cache ilegível ignorada ({entry_id}): {e}")
+        return result
+
+    def get(self, entry_id: str) -> Optional[dict[str, Any]]:
+        """Retorna uma entrada, ou None se não existir."""
+        entry_id = str(entry_id)
+        pipe = self.client.pipeline()
+        pipe.hget(self.entries_key, entry_id)
+        pipe.hget(self.usage_key, entry_id)
+        pipe.hget(self.last_used_key, entry_id)
+        data, usage, last_used = pipe.execute()
+        return self._merge(data, usage, last_used) if data is not None else None
+
+    def upsert(self, entry: dict[str, Any]) -> None:
+        """Grava (insere ou substitui) uma entrada."""
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries: Iterable[dict[str, Any]], notify: bool = True) -> None:
+        """Grava várias entradas numa transação (MULTI/EXEC) e notifica os outros workers.
+
+        O uso só é gravado para entradas novas (HSETNX): numa atualização, o
+        valor no Redis já tem os HINCRBY dos outros workers e é mantido.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        pipe = self.client.pipeline()
+        for entry in entries:
+            entry_id = str(entry["entry_id"])
+            pipe.hset(self.entries_key, entry_id, json.dumps(entry, ensure_ascii=False))
+            pipe.hsetnx(self.usage_key, entry_id, int(entry.get("usage_count") or 0))
+            if entry.get("last_used"):
+                pipe.hsetnx(self.last_used_key, entry_id, entry["last_used"])
+        pipe.execute()
+        if notify:
+            self._publish("upsert", [str(entry["entry_id"]) for entry in entries])
+
+    def delete(self, entry_id: str) -> None:
+        """Remove uma entrada (sem erro se não existir)."""
+        self.delete_many([entry_id])
+
+    def delete_many(self, entry_ids: Iterable[str]) -> None:
+        """Remove várias entradas numa transação e notifica os outros workers."""
+        entry_ids = [str(entry_id) for entry_id in entry_ids]
+        if not entry_ids:
+            return
+        pipe = self.client.pipeline()
+        for key in (self.entries_key, self.usage_key, self.last_used_key):
+            pipe.hdel(key, *entry_ids)
+        pipe.execute()
+        self._publish("delete", entry_ids)
+
+    def add_usage(self, usage: dict[str, tuple[int, str]]) -> None:
+        """Soma usos às entradas (HINCRBY: workers concorrentes não se sobrescrevem).
+
+        Args:
+            usage: entry_id -> (usos a somar, ``last_used`` em ISO 8601)
+        """
+        if not usage:
+            return
+        entry_ids = [str(entry_id) for entry_id in usage]
+        pipe = self.client.pipeline()
+        for entry_id, (count, last_used) in zip(entry_ids, usage.values()):
+            pipe.hincrby(self.usage_key, entry_id, count)
+            pipe.hset(self.last_used_key, entry_id, last_used)
+            pipe.hexists(self.entries_key, entry_id)
+        results = pipe.execute()
+        # Entradas removidas por outro worker antes deste HINCRBY: o uso somado
+        # recriaria os campos sem a entrada; remove-os (a entrada não volta)
+        removed = [entry_id for entry_id, exists in zip(entry_ids, results[2::3]) if not exists]
+        if removed:
+            pipe = self.client.pipeline()
+            pipe.hdel(self.usage_key, *removed)
+            pipe.hdel(self.last_used_key, *removed)
+            pipe.execute()
+        self._publish("usage", [entry_id for entry_id in entry_ids if entry_id not in removed])
+
+    def count(self) -> int:
+        """Número de entradas gravadas."""
+        return self.client.hlen(self.entries_key)
+
+    def import_once(self, local_db: Optional[str | Path] = None, legacy_json: Optional[str | Path] = None) -> int:
+        """Na primeira vez que o Redis é usado, importa o cache local (SQLite ou JSON legado).
+
+        Só um worker importa: ele toma ``<prefix>:import_lock`` (``SET NX`` com
+        expiração) e só grava ``<prefix>:imported`` depois que as entradas foram
+        gravadas. Se a importação falhar (ou o processo cair no meio), a marca não
+        existe e o próximo worker a subir importa de novo. Retorna quantas
+        entradas importou.
+        """
+        imported_key = f"{self.prefix}:imported"
+        lock_key = f"{self.prefix}:import_lock"
+        if self.client.get(imported_key) or not self.client.set(
+            lock_key, self.origin, nx=True, ex=IMPORT_LOCK_SECONDS
+        ):
+            return 0
+        try:
+            entries: list[dict[str, Any]] = []
+            # Entradas já gravadas (upsert_many é uma transação só): a importação
+            # anterior terminou e o processo caiu antes de marcá-la
+            if not self.count():
+                if local_db is not None and Path(local_db).exists():
+                    entries = read_sqlite_entries(local_db)
+                elif legacy_json is not None:
+                    entries = read_legacy_json(legacy_json)
+                self.upsert_many(entries, notify=False)
+            self.client.set(imported_key, "1")
+        finally:
+            self.client.delete(lock_key)
+        if entries:
+            logger.info(f"Cache local importado para o Redis: {len(entries)} entradas")
+            # Workers que subiram durante a importação carregaram o índice vazio
+            self._publish("resync", [])
+        return len(entries)
+
+    def compact(self) -> None:
+        """Nada a fazer: a memória das chaves removidas é liberada pelo próprio Redis."""
+
+    def backup(self, dest: str | Path) -> None:
+        """Grava um snapshot das entradas em ``dest`` no formato SQLite (restaurável com ``restore``)."""
+        dest = Path(dest)
+        tmp = dest.with_name(dest.name + ".tmp")
+        snapshot = SQLiteCacheStore(tmp)
+        try:
+            snapshot.upsert_many(self.load_all())
+        finally:
+            snapshot.close()
+        os.replace(tmp, dest)
+
+    def restore(self, source_path: str | Path) -> None:
+        """Substitui as entradas pelas de um snapshot SQLite; os workers recarregam o índice."""
+        entries = read_sqlite_entries(source_path)
+        pipe = self.client.pipeline()
+        pipe.delete(self.entries_key, self.usage_key, self.last_used_key)
+        pipe.execute()
+        self.upsert_many(entries, notify=False)
+        self._publish("reload", [])
+
+    def size_bytes(self) -> int:
+        """Tamanho aproximado (bytes do JSON das entradas)."""
+        return sum(len(data.encode("utf-8")) for data in self.client.hvals(self.entries_key))
+
+    def subscribe(self, handler: Callable[[str, list[str]], None]) -> None:
+        """Chama ``handler(op, entry_ids)`` (numa thread do pub/sub) para mudanças de outros processos.
+
+        ``op``: ``upsert``, ``delete``, ``usage``, ``reload`` (recarregar tudo, após
+        um restore) ou ``resync`` (recarregar tudo após reconectar: as mensagens
+        publicadas enquanto a conexão estava caída se perderam).
+        """
+        self._handler = handler
+        self._start_subscriber()
+
+    def _start_subscriber(self) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: self._on_message})
+        self._subscriber = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._on_subscriber_error
+        )
+
+    def _on_message(self, message: dict) -> None:
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self.origin:
+            return
+        try:
+            self._handler(payload.get("op", "reload"), payload.get("ids", []))
+        except Exception as e:
+            logger.error(f"Erro ao aplicar mudança do cache compartilhado: {e}")
+
+    def _on_subscriber_error(self, error: BaseException, pubsub: Any, thread: Any) -> None:
+        """Erro na thread do pub/sub (ex.: conexão caiu): reassina e ressincroniza o índice.
+
+        Roda na própria thread que falhou, que termina em seguida; as tentativas
+        seguem com backoff até reconectar ou ``close``.
+        """
+        thread.stop()
+        logger.warning(f"Assinatura de mudanças do cache interrompida: {error}; reconectando")
+        delay = 1.0
+        while not self._closed.wait(delay):
+            try:
+                with self._subscriber_lock:
+                    if self._closed.is_set():
+                        return
+                    self._start_subscriber()
+            except Exception as e:
+                logger.warning(f"Falha ao reconectar ao Redis ({e}); nova tentativa em {delay:g}s")
+                delay = min(delay * 2, 30.0)
+                continue
+            logger.info("Assinatura de mudanças do cache restabelecida; recarregando o índice")
+            try:
+                self._handler("resync", [])
+            except Exception as e:
+                logger.error(f"Erro ao ressincronizar o cache compartilhado: {e}")
+            return
+
+    def close(self) -> None:
+        """Encerra a assinatura de mudanças (e as tentativas de reconexão)."""
+        with self._subscriber_lock:
+            self._closed.set()
+            if self._subscriber is not None:
+                self._subscriber.stop()
+                self._subscriber = None
+
+
+class InMemoryRedis:
+    """Subconjunto do cliente ``redis.Redis`` (decode_responses=True) em memória.
+
+    Instâncias criadas com a mesma URL compartilham os dados, como clientes de
+    um mesmo servidor; as mensagens publicadas são entregues na hora, na thread
+    de quem publica.
+    """
+
+    _servers: dict[str, "InMemoryRedis"] = {}
+    _servers_lock = threading.Lock()
+
+    def __init__(self):
+        self._data: dict[str, Any] = {}
+        self._channels: dict[str, list[Callable[[dict], None]]] = {}
+        self._expires: dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "InMemoryRedis":
+        with cls._servers_lock:
+            if url not in cls._servers:
+                cls._servers[url] = cls()
+            return cls._servers[url]
+
+    def _hash(self, name: str) -> dict[str, str]:
+        return self._data.setdefault(name, {})
+
+    def hset(self, name: str, key: Optional[str] = None, value: Any = None, mapping: Optional[dict] = None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self._lock:
+            target = self._hash(name)
+            added = sum(1 for k in items if k not in target)
+            target.update({k: str(v) for k, v in items.items()})
+        return added
+
+    def hsetnx(self, name: str, key: str, value: Any) -> bool:
+        with self._lock:
+            target = self._hash(name)
+            if key in target:
+                return False
+            target[key] = str(value)
+            return True
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self._data.get(name, {}).get(key)
+
+    def hgetall(self, name: str) -> dict[str, str]:
+        with self._lock:
+            return dict(self._data.get(name, {}))
+
+    def hvals(self, name: str) -> list[str]:
+        with self._lock:
+            return list(self._data.get(name, {}).values())
+
+    def hlen(self, name: str) -> int:
+        with self._lock:
+            return len(self._data.get(name, {}))
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self._lock:
+            target = self._data.get(name, {})
+            return sum(1 for key in keys if target.pop(key, None) is not None)
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            target = self._hash(name)
+            target[key] = str(int(target.get(key, 0)) + amount)
+            return int(target[key])
+
+    def hexists(self, name: str, key: str) -> bool:
+        with self._lock:
+            return key in self._data.get(name, {})
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            self._expire(name)
+            value = self._data.get(name)
+            return value if isinstance(value, str) else None
+
+    def set(self, name: str, value: Any, nx: bool = False, ex: Optional[float] = None) -> Optional[bool]:
+        with self._lock:
+            self._expire(name)
+            if nx and name in self._data:
+                return None
+            self._data[name] = str(value)
+            if ex is not None:
+                self._expires[name] = time.monotonic() + ex
+            else:
+                self._expires.pop(name, None)
+            return True
+
+    def _expire(self, name: str) -> None:
+        deadline = self._expires.get(name)
+        if deadline is not None and time.monotonic() >= deadline:
+            self._data.pop(name, None)
+            del self._expires[name]
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            for name in names:
+                self._expires.pop(name, None)
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def publish(self, channel: str, message: str) -> int:
+        with self._lock:
+            handlers = list(self._channels.get(channel, []))
+        for handler in handlers:
+            handler({"type": "message", "channel": channel, "data": message})
+        return len(handlers)
+
+    def pipeline(self, transaction: bool = True) -> "_InMemoryPipeline":
+        return _InMemoryPipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "_InMemoryPubSub":
+        return _InMemoryPubSub(self)
+
+
+class _InMemoryPipeline:
+    """Enfileira comandos e os executa juntos (atomicamente) em ``execute``."""
+
+    def __init__(self, server: InMemoryRedis):
+        self._server = server
+        self._commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., "_InMemoryPipeline"]:
+        def queue(*args: Any, **kwargs: Any) -> "_InMemoryPipeline":
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> list[Any]:
+        with self._server._lock:
+            results = [getattr(self._server, name)(*args, **kwargs) for name, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+class _InMemoryPubSub:
+    def __init__(self, server: InMemoryRedis):
+        self._server = server
+        self._handlers: dict[str, Callable[[dict], None]] = {}
+
+    def subscribe(self, **channels: Callable[[dict], None]) -> None:
+        with self._server._lock:
+            for channel, handler in channels.items():
+                self._server._channels.setdefault(channel, []).append(handler)
+                self._handlers[channel] = handler
+
+    def run_in_thread(
+        self, sleep_time: float = 0.0, daemon: bool = False, exception_handler: Optional[Callable] = None
+    ) -> "_InMemoryPubSub":
+        # Entrega síncrona no publish: não há thread a iniciar
+        return self
+
+    def stop(self) -> None:
+        with self._server._lock:
+            for channel, handler in self._handlers.items():
+                self._server._channels.get(channel, []).remove(handler)
+        self._handlers = {}
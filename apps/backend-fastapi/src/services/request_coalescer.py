@@ -0,0 +1,148 @@
+"""Coalescência (single-flight) de requisições idênticas em andamento."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normaliza a pergunta para uso como chave de coalescência.
+
+    Remove acentos, converte para minúsculas e colapsa espaços, de modo que
+    "Taxa de ocupação da UTI" e "taxa  de ocupacao da uti" compartilhem a chave.
+    """
+    text = unicodedata.normalize("NFKD", prompt or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class _InFlight:
+    """Chamada em andamento compartilhada entre assinantes."""
+
+    __slots__ = ("task", "subscribers", "listeners", "progress")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.subscribers = 0
+        # Assinantes que querem o progresso e os passos já publicados
+        self.listeners: List[Callable[[Any], None]] = []
+        self.progress: List[Any] = []
+
+
+class SingleFlight:
+    """
+    Executa no máximo uma chamada por chave ao mesmo tempo.
+
+    O primeiro request de uma chave (líder) dispara a corrotina; requests
+    idênticos que chegam enquanto ela roda apenas aguardam o mesmo resultado
+    (ou a mesma exceção). A chamada só é cancelada se todos os assinantes
+    desistirem (ex.: todos os clientes SSE desconectaram).
+
+    A chamada pode publicar passos de progresso (``publish``); cada assinante
+    que passou ``on_progress`` os recebe, inclusive os publicados antes de ele
+    se juntar à chamada.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._inflight: Dict[str, _InFlight] = {}
+        self._leaders = 0
+        self._collapsed = 0
+        self._abandoned = 0
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        on_progress: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """
+        Executa func() ou se junta à execução em andamento para a mesma chave.
+
+        Args:
+            key: Chave de coalescência
+            func: Fábrica da corrotina (só é chamada pelo líder)
+            on_progress: Recebe os passos publicados pela chamada (``publish``)
+
+        Returns:
+            Resultado compartilhado da chamada
+        """
+        call = self._inflight.get(key)
+        if call is None:
+            task = asyncio.ensure_future(func())
+            call = _InFlight(task)
+            self._inflight[key] = call
+            task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+            self._leaders += 1
+        else:
+            self._collapsed += 1
+            logger.debug(f"[coalescer:{self.name}] Request agregado à chamada em andamento")
+
+        call.subscribers += 1
+        if on_progress is not None:
+            for step in call.progress:
+                on_progress(step)
+            call.listeners.append(on_progress)
+        try:
+            # shield: o cancelamento de um assinante não derruba os demais
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.subscribers == 1:
+                # Último assinante saiu: ninguém mais espera o resultado
+                call.task.cancel()
+                self._abandoned += 1
+            raise
+        finally:
+            call.subscribers -= 1
+            if on_progress is not None:
+                call.listeners.remove(on_progress)
+
+    def publish(self, key: str, step: Any) -> None:
+        """Repassa um passo de progresso da chamada em andamento a todos os assinantes."""
+        call = self._inflight.get(key)
+        if call is None:
+            return
+        call.progress.append(step)
+        for listener in list(call.listeners):
+            listener(step)
+
+    def _forget(self, key: str, call: _InFlight) -> None:
+        """Remove a chamada concluída (a próxima requisição dispara uma nova)."""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.task.cancelled():
+            # Evita "exception was never retrieved" quando ninguém mais aguarda
+            call.task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de coalescência."""
+        total = self._leaders + self._collapsed
+        return {
+            "leaders": self._leaders,
+            "collapsed": self._collapsed,
+            "abandoned": self._abandoned,
+            "in_flight": len(self._inflight),
+            "collapse_ratio": round(self._collapsed / total, 4) if total else 0.0,
+        }
+
+    def reset(self) -> None:
+        """Zera estatísticas (útil para testes)."""
+        self._leaders = 0
+        self._collapsed = 0
+        self._abandoned = 0
+
+
+def chat_coalescing_key(prompt: str, schema_version: Optional[str]) -> str:
+    """Chave do chat: pergunta normalizada + versão do schema."""
+    return f"{schema_version or '-'}|{normalize_prompt(prompt)}"
+
+
+# Instância global para o fluxo de chat (suggest + execute)
+chat_coalescer = SingleFlight("chat")
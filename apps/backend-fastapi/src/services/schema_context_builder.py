@@ -0,0 +1,174 @@
+"""Contexto de schema enviado ao LLM, podado pela relevância para a pergunta.
+
+Em vez de mandar a descrição de todas as tabelas a cada chamada, usa as
+entidades da pergunta (``QuestionAnalyzerService``) para escolher as tabelas e
+colunas relevantes e monta o texto dentro de um orçamento de tokens
+(SCHEMA_CONTEXT_MAX_TOKENS). Com um schema maior, o prompt cresce com a
+pergunta, não com o banco.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from src.config import settings
+from src.domain.question_analysis import QuestionAnalysis
+from src.domain.schema_info import SchemaInfo, TableInfo
+from src.services.question_analyzer_service import QuestionAnalyzerService, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Colunas listadas nas descrições curadas ("- coluna: ...")
+_DESCRIBED_COLUMN_RE = re.compile(r"^\s*-\s*([a-zA-Z_]\w*)\s*:", re.MULTILINE)
+
+# Entidades muito curtas casam com qualquer coisa ("id", "uti")
+MIN_ENTITY_LENGTH = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens do texto (~4 caracteres por token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+@dataclass
+class SchemaContext:
+    """Contexto de schema pronto para o prompt."""
+
+    text: str
+    tables: List[str]
+    tokens: int
+    # Tabelas relevantes que ficaram de fora ou foram compactadas pelo orçamento
+    truncated: List[str] = field(default_factory=list)
+
+
+class SchemaContextBuilder:
+    """Seleciona tabelas/colunas relevantes e renderiza o contexto dentro do orçamento."""
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return normalize_text(text or "").lower()
+
+    @classmethod
+    def rank_tables(
+        cls,
+        entities: Sequence[str],
+        tables: Sequence[str],
+        descriptions: Dict[str, str],
+        schema: Optional[SchemaInfo] = None,
+        found_tables: Sequence[str] = (),
+    ) -> List[str]:
+        """Tabelas com alguma relação com as entidades, da mais para a menos relevante.
+
+        Pontuação: tabela reconhecida pelo analisador ou citada pelo nome (3),
+        entidade que é nome de coluna (2), entidade presente na descrição (1).
+        """
+        terms = [cls._normalize(e) for e in entities if len(e) >= MIN_ENTITY_LENGTH]
+        found = {cls._normalize(t) for t in found_tables}
+        scores: Dict[str, int] = {}
+        for name in tables:
+            table_name = cls._normalize(name)
+            columns = [cls._normalize(c) for c in cls._column_names(name, descriptions, schema)]
+            description = cls._normalize(descriptions.get(name, ""))
+            score = 3 if table_name in found else 0
+            for term in terms:
+                if term in table_name or table_name in term:
+                    score += 3
+                elif any(term == column or term in column.split("_") for column in columns):
+                    score += 2
+                elif term in description:
+                    score += 1
+            if score:
+                scores[name] = score
+        return sorted(scores, key=lambda name: (-scores[name], list(tables).index(name)))
+
+    @staticmethod
+    def _column_names(name: str, descriptions: Dict[str, str], schema: Optional[SchemaInfo]) -> List[str]:
+        table = schema.get_table(name) if schema else None
+        if table is not None:
+            return [column.name for column in table.columns]
+        return _DESCRIBED_COLUMN_RE.findall(descriptions.get(name, ""))
+
+    @classmethod
+    def _render_full(cls, name: str, descriptions: Dict[str, str], table: Optional[TableInfo], terms: List[str]) -> str:
+        """Descrição curada da tabela ou, sem ela, as colunas do schema (relevantes primeiro)."""
+        if name in descriptions:
+            return f"- {name}:{descriptions[name].rstrip()}"
+        if table is None:
+            return f"- {name}"
+
+        def relevance(column) -> int:
+            column_name = cls._normalize(column.name)
+            if any(term in column_name for term in terms):
+                return 0
+            if column_name.endswith("id") or "status" in column_name:
+                return 1
+            return 2
+
+        columns = sorted(table.columns, key=relevance)
+        rendered = ", ".join(f"{column.name} {column.type}" for column in columns)
+        description = f" ({table.description})" if table.description else ""
+        return f"- {name}{description}: {rendered}"
+
+    @classmethod
+    def _render_compact(cls, name: str, descriptions: Dict[str, str], schema: Optional[SchemaInfo]) -> str:
+        """Só o nome da tabela e das colunas."""
+        return f"- {name}: {', '.join(cls._column_names(name, descriptions, schema))}"
+
+    @classmethod
+    def build(
+        cls,
+        question: str,
+        tables: Sequence[str],
+        descriptions: Optional[Dict[str, str]] = None,
+        schema: Optional[SchemaInfo] = None,
+        analysis: Optional[QuestionAnalysis] = None,
+        max_tokens: Optional[int] = None,
+    ) -> SchemaContext:
+        """Monta o contexto de ``tables`` relevante para ``question`` dentro de ``max_tokens``.
+
+        Args:
+            question: Pergunta do usuário
+            tables: Tabelas que podem ser usadas no SQL (as expostas ao agente)
+            descriptions: Descrições curadas por tabela (têm prioridade sobre o schema)
+            schema: Schema detectado (colunas das tabelas sem descrição curada)
+            analysis: Análise já feita da pergunta (evita extrair as entidades de novo)
+            max_tokens: Orçamento; padrão SCHEMA_CONTEXT_MAX_TOKENS
+
+        Returns:
+            SchemaContext; sem nenhuma tabela relevante, considera todas as permitidas
+        """
+        descriptions = descriptions or {}
+        max_tokens = max_tokens if max_tokens is not None else settings.SCHEMA_CONTEXT_MAX_TOKENS
+        if analysis is not None:
+            entities, found = analysis.entities_mentioned, analysis.entities_found_in_schema
+        else:
+            entities, found = QuestionAnalyzerService.extract_entities(question)[0], []
+
+        ranked = cls.rank_tables(entities, tables, descriptions, schema, found) or list(tables)
+        terms = [cls._normalize(e) for e in entities if len(e) >= MIN_ENTITY_LENGTH]
+
+        parts: List[str] = []
+        selected: List[str] = []
+        truncated: List[str] = []
+        used = 0
+        for name in ranked:
+            table = schema.get_table(name) if schema else None
+            text = cls._render_full(name, descriptions, table, terms)
+            if used + estimate_tokens(text) > max_tokens:
+                truncated.append(name)
+                text = cls._render_compact(name, descriptions, schema)
+                if used + estimate_tokens(text) > max_tokens:
+                    continue
+            parts.append(text)
+            selected.append(name)
+            used += estimate_tokens(text)
+
+        context = SchemaContext(text="\n".join(parts), tables=selected, tokens=used, truncated=truncated)
+        logger.info(
+            f"[schema_context] {len(selected)}/{len(tables)} tabelas, ~{used} tokens"
+            + (f" (compactadas/omitidas: {', '.join(truncated)})" if truncated else "")
+        )
+        return context
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
@@ -25,6 +26,7 @@ class SchemaDetectorService:
     # Class-level cache (shared across all instances)
     _cache: Optional[SchemaInfo] = None
     _cache_timestamp: Optional[datetime] = None
+    _schema_version: Optional[str] = None  # Fingerprint de tabelas/colunas do último schema detectado
     _refresh_lock: asyncio.Lock = asyncio.Lock()
     _ttl: timedelta = timedelta(seconds=settings.SCHEMA_CACHE_TTL_SECONDS)
     
@@ -72,6 +74,7 @@ class SchemaDetectorService:
                 new_schema = await cls._detect_schema(db)
                 cls._cache = new_schema
                 cls._cache_timestamp = now
+                cls._schema_version = cls._fingerprint(new_schema)
                 
                 logger.info(f"Schema cache refreshed: {len(new_schema.tables)} tables, {new_schema.total_columns} columns")
                 return new_schema
@@ -128,7 +131,7 @@ class SchemaDetectorService:
         ORDER BY t.table_name, c.ordinal_position;
         """
         
-        rows = await db.execute_query(query)
+        rows = await db.execute_query(query, read_only=True)
         return cls._parse_query_results(rows)
     
     @classmethod
@@ -219,10 +222,34 @@ class SchemaDetectorService:
             return datetime.utcnow() - cls._cache_timestamp
         return None
     
+    @classmethod
+    def get_schema_version(cls) -> Optional[str]:
+        """
+        Get fingerprint of the last detected schema.
+        
+        Changes only when tables/columns change, so it can key caches derived
+        from the schema (e.g. the SQLAgent's table info).
+        
+        Returns:
+            Short hex digest, or None if the schema was never detected
+        """
+        return cls._schema_version
+    
+    @staticmethod
+    def _fingerprint(schema: SchemaInfo) -> str:
+        """Hash of table/column names, types and nullability."""
+        parts = sorted(
+            f"{table.name}.{column.name}:{column.type}:{column.nullable}"
+            for table in schema.tables
+            for column in table.columns
+        )
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+    
     @classmethod
     def clear_cache(cls):
         """Clear the schema cache (useful for testing)."""
         cls._cache = None
         cls._cache_timestamp = None
+        cls._schema_version = None
         logger.info("Schema cache cleared")
 
@@ -2,9 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+
 import pytest
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Dict
+from unittest.mock import patch
+
+import psycopg
 
 from src.domain.schema_info import SchemaInfo, TableInfo, ColumnInfo
 
@@ -104,6 +110,104 @@ def ambiguous_questions():
     ]
 
 
+class FakePgCursor:
+    """Minimal stand-in for psycopg.AsyncCursor."""
+
+    def __init__(self, conn: "FakePgConnection", name: str | None = None):
+        self.conn = conn
+        self.name = name
+        self.description = None
+        self._rows: list[tuple] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None, prepare=None, **kwargs):
+        self.conn.round_trips += 1
+        self.conn.executed.append(query)
+        if prepare:
+            self.conn.prepared.add(query)
+        if self.conn.fail_with is not None:
+            raise self.conn.fail_with
+        if self.conn.delay:
+            # Simula query lenta: termina no tempo ou aborta com cancel_safe()
+            try:
+                await asyncio.wait_for(self.conn.cancel_requested.wait(), timeout=self.conn.delay)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                self.conn.cancel_requested.clear()
+                raise psycopg.errors.QueryCanceled("canceling statement due to user request")
+        columns, self._rows = self.conn.results.get(query.strip(), (["?column?"], [(1,)]))
+        self.description = [(name,) for name in columns]
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def fetchall(self):
+        return list(self._rows)
+
+    async def fetchmany(self, size=1):
+        # Em cursores nomeados cada fetch é um round trip (FETCH FORWARD n)
+        self.conn.round_trips += 1
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        return batch
+
+
+class FakePgConnection:
+    """Minimal stand-in for psycopg.AsyncConnection that counts round trips."""
+
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.round_trips = 0
+        self.executed: list[str] = []
+        self.results: dict[str, tuple[list[str], list[tuple]]] = {}
+        self.fail_with: Exception | None = None
+        self.prepared: set[str] = set()
+        self.delay = 0.0
+        self.cancels = 0
+        self.cancel_requested = asyncio.Event()
+        self.prepared_max = None
+        self.info = type("Info", (), {"transaction_status": psycopg.pq.TransactionStatus.IDLE})()
+
+    def cursor(self, name=None, **kwargs):
+        return FakePgCursor(self, name=name)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def rollback(self):
+        self.round_trips += 1
+
+    async def cancel_safe(self):
+        self.cancels += 1
+        self.cancel_requested.set()
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_pg_connect():
+    """Patches psycopg connect so pools create FakePgConnection instances."""
+    created: list[FakePgConnection] = []
+
+    async def connect(conninfo, **kwargs):
+        conn = FakePgConnection()
+        conn.conninfo = conninfo
+        conn.connect_kwargs = kwargs
+        created.append(conn)
+        return conn
+
+    with patch("src.database.psycopg.AsyncConnection.connect", side_effect=connect):
+        yield created
+
+
 # TODO: Add database connection fixture after Phase 2 domain models
 # @pytest.fixture
 # async def db_connection():
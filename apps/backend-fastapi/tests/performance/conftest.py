@@ -0,0 +1,39 @@
+"""Fixtures compartilhadas dos testes de performance."""
+
+from __future__ import annotations
+
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from src.agents.sql_agent import SQLAgentService
+from src.config import settings
+from src.services.schema_detector_service import SchemaDetectorService
+
+
+@pytest.fixture
+def offline_agent(tmp_path, monkeypatch):
+    """SQLAgent real do LangChain sobre um SQLite local com as tabelas do chat."""
+    agent_toolkits = pytest.importorskip("langchain_community.agent_toolkits")
+    utilities = pytest.importorskip("langchain_community.utilities")
+
+    db_path = tmp_path / "hospital.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        "CREATE TABLE leitos (leito_id INTEGER, setor TEXT, status TEXT);"
+        "CREATE TABLE especialidades (especialidade_id INTEGER, nome TEXT);"
+        "CREATE TABLE atendimentos (atendimento_id INTEGER, especialidade_id INTEGER, valor REAL);"
+    )
+    conn.close()
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{db_path}")
+    monkeypatch.setattr(settings, "ENABLE_SMART_DETECTION", False)
+    SQLAgentService.reset_shared_sql_db()
+    SQLAgentService.reset_agents()
+    SchemaDetectorService.clear_cache()
+    with patch("src.agents.sql_agent.create_sql_agent", agent_toolkits.create_sql_agent), patch(
+        "src.agents.sql_agent.SQLDatabase", utilities.SQLDatabase
+    ):
+        yield
+    SQLAgentService.reset_shared_sql_db()
+    SQLAgentService.reset_agents()
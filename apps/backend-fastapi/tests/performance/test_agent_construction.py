@@ -0,0 +1,134 @@
+"""Benchmark do custo de construir o SQLAgentService por request."""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.agents.sql_agent import SQLAgentService
+from src.services.llm_service import LLMService
+from src.services.schema_detector_service import SchemaDetectorService
+
+REFLECTION_COST = 0.02  # Engine nova + reflexão das tabelas no NeonDB (estimativa conservadora)
+REQUESTS = 20
+
+
+class FakeSQLDatabase:
+    """Stand-in do SQLDatabase do LangChain que simula o custo de from_uri."""
+
+    instances = 0
+
+    def __init__(self):
+        FakeSQLDatabase.instances += 1
+        self.table_info_calls = 0
+        self._engine = type("Engine", (), {"dispose": lambda self: None})()
+
+    @classmethod
+    def from_uri(cls, database_uri, engine_args=None, **kwargs):
+        time.sleep(REFLECTION_COST)
+        return cls()
+
+    def get_usable_table_names(self):
+        return ["leitos"]
+
+    def get_table_info(self, table_names=None):
+        self.table_info_calls += 1
+        return "CREATE TABLE leitos (...)"
+
+
+AGENTS_BUILT: list[object] = []
+
+
+def _fake_create_sql_agent(**kwargs):
+    agent = object()
+    AGENTS_BUILT.append(agent)
+    return agent
+
+
+@pytest.fixture
+def fake_langchain():
+    FakeSQLDatabase.instances = 0
+    AGENTS_BUILT.clear()
+    SQLAgentService.reset_shared_sql_db()
+    SQLAgentService.reset_agents()
+    SchemaDetectorService.clear_cache()
+    with patch("src.agents.sql_agent.SQLDatabase", FakeSQLDatabase), patch(
+        "src.agents.sql_agent.create_sql_agent", _fake_create_sql_agent
+    ):
+        yield
+    SQLAgentService.reset_shared_sql_db()
+    SQLAgentService.reset_agents()
+    SchemaDetectorService.clear_cache()
+
+
+def _construct(n: int, shared: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        if not shared:
+            SQLAgentService.reset_shared_sql_db()
+        service = SQLAgentService(llm=object(), db_conn=object())
+        assert service.sql_agent is not None
+    return (time.perf_counter() - started) / n
+
+
+def test_agent_construction_reuses_shared_sql_db(fake_langchain):
+    per_request_before = _construct(REQUESTS, shared=False)
+    assert FakeSQLDatabase.instances == REQUESTS
+
+    FakeSQLDatabase.instances = 0
+    SQLAgentService.reset_shared_sql_db()
+    per_request_after = _construct(REQUESTS, shared=True)
+
+    print(
+        f"\n[bench] construção do SQLAgentService: SQLDatabase por request={1000 * per_request_before:.2f}ms, "
+        f"compartilhado={1000 * per_request_after:.2f}ms"
+    )
+    assert FakeSQLDatabase.instances == 1
+    assert per_request_after < per_request_before / 5
+
+
+def test_shared_sql_db_invalidated_by_schema_version(fake_langchain):
+    first = SQLAgentService.get_shared_sql_db()
+
+    # Primeira detecção do schema só registra a versão
+    SchemaDetectorService._schema_version = "v1"
+    assert SQLAgentService.get_shared_sql_db() is first
+
+    SchemaDetectorService._schema_version = "v2"
+    second = SQLAgentService.get_shared_sql_db()
+    assert second is not first
+    assert FakeSQLDatabase.instances == 2
+    assert SQLAgentService.get_shared_sql_db() is second
+
+
+def test_table_info_is_memoized(fake_langchain):
+    sql_db = SQLAgentService.get_shared_sql_db()
+    for _ in range(5):
+        sql_db.get_table_info(["leitos", "atendimentos"])
+    sql_db.get_table_info(["atendimentos", "leitos"])
+    # Um render por conjunto de tabelas
+    assert sql_db.table_info_calls == 1
+
+
+def test_agents_prebuilt_once_per_provider(fake_langchain):
+    google, openai = object(), object()
+    with patch.dict(LLMService._llm_instances, {"google": google, "openai": openai}, clear=True):
+        assert SQLAgentService.prebuild_agents() == 2
+        assert len(AGENTS_BUILT) == 2
+
+        first = SQLAgentService(llm=google, db_conn=object())
+        second = SQLAgentService(llm=google, db_conn=object())
+        assert first.sql_agent is second.sql_agent
+
+        # Fallback de provedor: só troca o LLM e busca o agente pronto
+        first.llm = openai
+        first._initialize_agent()
+        assert first.sql_agent is not second.sql_agent
+        assert len(AGENTS_BUILT) == 2
+
+        # Nova instância do provedor (ex.: recriada pelo health check) reconstrói o agente
+        LLMService._llm_instances["google"] = object()
+        SQLAgentService(llm=LLMService._llm_instances["google"], db_conn=object())
+        assert len(AGENTS_BUILT) == 3
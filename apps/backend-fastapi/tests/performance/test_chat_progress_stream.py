@@ -0,0 +1,102 @@
+"""Passos do agente repassados ao stream SSE antes da resposta final (time-to-first-byte)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_community.agent_toolkits")
+
+from src.agents.sql_agent import SQLAgentService
+from src.api.routes.chat import _sse_event, _stream_progress, _suggest_and_execute
+from src.services.local_fake_llm import LocalFakeChatModel
+
+FAKE_LATENCY_MS = 50
+PROMPT = "Qual a taxa de ocupação da UTI pediátrica?"
+
+
+@pytest.mark.asyncio
+async def test_agent_steps_arrive_before_suggestion(offline_agent):
+    llm = LocalFakeChatModel(latency_ms=FAKE_LATENCY_MS, emulate_tools=True)
+    service = SQLAgentService(llm=llm, db_conn=object())
+    steps = []
+
+    started = time.perf_counter()
+    suggestion = await service.suggest(
+        PROMPT, on_progress=lambda step: steps.append((time.perf_counter() - started, step))
+    )
+    total = time.perf_counter() - started
+
+    assert [step["step"] for _, step in steps] == ["tables_listed", "schema_inspected"]
+    # Schema podado pela pergunta: o agente só vê a tabela relevante
+    assert steps[0][1]["tables"] == ["leitos"]
+    assert steps[1][1]["tables"] == ["leitos"]
+    first = steps[0][0]
+    print(f"\n[progress] primeiro passo em {first * 1000:.0f}ms, sugestão em {total * 1000:.0f}ms")
+    assert first < total / 2
+    assert "UTI_PEDIATRICA" in suggestion.sql
+
+
+@pytest.mark.asyncio
+async def test_stream_progress_drains_queue_until_task_done():
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def work():
+        queue.put_nowait({"step": "tables_listed"})
+        await asyncio.sleep(0.01)
+        queue.put_nowait({"step": "sql_drafted"})
+        return "ok"
+
+    task = asyncio.ensure_future(work())
+    received = [step["step"] async for step in _stream_progress(task, queue)]
+
+    assert received == ["tables_listed", "sql_drafted"]
+    assert task.result() == "ok"
+
+
+@pytest.mark.asyncio
+async def test_stream_progress_ends_when_task_finishes_without_steps():
+    # Sem progresso (ex.: resposta inteligente com CHAT_STREAM_PROGRESS=false): a task
+    # termina com o queue.get() ainda esperando
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    task = asyncio.ensure_future(work())
+    received = [step async for step in _stream_progress(task, queue)]
+
+    assert received == []
+    assert task.result() == "ok"
+
+
+@pytest.mark.asyncio
+async def test_execution_is_announced_before_the_query_runs():
+    steps = []
+
+    class Agent:
+        async def suggest(self, prompt, hedge=False, on_progress=None):
+            assert on_progress is None  # passos do agente desligados
+            return SimpleNamespace(sql="SELECT 1", comments=None)
+
+        async def execute(self, sql, approved=False, timeout=None):
+            # O stream já recebeu o aviso quando a consulta começa
+            assert steps == [{"step": "executing", "sql": "SELECT 1"}]
+            return "rows"
+
+    suggestion, result, error = await _suggest_and_execute(Agent(), PROMPT, steps.append, agent_steps=False)
+
+    assert (suggestion.sql, result, error) == ("SELECT 1", "rows", None)
+
+
+def test_progress_is_a_named_sse_event():
+    frame = _sse_event("progress", {"step": "sql_drafted", "sql": "SELECT 1"})
+    event_line, data_line, *_ = frame.split("\n")
+    assert event_line == "event: progress"
+    assert json.loads(data_line.removeprefix("data: ")) == {"step": "sql_drafted", "sql": "SELECT 1"}
+    assert frame.endswith("\n\n")
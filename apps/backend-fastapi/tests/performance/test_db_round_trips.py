@@ -0,0 +1,69 @@
+"""Benchmark de round trips ao banco por request de chat."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.database import Database
+
+# Um request de chat típico: SQL gerado + leitura de schema + inserção de auditoria
+CHAT_REQUEST_QUERIES = [
+    "SELECT COUNT(*) FILTER (WHERE status = 'ocupado') AS ocupados, COUNT(*) AS total FROM leitos",
+    "SELECT table_name, column_name FROM information_schema.columns",
+    "INSERT INTO public.audit_entries (session_id, user_id, prompt, sql_executed, legal_basis) VALUES (%s, %s, %s, %s, %s)",
+]
+
+
+async def _round_trips_per_chat_request(check_on_checkout: bool, fake_pg_connect) -> int:
+    database = Database("postgresql://bench")
+    await database.connect()
+    database._pool.check_on_checkout = check_on_checkout
+    try:
+        conn = fake_pg_connect[-1]
+        before = conn.round_trips
+        for query in CHAT_REQUEST_QUERIES:
+            await database.execute_query(query)
+        return conn.round_trips - before
+    finally:
+        await database.disconnect()
+
+
+@pytest.mark.asyncio
+class TestDatabaseRoundTrips:
+    """Conta round trips ao NeonDB por request de chat (antes/depois do probe por empréstimo)."""
+
+    async def test_round_trips_per_chat_request(self, fake_pg_connect):
+        with_probe = await _round_trips_per_chat_request(True, fake_pg_connect)
+        without_probe = await _round_trips_per_chat_request(False, fake_pg_connect)
+
+        print(
+            f"\n[bench] round trips por request de chat ({len(CHAT_REQUEST_QUERIES)} queries): "
+            f"com SELECT 1 por empréstimo={with_probe}, sem={without_probe}"
+        )
+        # Antes: SELECT 1 + ROLLBACK do probe antes de cada query
+        assert with_probe == 3 * len(CHAT_REQUEST_QUERIES)
+        # Depois: um round trip por query
+        assert without_probe == len(CHAT_REQUEST_QUERIES)
+
+
+@pytest.mark.asyncio
+async def test_audit_insert_prepared_once_per_connection(fake_pg_connect):
+    """A inserção de auditoria repetida só é planejada na primeira execução por conexão."""
+    from src.observability.audit_logger import AUDIT_INSERT_SQL
+
+    database = Database("postgresql://bench")
+    await database.connect()
+    try:
+        params = ("00000000-0000-0000-0000-000000000000", "demo-user", "p", "SELECT 1", "legitimate_interest")
+        for _ in range(20):
+            await database.execute_query(AUDIT_INSERT_SQL, params, prepare=True)
+        stats = database.get_pool_stats()
+        print(
+            f"\n[bench] 20 inserções de auditoria: prepared hits={stats['prepared_hits']}, "
+            f"misses={stats['prepared_misses']}"
+        )
+        assert stats["prepared_misses"] == 1
+        assert stats["prepared_hits"] == 19
+        assert AUDIT_INSERT_SQL in fake_pg_connect[-1].prepared
+    finally:
+        await database.disconnect()
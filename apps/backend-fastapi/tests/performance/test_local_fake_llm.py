@@ -0,0 +1,98 @@
+"""Carga no caminho SQLAgentService com o provedor local_fake (sem rede, sem quota)."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langchain_community.agent_toolkits")
+
+from src.agents.sql_agent import SQLAgentService
+from src.config import settings
+from src.services.llm_service import LLMService
+from src.services.local_fake_llm import LocalFakeChatModel
+
+CONCURRENT_REQUESTS = 50
+FAKE_LATENCY_MS = 20
+PROMPT = "Qual a taxa de ocupação da UTI pediátrica?"
+
+
+@pytest.mark.asyncio
+async def test_suggest_under_load_offline(offline_agent):
+    llm = LocalFakeChatModel(latency_ms=FAKE_LATENCY_MS)
+    SQLAgentService(llm=llm, db_conn=object())  # Aquece SQLDatabase + agente compartilhados
+
+    started = time.perf_counter()
+    suggestions = await asyncio.gather(
+        *(SQLAgentService(llm=llm, db_conn=object()).suggest(PROMPT) for _ in range(CONCURRENT_REQUESTS))
+    )
+    elapsed = time.perf_counter() - started
+
+    serial = CONCURRENT_REQUESTS * FAKE_LATENCY_MS / 1000
+    print(f"\n[local_fake] {CONCURRENT_REQUESTS} suggests concorrentes em {elapsed * 1000:.0f}ms (serial: {serial * 1000:.0f}ms)")
+    assert llm.calls == CONCURRENT_REQUESTS
+    assert all("UTI_PEDIATRICA" in s.sql for s in suggestions)
+    assert elapsed < serial / 2
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_fall_back_without_network(offline_agent):
+    llm = LocalFakeChatModel(error_rate=1.0)
+
+    suggestion = await SQLAgentService(llm=llm, db_conn=object()).suggest(PROMPT)
+
+    # 429 injetado -> sem outro provedor, cai no fallback mínimo por padrões
+    assert "UTI_PEDIATRICA" in suggestion.sql
+    assert "fallback" in suggestion.comments
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_fallback_goes_through_invoke_agent(offline_agent, monkeypatch):
+    failing, backup = LocalFakeChatModel(error_rate=1.0), LocalFakeChatModel()
+    provider_ids = {id(failing): "primary", id(backup): "backup"}
+    monkeypatch.setattr(LLMService, "get_provider_id", classmethod(lambda cls, llm: provider_ids.get(id(llm))))
+    monkeypatch.setattr(LLMService, "get_llm_with_fallback", classmethod(lambda cls, failed_provider_id=None: backup))
+    invoked = []
+    invoke_agent = SQLAgentService._invoke_agent
+
+    async def spy(self, agent, provider_id, enhanced_prompt, timeout, on_progress=None, tables=None):
+        invoked.append((provider_id, tables))
+        return await invoke_agent(self, agent, provider_id, enhanced_prompt, timeout, on_progress, tables=tables)
+
+    monkeypatch.setattr(SQLAgentService, "_invoke_agent", spy)
+
+    suggestion = await SQLAgentService(llm=failing, db_conn=object()).suggest(PROMPT)
+
+    # O retry no provedor de fallback também tem timeout, latência e poda de schema
+    assert [provider_id for provider_id, _ in invoked] == ["primary", "backup"]
+    assert invoked[1][1] == invoked[0][1]
+    assert backup.calls >= 1
+    assert "(fallback)" in suggestion.comments
+
+
+def test_error_injection_is_deterministic():
+    first = LocalFakeChatModel(error_rate=0.3, jitter_ms=10, latency_ms=10, seed=7)
+    second = LocalFakeChatModel(error_rate=0.3, jitter_ms=10, latency_ms=10, seed=7)
+    draws = [first._draw() for _ in range(100)]
+    assert draws == [second._draw() for _ in range(100)]
+    assert 10 < sum(fail for _, fail in draws) < 50
+
+
+def test_rules_and_unknown_answer():
+    llm = LocalFakeChatModel(rules=[{"pattern": r"cirurgias", "answer": "Não sei"}])
+    assert llm.answer("Quantas cirurgias hoje?") == "Não sei"
+    assert "não encontrei" in llm.answer("Qual o clima?").lower()
+
+
+def test_llm_service_builds_local_fake_provider(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_PRIORITY", "local_fake")
+    monkeypatch.setattr(LLMService, "_initialized", False)
+    monkeypatch.setattr(LLMService, "_providers", {})
+    monkeypatch.setattr(LLMService, "_llm_instances", {})
+
+    llm = LLMService.get_llm()
+
+    assert isinstance(llm, LocalFakeChatModel)
+    assert LLMService.get_provider_id(llm) == "local_fake"
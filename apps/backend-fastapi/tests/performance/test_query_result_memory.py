@@ -0,0 +1,33 @@
+"""Benchmark de memória: list[dict] por linha vs QueryResult (colunas + tuplas)."""
+
+from __future__ import annotations
+
+import tracemalloc
+
+from src.database import QueryResult
+
+COLUMNS = [f"coluna_{i}" for i in range(20)]
+ROWS = [tuple(range(n, n + len(COLUMNS))) for n in range(20_000)]
+
+
+def _allocated(build) -> int:
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def test_query_result_uses_less_memory_than_dict_rows():
+    as_dicts = _allocated(lambda: [dict(zip(COLUMNS, row)) for row in ROWS])
+    compact = _allocated(lambda: QueryResult(COLUMNS, ROWS))
+
+    print(
+        f"\n[bench] {len(ROWS)} linhas x {len(COLUMNS)} colunas: "
+        f"list[dict]={as_dicts / 1024:.0f} KiB, QueryResult={compact / 1024:.0f} KiB"
+    )
+    # As tuplas vêm do driver; o QueryResult só adiciona cabeçalho e índice
+    assert compact < as_dicts / 10
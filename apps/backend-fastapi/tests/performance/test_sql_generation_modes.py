@@ -0,0 +1,119 @@
+"""Benchmark de SQL_GENERATION_MODE: agente multi-turno vs. single_shot (provedor local_fake)."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+pytest.importorskip("langchain_community.agent_toolkits")
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from src.agents.sql_agent import SQLAgentService
+from src.config import settings
+from src.services.local_fake_llm import LocalFakeChatModel
+
+FAKE_LATENCY_MS = 20
+QUESTIONS = [
+    "Qual a taxa de ocupação da UTI pediátrica?",
+    "Quantos leitos disponíveis por setor?",
+    "Qual o total faturado?",
+    "Liste as especialidades",
+]
+
+
+async def _run(mode: str, monkeypatch) -> dict:
+    """Roda as perguntas em ``mode`` e devolve turnos, tokens e latência médios por pergunta."""
+    monkeypatch.setattr(settings, "SQL_GENERATION_MODE", mode)
+    llm = LocalFakeChatModel(latency_ms=FAKE_LATENCY_MS, emulate_tools=True)
+    SQLAgentService(llm=llm, db_conn=object())  # Aquece SQLDatabase + agente compartilhados
+
+    suggestions = []
+    with get_usage_metadata_callback() as usage:
+        started = time.perf_counter()
+        for question in QUESTIONS:
+            suggestions.append(await SQLAgentService(llm=llm, db_conn=object()).suggest(question))
+        elapsed = time.perf_counter() - started
+
+    tokens = sum(item["total_tokens"] for item in usage.usage_metadata.values())
+    assert all("SELECT" in s.sql for s in suggestions)
+    return {
+        "turns": llm.calls / len(QUESTIONS),
+        "tokens": tokens / len(QUESTIONS),
+        "latency_ms": 1000 * elapsed / len(QUESTIONS),
+        "suggestions": suggestions,
+    }
+
+
+@pytest.mark.asyncio
+async def test_single_shot_uses_fewer_turns_than_agent(offline_agent, monkeypatch):
+    agent = await _run("agent", monkeypatch)
+    single = await _run("single_shot", monkeypatch)
+
+    for name, stats in (("agent", agent), ("single_shot", single)):
+        print(
+            f"\n[sql_generation] {name}: {stats['turns']:.1f} turnos, ~{stats['tokens']:.0f} tokens, "
+            f"{stats['latency_ms']:.0f}ms por pergunta"
+        )
+    assert single["turns"] == 1
+    assert agent["turns"] >= 3  # list_tables -> schema -> resposta
+    assert single["latency_ms"] < agent["latency_ms"]
+    assert all("single_shot" in s.comments for s in single["suggestions"])
+    assert [s.sql for s in single["suggestions"]] == [s.sql for s in agent["suggestions"]]
+
+
+@pytest.mark.asyncio
+async def test_invalid_single_shot_sql_falls_back_to_agent(offline_agent, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_GENERATION_MODE", "single_shot")
+    # Tabela fora de INCLUDE_TABLES: rejeitada pela validação do single_shot
+    llm = LocalFakeChatModel(rules=[{"pattern": "cirurgias", "sql": "SELECT COUNT(*) FROM cirurgias;"}])
+
+    suggestion = await SQLAgentService(llm=llm, db_conn=object()).suggest("Quantas cirurgias hoje?")
+
+    assert llm.calls == 2  # single_shot rejeitado + agente
+    assert "SQLAgent" in suggestion.comments
+
+
+@pytest.mark.asyncio
+async def test_agent_lists_only_relevant_tables(offline_agent, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_GENERATION_MODE", "agent")
+    llm = LocalFakeChatModel(emulate_tools=True)
+    steps = []
+
+    suggestion = await SQLAgentService(llm=llm, db_conn=object()).suggest(
+        "Liste as especialidades", on_progress=steps.append
+    )
+
+    assert [s["tables"] for s in steps if s["step"] == "tables_listed"] == [["especialidades"]]
+    assert "FROM especialidades" in suggestion.sql
+    # Fora do escopo de um request, o SQLDatabase compartilhado expõe todas as tabelas
+    assert sorted(SQLAgentService.get_shared_sql_db().get_usable_table_names()) == [
+        "atendimentos", "especialidades", "leitos"
+    ]
+
+
+def test_single_shot_validation():
+    problems = SQLAgentService._single_shot_problems
+    assert problems("SELECT COUNT(*) FROM leitos;") == []
+    assert problems("WITH t AS (SELECT * FROM public.leitos) SELECT COUNT(*) FROM t") == []
+    assert problems("SELECT 1; DROP TABLE leitos") == ["mais de um comando"]
+    assert problems("SELECT * FROM pacientes JOIN leitos USING (leito_id)") == ["tabelas desconhecidas: pacientes"]
+    assert problems("Não sei") == ["resposta sem SELECT"]
+    # FROM dentro de funções não é tabela
+    assert problems("SELECT EXTRACT(YEAR FROM data_entrada), COUNT(*) FROM atendimentos GROUP BY 1") == []
+    assert problems("SELECT SUBSTRING(nome FROM 2) FROM (SELECT nome FROM especialidades) e") == []
+    assert problems("SELECT * FROM leitos WHERE status = 'livre FROM pacientes'") == []
+
+
+def test_single_shot_and_validate_accept_the_same_statements():
+    problems = SQLAgentService._single_shot_problems
+    service = SQLAgentService.__new__(SQLAgentService)
+    for sql in (
+        "WITH t AS (SELECT * FROM leitos) SELECT COUNT(*) FROM t",
+        "-- leitos livres\nSELECT COUNT(*) FROM leitos",
+    ):
+        assert problems(sql) == []
+        assert service.validate(sql)["is_valid"]
+    cte_delete = "WITH t AS (DELETE FROM leitos RETURNING *) SELECT COUNT(*) FROM t"
+    assert not service.validate(cte_delete)["is_valid"]
@@ -0,0 +1,173 @@
+"""Tempo de startup da API: import sem LangChain e lifespan com banco + provedores em paralelo."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.api import main
+from src.services import cache_service
+from src.services.llm_service import LLMService
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+HEAVY_MODULES = [
+    "langchain_community",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_google_genai",
+    "langchain_huggingface",
+]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import src.api.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+LIFESPAN_SCRIPT = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from src.api import main
+from src.services import cache_service
+
+async def noop(*args, **kwargs):
+    return None
+
+main.db.connect = main.db.disconnect = main.db.execute_one = noop
+cache_service._cache_service = cache_service.CacheService(sys.argv[1])
+
+async def run():
+    async with main.lifespan(main.app):
+        startup = time.perf_counter() - started
+        from src.agents.sql_agent import SQLAgentService
+        agents_at_startup = len(SQLAgentService._agents)
+        while not SQLAgentService._agents and time.perf_counter() - started < 30:
+            await asyncio.sleep(0.01)
+        prebuilt = time.perf_counter() - started
+        print(json.dumps({"startup": startup, "prebuilt": prebuilt, "agents_at_startup": agents_at_startup,
+                          "agents": sorted(SQLAgentService._agents)}))
+
+asyncio.run(run())
+"""
+
+
+def test_api_import_does_not_load_langchain():
+    # Processo novo: no processo do pytest o LangChain já foi importado por outros testes
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    print(f"\n[startup] import src.api.main em {result['seconds'] * 1000:.0f}ms")
+    assert result["loaded"] == []
+
+
+@pytest.mark.asyncio
+async def test_lifespan_connects_db_while_providers_initialize(monkeypatch, tmp_path):
+    delay = 0.2
+
+    async def connect():
+        await asyncio.sleep(delay)
+
+    def initialize_providers():
+        time.sleep(delay)  # Import do SDK + criação do cliente (bloqueante)
+        LLMService._initialized = True
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(main, "LANGCHAIN_AVAILABLE", True)
+    monkeypatch.setattr(main.db, "connect", connect)
+    monkeypatch.setattr(main.db, "disconnect", noop)
+    monkeypatch.setattr(main.db, "execute_one", noop)
+    monkeypatch.setattr(LLMService, "_initialized", False)
+    monkeypatch.setattr(LLMService, "_providers", {})
+    monkeypatch.setattr(LLMService, "_initialize_providers", initialize_providers)
+    monkeypatch.setattr(cache_service, "_cache_service", cache_service.CacheService(str(tmp_path / "cache.db")))
+
+    started = time.perf_counter()
+    async with main.lifespan(main.app):
+        elapsed = time.perf_counter() - started
+
+    print(f"\n[startup] lifespan em {elapsed * 1000:.0f}ms (banco e provedores: {delay * 1000:.0f}ms cada)")
+    assert LLMService._initialized
+    assert elapsed < 2 * delay * 0.9
+
+
+
+@pytest.mark.asyncio
+async def test_lifespan_does_not_leave_providers_task_when_db_fails(monkeypatch):
+    async def connect():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("banco fora do ar")
+
+    initialized = []
+
+    def initialize_providers():
+        time.sleep(0.2)
+        initialized.append(True)
+
+    monkeypatch.setattr(main, "LANGCHAIN_AVAILABLE", True)
+    monkeypatch.setattr(main.db, "connect", connect)
+    monkeypatch.setattr(LLMService, "_initialize_providers", initialize_providers)
+
+    with pytest.raises(ConnectionError):
+        async with main.lifespan(main.app):
+            pass
+
+    # A thread terminou antes de o erro ser propagado
+    assert initialized == [True]
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+def test_cold_start_does_not_wait_for_agent_prebuild(tmp_path):
+    pytest.importorskip("langchain_community.agent_toolkits")
+    # Processo novo, com um provedor configurado: o prebuild importa o LangChain e reflete o schema
+    db_path = tmp_path / "hospital.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        "CREATE TABLE leitos (leito_id INTEGER, setor TEXT, status TEXT);"
+        "CREATE TABLE especialidades (especialidade_id INTEGER, nome TEXT);"
+        "CREATE TABLE atendimentos (atendimento_id INTEGER, especialidade_id INTEGER, valor REAL);"
+    )
+    conn.close()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "LLM_PROVIDER_PRIORITY": "local_fake",
+        "ENABLE_SMART_DETECTION": "false",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", LIFESPAN_SCRIPT, str(tmp_path / "cache.db")],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # O shutdown do lifespan ainda imprime depois do resultado
+    result = json.loads(next(line for line in reversed(output.splitlines()) if line.startswith("{")))
+
+    print(
+        f"\n[startup] API pronta em {result['startup'] * 1000:.0f}ms; "
+        f"agentes pré-construídos em {result['prebuilt'] * 1000:.0f}ms"
+    )
+    assert result["agents"] == ["local_fake"]
+    assert result["agents_at_startup"] == 0
+    assert result["startup"] < result["prebuilt"]
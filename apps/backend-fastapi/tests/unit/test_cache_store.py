@@ -0,0 +1,281 @@
+"""Unit tests for SQLiteCacheStore and CacheService persistence."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from src.config import settings
+from src.domain.cache_entry import CacheEntry
+from src.services.cache_service import CacheService
+from src.services.cache_store import SQLiteCacheStore
+
+
+def _entry(i: int) -> CacheEntry:
+    return CacheEntry(
+        question=f"Pergunta {i}",
+        sql=f"SELECT {i} FROM leitos",
+        response_template="Resposta {count}",
+    )
+
+
+def _write_legacy(path, entries):
+    data = {"version": "1.0", "last_updated": None, "entries": [e.model_dump(mode="json") for e in entries]}
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+class TestCacheServicePersistence:
+    """Test suite for the SQLite-backed CacheService."""
+
+    def test_imports_legacy_json_once(self, tmp_path):
+        legacy = tmp_path / "response_cache.json"
+        _write_legacy(legacy, [_entry(1), _entry(2)])
+
+        service = CacheService(str(legacy))
+        assert service.cache_file == tmp_path / "response_cache.db"
+        assert len(service.get_all_entries()) == 2
+
+        # O JSON não é mais escrito nem reimportado
+        service.add_entry(_entry(3))
+        _write_legacy(legacy, [])
+        assert len(CacheService(str(legacy)).get_all_entries()) == 3
+
+    def test_mutations_survive_reopen(self, tmp_path):
+        db_file = tmp_path / "cache.db"
+        service = CacheService(str(db_file))
+        first, second = _entry(1), _entry(2)
+        service.add_entry(first)
+        service.add_entry(second)
+        service.increment_usage(first.entry_id)
+        service.delete_entry(second.entry_id)
+        service.flush_usage()
+
+        reopened = CacheService(str(db_file))
+        assert [e.entry_id for e in reopened.get_all_entries()] == [first.entry_id]
+        assert reopened.get_entry(first.entry_id).usage_count == 1
+
+    def test_usage_write_cost_does_not_grow_with_cache(self, tmp_path):
+        def usage_write_seconds(size: int) -> float:
+            store = SQLiteCacheStore(tmp_path / f"cache_{size}.db")
+            entries = [_entry(i).model_dump(mode="json") for i in range(size)]
+            store.upsert_many(entries)
+            started = time.perf_counter()
+            for _ in range(50):
+                store.upsert(entries[0])
+            return time.perf_counter() - started
+
+        small, large = usage_write_seconds(10), usage_write_seconds(5000)
+        print(f"\n[cache_store] 50 escritas: {small * 1000:.1f}ms (10 entradas), {large * 1000:.1f}ms (5000 entradas)")
+        assert large < small * 5
+
+
+class TestUsageWriteBehind:
+    """Usage counters are kept in memory and flushed in batches."""
+
+    def test_cache_hit_does_not_touch_disk(self, tmp_path, monkeypatch):
+        service = CacheService(str(tmp_path / "cache.db"))
+        entry = _entry(1)
+        service.add_entry(entry)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("escrita no caminho do cache hit")
+
+        monkeypatch.setattr(service.store, "upsert_many", fail)
+        for _ in range(3):
+            service.increment_usage(entry.entry_id)
+        monkeypatch.undo()
+
+        assert service.get_entry(entry.entry_id).usage_count == 3
+        assert CacheService(str(tmp_path / "cache.db")).get_entry(entry.entry_id).usage_count == 0
+        assert service.get_stats()["pending_usage_writes"] == 1
+
+        assert service.flush_usage() == 1
+        reopened = CacheService(str(tmp_path / "cache.db")).get_entry(entry.entry_id)
+        assert reopened.usage_count == 3
+        assert reopened.last_used is not None
+
+    def test_update_does_not_drop_pending_usage(self, tmp_path):
+        service = CacheService(str(tmp_path / "cache.db"))
+        entry = _entry(1)
+        service.add_entry(entry)
+        service.increment_usage(entry.entry_id)
+        service.flush_usage()
+
+        service.increment_usage(entry.entry_id)
+        service.update_entry(entry.model_copy(update={"response_template": "Nova {count}"}))
+        service.flush_usage()
+
+        reopened = CacheService(str(tmp_path / "cache.db")).get_entry(entry.entry_id)
+        assert reopened.response_template == "Nova {count}"
+        assert reopened.usage_count == 2
+
+    def test_flush_does_not_resurrect_deleted_entry(self, tmp_path):
+        service = CacheService(str(tmp_path / "cache.db"))
+        entry = _entry(1)
+        service.add_entry(entry)
+        service.increment_usage(entry.entry_id)
+        service.delete_entry(entry.entry_id)
+
+        assert service.flush_usage() == 0
+        assert CacheService(str(tmp_path / "cache.db")).get_all_entries() == []
+
+    @pytest.mark.asyncio
+    async def test_periodic_flush_and_final_flush_on_stop(self, tmp_path):
+        service = CacheService(str(tmp_path / "cache.db"))
+        first, second = _entry(1), _entry(2)
+        service.add_entry(first)
+        service.add_entry(second)
+
+        await service.start_background_persistence(interval=0.05)
+        service.increment_usage(first.entry_id)
+        await asyncio.sleep(0.2)
+        assert service.store.load_all()[0]["usage_count"] == 1
+
+        service.increment_usage(second.entry_id)
+        await service.stop_background_persistence()
+        assert [e["usage_count"] for e in service.store.load_all()] == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_compacts_in_background_after_deletes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_COMPACT_INTERVAL_SECONDS", 0)
+        service = CacheService(str(tmp_path / "cache.db"))
+        compactions = []
+        monkeypatch.setattr(service.store, "compact", lambda: compactions.append(threading.current_thread().name))
+        entry = _entry(1)
+        service.add_entry(entry)
+
+        await service.start_background_persistence(interval=0.05)
+        await asyncio.sleep(0.15)
+        assert compactions == []  # sem remoções, nada a compactar
+
+        service.delete_entry(entry.entry_id)
+        assert compactions == []  # não no caminho da remoção
+        await asyncio.sleep(0.15)
+        await service.stop_background_persistence()
+        assert len(compactions) == 1
+        assert compactions[0].startswith("cache-writer")
+        assert not service.compact_due()
+
+
+class TestSnapshots:
+    """Snapshots are taken in the background and can be restored."""
+
+    def test_bulk_insert_does_not_snapshot(self, tmp_path):
+        service = CacheService(str(tmp_path / "cache.db"))
+        for i in range(20):
+            service.add_entry(_entry(i))
+        assert service.list_backups() == []
+
+    def test_backup_due_by_write_count(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_BACKUP_EVERY_WRITES", 3)
+        service = CacheService(str(tmp_path / "cache.db"))
+        assert not service.backup_due()
+
+        service.add_entry(_entry(1))
+        service.add_entry(_entry(2))
+        assert not service.backup_due()
+        service.add_entry(_entry(3))
+        assert service.backup_due()
+
+        service.create_backup()
+        assert not service.backup_due()
+        assert len(service.list_backups()) == 1
+
+    def test_restore_latest_snapshot(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_BACKUP_KEEP", 2)
+        service = CacheService(str(tmp_path / "cache.db"))
+        kept = _entry(1)
+        service.add_entry(kept)
+        for _ in range(3):
+            service.create_backup()
+        assert len(service.list_backups()) == 2
+
+        service.delete_entry(kept.entry_id)
+        service.add_entry(_entry(2))
+        service.restore_backup()
+
+        assert [e.entry_id for e in service.get_all_entries()] == [kept.entry_id]
+        assert [e.entry_id for e in CacheService(str(tmp_path / "cache.db")).get_all_entries()] == [kept.entry_id]
+
+    def test_restore_without_snapshot_fails(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            CacheService(str(tmp_path / "cache.db")).restore_backup()
+
+
+class TestOffLoopPersistence:
+    """Async variants write on the cache writer thread and readers see a consistent index."""
+
+    @pytest.mark.asyncio
+    async def test_slow_write_does_not_block_event_loop(self, tmp_path, monkeypatch):
+        service = CacheService(str(tmp_path / "cache.db"))
+        upsert_many = service.store.upsert_many
+        threads = []
+
+        def slow_upsert(entries):
+            threads.append(threading.current_thread().name)
+            time.sleep(0.3)  # fsync lento
+            upsert_many(entries)
+
+        monkeypatch.setattr(service.store, "upsert_many", slow_upsert)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        entry = _entry(1)
+        await service.aadd_entry(entry)
+        task.cancel()
+
+        assert ticks >= 10
+        assert threads[0].startswith("cache-writer")
+        assert service.get_entry(entry.entry_id) is entry
+
+    def test_readers_never_see_partial_index(self, tmp_path):
+        service = CacheService(str(tmp_path / "cache.db"))
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set():
+                try:
+                    for entry in service.get_all_entries():
+                        entry.question
+                    sum(1 for _ in service._entries.values())
+                except RuntimeError as e:  # dictionary changed size during iteration
+                    errors.append(e)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        entries = [_entry(i) for i in range(200)]
+        for entry in entries:
+            service.add_entry(entry)
+        for entry in entries[:100]:
+            service.delete_entry(entry.entry_id)
+        done.set()
+        thread.join()
+
+        assert errors == []
+        assert len(service.get_all_entries()) == 100
+
+
+def test_compact_releases_deleted_pages(tmp_path):
+    store = SQLiteCacheStore(tmp_path / "cache.db")
+    entries = [dict(_entry(i).model_dump(mode="json"), sql="SELECT " + "x" * 2000) for i in range(500)]
+    store.upsert_many(entries)
+    store.compact()
+    full = store.size_bytes()
+
+    store.delete_many(e["entry_id"] for e in entries[:450])
+    store.compact()
+
+    assert store.count() == 50
+    assert store.size_bytes() < full / 2
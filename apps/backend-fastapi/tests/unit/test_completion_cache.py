@@ -0,0 +1,70 @@
+"""Unit tests for the on-disk LLM completion cache (record/replay)."""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import HumanMessage
+from langchain_core.outputs import Generation
+
+from src.services.completion_cache import CompletionCache, CompletionCacheMiss
+from src.services.local_fake_llm import LocalFakeChatModel
+from src.services.schema_detector_service import SchemaDetectorService
+
+QUESTION = [HumanMessage(content="Qual a taxa de ocupação da UTI pediátrica?")]
+
+
+@pytest.fixture(autouse=True)
+def schema_version(monkeypatch):
+    monkeypatch.setattr(SchemaDetectorService, "_schema_version", "v1")
+
+
+class TestCompletionCache:
+    """Test suite for CompletionCache."""
+
+    def test_record_then_replay(self, tmp_path):
+        recorder = LocalFakeChatModel(cache=CompletionCache(str(tmp_path), max_bytes=0, mode="record"))
+        first = recorder.invoke(QUESTION)
+        assert recorder.invoke(QUESTION).content == first.content
+        assert recorder.calls == 1
+        assert recorder.cache.get_stats()["hits"] == 1
+
+        # Novo processo: índice reconstruído do disco, sem chamar o modelo
+        player = LocalFakeChatModel(cache=CompletionCache(str(tmp_path), max_bytes=0, mode="replay"))
+        assert player.invoke(QUESTION).content == first.content
+        assert player.calls == 0
+
+    def test_replay_miss_raises(self, tmp_path):
+        llm = LocalFakeChatModel(cache=CompletionCache(str(tmp_path), max_bytes=0, mode="replay"))
+        with pytest.raises(CompletionCacheMiss):
+            llm.invoke(QUESTION)
+        assert llm.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_key_includes_schema_version_and_model_params(self, tmp_path):
+        cache = CompletionCache(str(tmp_path), max_bytes=0, mode="record")
+        llm = LocalFakeChatModel(cache=cache)
+        await llm.ainvoke(QUESTION)
+
+        SchemaDetectorService._schema_version = "v2"
+        await llm.ainvoke(QUESTION)
+        await LocalFakeChatModel(cache=cache, seed=7).ainvoke(QUESTION)
+
+        assert cache.get_stats()["entries"] == 3
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = CompletionCache(str(tmp_path), max_bytes=1000, mode="record")
+        entry = [Generation(text="x" * 380)]
+        cache.update("a", "llm", entry)
+        cache.update("b", "llm", entry)
+        assert cache.lookup("a", "llm")  # "a" passa a ser a mais recente
+
+        cache.update("c", "llm", entry)
+
+        stats = cache.get_stats()
+        assert stats["evictions"] == 1
+        assert stats["bytes"] <= 1000
+        assert cache.lookup("b", "llm") is None
+        assert cache.lookup("a", "llm") and cache.lookup("c", "llm")
@@ -0,0 +1,147 @@
+"""Unit tests for the async connection pool in src.database."""
+
+from __future__ import annotations
+
+import asyncio
+import pytest
+
+import psycopg
+
+from src.database import ConnectionPool, PoolTimeout
+
+
+@pytest.mark.asyncio
+class TestConnectionPool:
+    """Test suite for ConnectionPool."""
+
+    async def test_open_creates_min_size_connections(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=2, max_size=4)
+        await pool.open()
+        try:
+            assert len(fake_pg_connect) == 2
+            assert pool.get_stats()["connections_idle"] == 2
+        finally:
+            await pool.close()
+
+    async def test_connections_are_reused(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=0, max_size=4)
+        await pool.open()
+        try:
+            async with pool.connection() as first:
+                assert pool.get_stats()["connections_in_use"] == 1
+            async with pool.connection() as second:
+                pass
+            assert first is second
+            assert len(fake_pg_connect) == 1
+        finally:
+            await pool.close()
+
+    async def test_acquire_times_out_when_exhausted(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=0, max_size=1, timeout=0.05)
+        await pool.open()
+        try:
+            async with pool.connection():
+                with pytest.raises(PoolTimeout):
+                    async with pool.connection():
+                        pass
+            stats = pool.get_stats()
+            assert stats["requests_timed_out"] == 1
+            assert stats["wait_time_max_ms"] >= 50
+        finally:
+            await pool.close()
+
+    async def test_waiters_get_released_connection(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=0, max_size=1, timeout=1)
+        await pool.open()
+        try:
+            async def borrow():
+                async with pool.connection():
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(borrow() for _ in range(5)))
+            stats = pool.get_stats()
+            assert stats["requests_total"] == 5
+            assert stats["connections_in_use"] == 0
+            assert len(fake_pg_connect) == 1
+        finally:
+            await pool.close()
+
+    async def test_broken_connection_is_discarded(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=0, max_size=2)
+        await pool.open()
+        try:
+            async with pool.connection() as conn:
+                conn.broken = True
+            async with pool.connection() as conn2:
+                assert conn2 is not conn
+            assert pool.get_stats()["connections_closed"] == 1
+        finally:
+            await pool.close()
+
+    async def test_reap_closes_idle_and_expired(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=1, max_size=4, max_idle=0, max_lifetime=3600)
+        await pool.open()
+        try:
+            async with pool.connection():
+                async with pool.connection():
+                    pass
+            assert pool.get_stats()["connections_idle"] == 2
+
+            await pool._reap_idle()
+            # Mantém min_size conexões mesmo ociosas
+            assert pool.get_stats()["connections_idle"] == 1
+
+            pool.max_lifetime = 0
+            await pool._reap_idle()
+            assert pool.get_stats()["connections_idle"] == 0
+        finally:
+            await pool.close()
+
+    async def test_checkout_does_not_probe_by_default(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=1, max_size=2)
+        await pool.open()
+        try:
+            for _ in range(3):
+                async with pool.connection():
+                    pass
+            assert fake_pg_connect[0].executed == []
+        finally:
+            await pool.close()
+
+    async def test_background_check_discards_dead_idle_connection(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=1, max_size=2, check_interval=0)
+        await pool.open()
+        try:
+            dead = fake_pg_connect[0]
+            dead.fail_with = psycopg.OperationalError("server closed the connection unexpectedly")
+
+            await pool._check_idle()
+            stats = pool.get_stats()
+            assert stats["checks_failed"] == 1
+            assert stats["connections_idle"] == 0
+            assert dead.closed
+        finally:
+            await pool.close()
+
+    async def test_prepared_statements_tracked_per_connection_lru(self, fake_pg_connect):
+        pool = ConnectionPool("postgresql://test", min_size=1, max_size=1, prepared_max=2)
+        await pool.open()
+        try:
+            conn = fake_pg_connect[0]
+            assert conn.connect_kwargs == {"prepare_threshold": None}
+            assert conn.prepared_max == 2
+
+            async with pool.connection() as c:
+                assert pool.track_prepared(c, "A") is False
+                assert pool.track_prepared(c, "A") is True
+                pool.track_prepared(c, "B")
+                pool.track_prepared(c, "C")  # Remove "A" (menos usado)
+                assert pool.track_prepared(c, "A") is False
+
+            stats = pool.get_stats()
+            assert stats["prepared_hits"] == 1
+            assert stats["prepared_misses"] == 4
+            assert stats["prepared_evictions"] == 2
+            assert stats["prepared_cached"] == 2
+        finally:
+            await pool.close()
@@ -0,0 +1,84 @@
+"""Unit tests for read-replica routing in src.database."""
+
+from __future__ import annotations
+
+import psycopg
+import pytest
+
+from src.agents.sql_agent import SQLAgentService
+from src.database import Database
+
+PRIMARY = "postgresql://primary"
+REPLICA = "postgresql://replica"
+
+
+def _conns(fake_pg_connect, conninfo):
+    return [c for c in fake_pg_connect if c.conninfo == conninfo]
+
+
+@pytest.mark.asyncio
+class TestReadReplica:
+    """Test suite for replica routing and failover."""
+
+    async def test_reads_go_to_replica_and_writes_to_primary(self, fake_pg_connect):
+        database = Database(PRIMARY, REPLICA)
+        await database.connect()
+        try:
+            await database.execute_query("SELECT * FROM leitos", read_only=True)
+            await database.execute_query("INSERT INTO public.audit_entries VALUES (%s)", ("x",))
+
+            assert _conns(fake_pg_connect, REPLICA)[0].executed == ["SELECT * FROM leitos"]
+            assert _conns(fake_pg_connect, PRIMARY)[0].executed == ["INSERT INTO public.audit_entries VALUES (%s)"]
+            assert database.get_pool_stats()["replica"]["healthy"] is True
+        finally:
+            await database.disconnect()
+
+    async def test_failover_to_primary_when_replica_breaks(self, fake_pg_connect):
+        database = Database(PRIMARY, REPLICA)
+        await database.connect()
+        try:
+            replica = _conns(fake_pg_connect, REPLICA)[0]
+            replica.fail_with = psycopg.OperationalError("server closed the connection unexpectedly")
+
+            result = await database.execute_query("SELECT * FROM leitos", read_only=True)
+            assert len(result) == 1
+            assert _conns(fake_pg_connect, PRIMARY)[0].executed == ["SELECT * FROM leitos"]
+
+            stats = database.get_pool_stats()["replica"]
+            assert stats["healthy"] is False
+            assert stats["failovers"] == 1
+
+            # Enquanto marcada indisponível, leituras nem tentam a réplica
+            await database.execute_query("SELECT 2", read_only=True)
+            assert replica.executed == ["SELECT * FROM leitos"]
+        finally:
+            await database.disconnect()
+
+    async def test_stream_fails_over_before_first_row(self, fake_pg_connect):
+        database = Database(PRIMARY, REPLICA)
+        await database.connect()
+        try:
+            _conns(fake_pg_connect, REPLICA)[0].fail_with = psycopg.OperationalError("connection lost")
+            rows = [row async for row in database.stream_query("SELECT 1", read_only=True)]
+            assert rows == [{"?column?": 1}]
+            assert _conns(fake_pg_connect, PRIMARY)[0].executed == ["SELECT 1"]
+        finally:
+            await database.disconnect()
+
+    async def test_without_replica_reads_use_primary(self, fake_pg_connect):
+        database = Database(PRIMARY)
+        await database.connect()
+        try:
+            await database.execute_query("SELECT 1", read_only=True)
+            assert [c.conninfo for c in fake_pg_connect] == [PRIMARY]
+            assert "replica" not in database.get_pool_stats()
+        finally:
+            await database.disconnect()
+
+
+def test_validate_classifies_read_only():
+    service = SQLAgentService.__new__(SQLAgentService)
+    assert service.validate("SELECT * FROM leitos")["read_only"] is True
+    assert service.validate("SELECT * FROM leitos FOR SHARE")["read_only"] is False
+    assert service.validate("SELECT nextval('seq')")["read_only"] is False
+    assert service.validate("DELETE FROM leitos")["read_only"] is False
@@ -0,0 +1,48 @@
+"""Unit tests for Database.stream_query (server-side cursor streaming)."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.database import Database
+
+QUERY = "SELECT id, status FROM leitos"
+
+
+@pytest.mark.asyncio
+class TestStreamQuery:
+    """Test suite for Database.stream_query."""
+
+    async def test_streams_rows_in_batches(self, fake_pg_connect):
+        database = Database("postgresql://test")
+        await database.connect()
+        try:
+            conn = fake_pg_connect[-1]
+            conn.results[QUERY] = (["id", "status"], [(i, "ocupado") for i in range(5)])
+            before = conn.round_trips
+
+            rows = [row async for row in database.stream_query(QUERY, batch_size=2)]
+
+            assert rows[0] == {"id": 0, "status": "ocupado"}
+            assert len(rows) == 5
+            # 1 DECLARE + 3 fetches com dados + 1 fetch vazio
+            assert conn.round_trips - before == 5
+        finally:
+            await database.disconnect()
+
+    async def test_early_close_returns_connection(self, fake_pg_connect):
+        database = Database("postgresql://test")
+        await database.connect()
+        try:
+            conn = fake_pg_connect[-1]
+            conn.results[QUERY] = (["id", "status"], [(i, "livre") for i in range(100)])
+
+            stream = database.stream_query(QUERY, batch_size=10)
+            first = await stream.__anext__()
+            assert first["id"] == 0
+            assert database.get_pool_stats()["connections_in_use"] == 1
+
+            await stream.aclose()
+            assert database.get_pool_stats()["connections_in_use"] == 0
+        finally:
+            await database.disconnect()
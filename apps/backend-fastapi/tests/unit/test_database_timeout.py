@@ -0,0 +1,66 @@
+"""Unit tests for statement timeouts and server-side cancellation in src.database."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.database import Database, QueryTimeoutError
+
+SLOW_QUERY = "SELECT * FROM atendimentos a CROSS JOIN atendimentos b"
+
+
+@pytest.mark.asyncio
+class TestStatementTimeout:
+    """Test suite for per-call statement timeouts."""
+
+    async def test_timeout_cancels_query_on_server(self, fake_pg_connect):
+        database = Database("postgresql://test")
+        await database.connect()
+        try:
+            conn = fake_pg_connect[-1]
+            conn.delay = 5
+
+            with pytest.raises(QueryTimeoutError):
+                await database.execute_query(SLOW_QUERY, timeout=0.05)
+
+            assert conn.cancels == 1
+            # Sem retry: a query lenta não é reexecutada
+            assert conn.executed.count(SLOW_QUERY) == 1
+            stats = database.get_pool_stats()
+            assert stats["connections_in_use"] == 0
+            assert stats["connections_idle"] == 1
+        finally:
+            await database.disconnect()
+
+    async def test_fast_query_is_not_cancelled(self, fake_pg_connect):
+        database = Database("postgresql://test")
+        await database.connect()
+        try:
+            conn = fake_pg_connect[-1]
+            conn.delay = 0.01
+            result = await database.execute_query("SELECT 1", timeout=1)
+            assert len(result) == 1
+            assert conn.cancels == 0
+        finally:
+            await database.disconnect()
+
+    async def test_task_cancellation_cancels_query_on_server(self, fake_pg_connect):
+        database = Database("postgresql://test")
+        await database.connect()
+        try:
+            conn = fake_pg_connect[-1]
+            conn.delay = 5
+
+            # Ex.: cliente SSE desconectou e o Starlette cancelou a task do stream
+            task = asyncio.create_task(database.execute_query(SLOW_QUERY, timeout=0))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            assert conn.cancels == 1
+            assert database.get_pool_stats()["connections_in_use"] == 0
+        finally:
+            await database.disconnect()
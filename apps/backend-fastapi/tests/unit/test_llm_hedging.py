@@ -0,0 +1,156 @@
+"""Unit tests for hedged LLM requests across providers (SQLAgentService/LLMService)."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.agents.sql_agent import SQLAgentService
+from src.config import settings
+from src.domain.llm_provider import LLMProvider, ProviderType
+from src.observability.metrics import LLMMetrics
+from src.services.llm_service import LLMService
+
+SQL_OUTPUT = {"output": "SELECT COUNT(*) FROM leitos"}
+
+
+class FakeAgent:
+    """Agente que responde após `delay` segundos."""
+
+    def __init__(self, delay: float, output=SQL_OUTPUT, error: Exception | None = None):
+        self.delay = delay
+        self.output = output
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def ainvoke(self, payload):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.output
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Dois provedores saudáveis (primary > backup) e métricas zeradas."""
+    llms = {"primary": object(), "backup": object()}
+    monkeypatch.setattr(LLMService, "_initialized", True)
+    monkeypatch.setattr(LLMService, "_providers", {
+        "primary": LLMProvider(provider_id="primary", provider_type=ProviderType.OPENROUTER, priority=1),
+        "backup": LLMProvider(provider_id="backup", provider_type=ProviderType.OPENROUTER, priority=2),
+    })
+    monkeypatch.setattr(LLMService, "_llm_instances", dict(llms))
+    metrics = LLMMetrics()
+    for _ in range(3):
+        metrics.record_call_latency("primary", 0.01)  # p90 ~10 ms -> hedge após LLM_HEDGE_MIN_DELAY
+    monkeypatch.setattr("src.agents.sql_agent.llm_metrics", metrics)
+    monkeypatch.setattr("src.services.llm_service.llm_metrics", metrics)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.02)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 3)
+    return llms, metrics
+
+
+def _service(llms, agents, monkeypatch) -> SQLAgentService:
+    by_llm = {id(llms[name]): agent for name, agent in agents.items()}
+    monkeypatch.setattr(SQLAgentService, "get_agent", classmethod(lambda cls, llm, sql_db=None: by_llm[id(llm)]))
+    service = SQLAgentService(llm=llms["primary"])
+    service.sql_agent = agents["primary"]
+    return service
+
+
+class TestHedgeDelay:
+    """Test suite for LLMService.get_hedge_delay."""
+
+    def test_uses_observed_p90(self, providers):
+        _, metrics = providers
+        for latency in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0):
+            metrics.record_call_latency("backup", latency)
+        assert LLMService.get_hedge_delay("backup") == pytest.approx(1.0)
+
+    def test_without_history_waits_half_the_timeout(self, providers):
+        assert LLMService.get_hedge_delay("backup") == settings.LLM_REQUEST_TIMEOUT / 2
+
+    def test_route_configuration(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_HEDGE_ROUTES", "chat, sql_assist")
+        assert LLMService.hedging_enabled("chat")
+        assert not LLMService.hedging_enabled("workbench")
+
+
+@pytest.mark.asyncio
+class TestHedgedInvoke:
+    """Test suite for SQLAgentService._invoke_hedged."""
+
+    async def test_fast_primary_does_not_fire_hedge(self, providers, monkeypatch):
+        llms, metrics = providers
+        agents = {"primary": FakeAgent(0.0), "backup": FakeAgent(0.0)}
+        service = _service(llms, agents, monkeypatch)
+
+        result = await service._invoke_hedged("prompt", timeout=1)
+
+        assert result == SQL_OUTPUT
+        assert agents["backup"].calls == 0
+        assert metrics.get_hedge_stats()["fired"] == 0
+
+    async def test_slow_primary_loses_to_backup_and_is_cancelled(self, providers, monkeypatch):
+        llms, metrics = providers
+        agents = {"primary": FakeAgent(5.0), "backup": FakeAgent(0.01)}
+        service = _service(llms, agents, monkeypatch)
+
+        result = await asyncio.wait_for(service._invoke_hedged("prompt", timeout=10), 1)
+        await asyncio.sleep(0)
+
+        assert result == SQL_OUTPUT
+        assert agents["primary"].cancelled
+        assert service.llm is llms["backup"]
+        assert service.sql_agent is agents["backup"]
+        assert metrics.get_hedge_stats() == {"fired": 1, "won": 1, "win_rate": 1.0}
+
+    async def test_backup_without_sql_does_not_win(self, providers, monkeypatch):
+        llms, metrics = providers
+        agents = {
+            "primary": FakeAgent(0.1),
+            "backup": FakeAgent(0.0, output={"output": "Não sei responder"}),
+        }
+        service = _service(llms, agents, monkeypatch)
+
+        result = await service._invoke_hedged("prompt", timeout=1)
+
+        assert result == SQL_OUTPUT
+        assert service.llm is llms["primary"]
+        assert metrics.get_hedge_stats()["won"] == 0
+
+    async def test_primary_error_is_raised_when_both_fail(self, providers, monkeypatch):
+        llms, _ = providers
+        agents = {
+            "primary": FakeAgent(0.05, error=RuntimeError("429 quota")),
+            "backup": FakeAgent(0.0, error=RuntimeError("500")),
+        }
+        service = _service(llms, agents, monkeypatch)
+
+        with pytest.raises(RuntimeError, match="429"):
+            await service._invoke_hedged("prompt", timeout=1)
+        # A falha do reserva é registrada; a do principal fica para o fluxo normal
+        assert LLMService._providers["backup"].consecutive_failures == 1
+        assert LLMService._providers["primary"].consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_counted_apart_from_latencies(providers, monkeypatch):
+    llms, metrics = providers
+    agents = {"primary": FakeAgent(1.0), "backup": FakeAgent(0.0)}
+    service = _service(llms, agents, monkeypatch)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await service._invoke_agent(agents["primary"], "primary", "prompt", timeout=0.05)
+
+    assert metrics.get_provider_stats("primary")["call_timeouts"] == 1
+    assert metrics.consecutive_timeouts("primary") == 1
+    # A janela só tem as latências concluídas do fixture (~10 ms)
+    assert metrics.latency_percentile("primary", 0.99) == 0.01
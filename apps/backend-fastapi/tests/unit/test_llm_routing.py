@@ -0,0 +1,141 @@
+"""Unit tests for latency-aware provider routing and adaptive timeouts in LLMService."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.config import settings
+from src.domain.llm_provider import LLMProvider, ProviderType
+from src.observability.metrics import LLMMetrics
+from src.services.llm_service import LLMService
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """Três provedores saudáveis, estratégia fastest, sem exploração."""
+    monkeypatch.setattr(LLMService, "_providers", {
+        name: LLMProvider(provider_id=name, provider_type=ProviderType.OPENROUTER, priority=priority)
+        for priority, name in enumerate(("google", "openai", "openrouter"), start=1)
+    })
+    metrics = LLMMetrics(ewma_alpha=0.5)
+    monkeypatch.setattr("src.services.llm_service.llm_metrics", metrics)
+    monkeypatch.setattr(settings, "LLM_ROTATION_STRATEGY", "fastest")
+    monkeypatch.setattr(settings, "LLM_EXPLORATION_RATE", 0.0)
+    return metrics
+
+
+class TestEwmaEstimates:
+    """Test suite for the EWMA estimates in LLMMetrics."""
+
+    def test_latency_decays_towards_recent_calls(self):
+        metrics = LLMMetrics(ewma_alpha=0.5)
+        metrics.record_call_latency("google", 4.0)
+        metrics.record_call_latency("google", 1.0)
+        assert metrics.expected_completion_time("google", failure_penalty=0) == pytest.approx(2.5)
+
+    def test_errors_add_timeout_penalty(self):
+        metrics = LLMMetrics(ewma_alpha=0.5)
+        metrics.record_call_latency("google", 1.0)
+        metrics.record_failure("google")
+        # erro EWMA = 0.5 -> 1.0 + 0.5 * 4
+        assert metrics.expected_completion_time("google", failure_penalty=4) == pytest.approx(3.0)
+        assert metrics.expected_completion_time("openai", failure_penalty=4) is None
+
+
+class TestFastestStrategy:
+    """Test suite for LLMService._rotate_providers with LLM_ROTATION_STRATEGY=fastest."""
+
+    def test_unmeasured_providers_are_tried_first(self, metrics):
+        metrics.record_call_latency("google", 1.0)
+        assert LLMService._rotate_providers() == "openai"
+
+    def test_routes_to_lowest_expected_time(self, metrics):
+        metrics.record_call_latency("google", 2.0)
+        metrics.record_call_latency("openai", 0.8)
+        metrics.record_call_latency("openrouter", 1.5)
+        assert LLMService._rotate_providers() == "openai"
+
+        # openai começa a falhar: o custo esperado passa o do openrouter
+        metrics.record_failure("openai")
+        assert LLMService._rotate_providers() == "openrouter"
+
+    def test_exploration_picks_other_providers(self, metrics, monkeypatch):
+        for name, latency in (("google", 2.0), ("openai", 0.5), ("openrouter", 1.5)):
+            metrics.record_call_latency(name, latency)
+        monkeypatch.setattr(settings, "LLM_EXPLORATION_RATE", 1.0)
+        picks = {LLMService._rotate_providers() for _ in range(200)}
+        assert picks == {"google", "openai", "openrouter"}
+
+
+class TestAdaptiveTimeout:
+    """Test suite for LLMService.get_request_timeout."""
+
+    @pytest.fixture(autouse=True)
+    def _settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_ADAPTIVE_TIMEOUT", True)
+        monkeypatch.setattr(settings, "LLM_REQUEST_TIMEOUT", 4)
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_PERCENTILE", 0.99)
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_FACTOR", 1.5)
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_MIN", 2)
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_MAX", 20)
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_MIN_SAMPLES", 5)
+
+    def test_default_without_history(self, metrics):
+        assert LLMService.get_request_timeout("anthropic") == 4
+
+    def test_follows_p99_of_each_provider(self, metrics):
+        for _ in range(10):
+            metrics.record_call_latency("anthropic", 6.0)
+            metrics.record_call_latency("openrouter", 0.3)
+        assert LLMService.get_request_timeout("anthropic") == pytest.approx(9.0)
+        # Provedor rápido: p99 x fator fica abaixo do mínimo
+        assert LLMService.get_request_timeout("openrouter") == 2
+
+    def test_clamped_to_maximum(self, metrics):
+        for _ in range(10):
+            metrics.record_call_latency("anthropic", 30.0)
+        assert LLMService.get_request_timeout("anthropic") == 20
+
+    def test_timeouts_do_not_raise_the_timeout(self, metrics):
+        for _ in range(10):
+            metrics.record_call_latency("anthropic", 2.0)
+        for _ in range(2):
+            metrics.record_call_timeout("anthropic", 3.0)
+        assert LLMService.get_request_timeout("anthropic") == pytest.approx(3.0)
+        assert metrics.get_provider_stats("anthropic")["call_timeouts"] == 2
+
+    def test_provider_that_always_times_out_keeps_a_short_timeout(self, metrics, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_TIMEOUT_FAIL_FAST_AFTER", 3)
+        timeouts = []
+        for _ in range(30):
+            timeouts.append(LLMService.get_request_timeout("openrouter"))
+            metrics.record_call_timeout("openrouter", timeouts[-1])
+        # Endpoint fora do ar: nunca sobe, e após 3 timeouts seguidos falha rápido
+        assert timeouts[:3] == [4, 4, 4]
+        assert set(timeouts[3:]) == {2}
+
+        # Uma chamada concluída volta ao cálculo normal
+        metrics.record_call_latency("openrouter", 1.0)
+        assert LLMService.get_request_timeout("openrouter") == 4
+
+    def test_client_timeout_follows_adaptive_value(self, metrics, monkeypatch):
+        provider = LLMProvider(provider_id="local_fake", provider_type=ProviderType.LOCAL_FAKE, priority=1)
+        monkeypatch.setattr(LLMService, "_client_timeouts", {})
+        monkeypatch.setattr(LLMService, "_llm_instances", {"local_fake": LLMService._create_llm_instance(provider)})
+        built = LLMService._llm_instances["local_fake"]
+        assert LLMService._client_timeouts == {"local_fake": 4}
+        assert not LLMService._refresh_client_timeout(provider)
+
+        for _ in range(10):
+            metrics.record_call_latency("local_fake", 6.0)
+        assert LLMService._refresh_client_timeout(provider)
+        assert LLMService._client_timeouts["local_fake"] == pytest.approx(9.0)
+        assert LLMService._llm_instances["local_fake"] is not built
+
+    def test_visible_in_providers_status(self, metrics, monkeypatch):
+        monkeypatch.setattr(LLMService, "_initialized", True)
+        for _ in range(10):
+            metrics.record_call_latency("openai", 4.0)
+        status = {p["provider_id"]: p for p in LLMService.get_providers_status()}
+        assert status["openai"]["effective_timeout"] == pytest.approx(6.0)
+        assert status["google"]["effective_timeout"] == 4
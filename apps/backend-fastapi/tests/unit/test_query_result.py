@@ -0,0 +1,74 @@
+"""Unit tests for the compact QueryResult/Row types in src.database."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import pytest
+
+from src.api.routes.chat import _calculate_aggregation_from_rows, _calculate_uti_occupation_from_rows
+from src.database import Database, QueryResult
+
+LEITOS = QueryResult(
+    ["id", "setor", "status"],
+    [
+        (1, "UTI_ADULTO", "ocupado"),
+        (2, "UTI_ADULTO", "livre"),
+        (3, "UTI_PEDIATRICA", "ocupado"),
+        (4, "ENFERMARIA", "ocupado"),
+    ],
+)
+
+
+class TestQueryResult:
+    """Test suite for QueryResult and Row."""
+
+    def test_rows_behave_like_dicts(self):
+        row = LEITOS[0]
+        assert isinstance(row, Mapping)
+        assert row["setor"] == "UTI_ADULTO"
+        assert row.get("missing", "x") == "x"
+        assert "status" in row and "missing" not in row
+        assert list(row.keys()) == ["id", "setor", "status"]
+        assert row == {"id": 1, "setor": "UTI_ADULTO", "status": "ocupado"}
+
+    def test_rows_share_column_index(self):
+        assert LEITOS[0]._index is LEITOS[1]._index
+
+    def test_column_and_slice(self):
+        assert LEITOS.column("id") == [1, 2, 3, 4]
+        assert LEITOS.column("missing", 0) == [0, 0, 0, 0]
+        head = LEITOS[:2]
+        assert isinstance(head, QueryResult)
+        assert head.columns == LEITOS.columns
+        assert [row["id"] for row in head] == [1, 2]
+
+    def test_as_dicts_and_equality(self):
+        dicts = LEITOS.as_dicts()
+        assert dicts[3] == {"id": 4, "setor": "ENFERMARIA", "status": "ocupado"}
+        assert LEITOS == dicts
+        assert QueryResult() == []
+        assert not QueryResult()
+
+    def test_summary_helpers_work_on_columns(self):
+        uti = _calculate_uti_occupation_from_rows(LEITOS, "Qual a taxa de ocupação da UTI adulto?")
+        assert uti["ocupados"] == "1" and uti["total"] == "2" and uti["setor"] == "UTI Adulto"
+
+        faturamento = QueryResult(["procedimento", "valor"], [("A", 10.5), ("B", None), ("C", 4.5)])
+        soma = _calculate_aggregation_from_rows(faturamento, "Qual o valor total faturado?")
+        assert soma["tipo"] == "soma" and soma["valor"] == "15.0"
+
+
+@pytest.mark.asyncio
+async def test_execute_query_returns_query_result(fake_pg_connect):
+    database = Database("postgresql://test")
+    await database.connect()
+    try:
+        fake_pg_connect[-1].results["SELECT id, status FROM leitos"] = (["id", "status"], [(1, "livre")])
+        result = await database.execute_query("SELECT id, status FROM leitos")
+        assert isinstance(result, QueryResult)
+        assert result.columns == ("id", "status")
+        assert result[0]["status"] == "livre"
+        assert (await database.execute_one("SELECT id, status FROM leitos"))["id"] == 1
+    finally:
+        await database.disconnect()
@@ -0,0 +1,176 @@
+"""Unit tests for per-provider token buckets and quota-aware routing."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+
+from src.config import settings
+from src.domain.llm_provider import LLMProvider, ProviderType
+from src.observability.rate_limiter import ProviderRateLimiter
+from src.services import llm_service as llm_service_module
+from src.services.llm_service import LLMService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestProviderRateLimiter:
+    """Test suite for ProviderRateLimiter."""
+
+    def test_parse_limits(self):
+        assert ProviderRateLimiter.parse_limits("google:15/1500, openrouter:0/50,bad") == {
+            "google": (15, 1500),
+            "openrouter": (0, 50),
+        }
+
+    def test_minute_bucket_refills(self):
+        clock = FakeClock()
+        limiter = ProviderRateLimiter({"google": (2, 0)}, clock=clock)
+
+        for _ in range(2):
+            assert limiter.admit("google")
+            limiter.record_request("google")
+        assert not limiter.admit("google")
+
+        clock.now += 30  # metade do minuto repõe 1 token
+        assert limiter.admit("google")
+        assert limiter.get_stats("google")["throttled"] == 1
+
+    def test_refused_admissions_spend_nothing(self):
+        clock = FakeClock()
+        limiter = ProviderRateLimiter({"openrouter": (1, 10)}, clock=clock)
+
+        limiter.record_request("openrouter")
+        for _ in range(5):
+            assert not limiter.admit("openrouter")
+        assert limiter.get_stats("openrouter")["rpd_available"] == 9
+
+    def test_refund_is_capped_at_capacity(self):
+        limiter = ProviderRateLimiter({"google": (2, 0)}, clock=FakeClock())
+        limiter.record_request("google")
+        limiter.refund_request("google")
+        limiter.refund_request("google")
+        assert limiter.get_stats("google")["rpm_available"] == 2
+
+    def test_recorded_requests_go_below_zero(self):
+        clock = FakeClock()
+        limiter = ProviderRateLimiter({"google": (2, 0)}, clock=clock)
+
+        for _ in range(3):  # um agente com 3 passos já em andamento
+            limiter.record_request("google")
+        assert not limiter.admit("google")
+        assert limiter.get_stats("google")["throttled"] == 1
+
+        clock.now += 30  # 1 token repõe só o que ficou devendo
+        assert not limiter.has_capacity("google")
+        clock.now += 30
+        assert limiter.admit("google")
+
+    def test_unlimited_provider(self):
+        limiter = ProviderRateLimiter({})
+        for _ in range(100):
+            limiter.record_request("openai")
+        assert limiter.admit("openai")
+        assert limiter.remaining_fraction("openai") == 1.0
+
+
+@pytest.fixture
+def llm_service(monkeypatch):
+    """Dois provedores com instância; google limitado a 2 rpm."""
+    clock = FakeClock()
+    limiter = ProviderRateLimiter({"google": (2, 100), "openai": (10, 1000)}, clock=clock)
+    monkeypatch.setattr("src.services.llm_service.provider_rate_limiter", limiter)
+    monkeypatch.setattr(LLMService, "_initialized", True)
+    monkeypatch.setattr(LLMService, "_providers", {
+        "google": LLMProvider(provider_id="google", provider_type=ProviderType.OPENROUTER, priority=1),
+        "openai": LLMProvider(provider_id="openai", provider_type=ProviderType.OPENROUTER, priority=2),
+    })
+    monkeypatch.setattr(LLMService, "_llm_instances", {"google": "llm-google", "openai": "llm-openai"})
+    monkeypatch.setattr(LLMService, "_usage_tracking", {})
+    monkeypatch.setattr(settings, "LLM_ROTATION_STRATEGY", "priority")
+    return limiter
+
+
+def _call(llm) -> str:
+    """Simula a chamada ao modelo (o callback da instância desconta a quota)."""
+    llm_service_module.provider_rate_limiter.record_request(LLMService.get_provider_id(llm))
+    return llm
+
+
+class TestQuotaAwareRouting:
+    """Test suite for LLMService provider choice under quotas."""
+
+    def test_fails_over_before_quota_trips(self, llm_service):
+        picks = [_call(LLMService.get_llm()) for _ in range(4)]
+        assert picks == ["llm-google", "llm-google", "llm-openai", "llm-openai"]
+        # O provedor nunca foi marcado como rate limited: só ficou sem tokens
+        assert LLMService._providers["google"].is_available()
+
+    def test_getting_llm_without_calling_it_spends_nothing(self, llm_service):
+        picks = [LLMService.get_llm() for _ in range(5)]
+        assert picks == ["llm-google"] * 5
+        assert llm_service.get_stats("google")["rpm_available"] == 2
+
+    def test_least_used_prefers_most_remaining_quota(self, llm_service, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_ROTATION_STRATEGY", "least_used")
+        assert _call(LLMService.get_llm()) == "llm-google"  # empate: prioridade
+        # google gastou 1/2 do rpm, openai 0/10
+        assert LLMService.get_llm() == "llm-openai"
+
+    def test_old_usage_days_are_pruned(self, llm_service):
+        old_day = (date.today() - timedelta(days=45)).isoformat()
+        LLMService._usage_tracking["google"] = {old_day: 7}
+
+        LLMService.get_llm()
+
+        assert list(LLMService._usage_tracking["google"]) == [date.today().isoformat()]
+        assert LLMService.get_usage_stats("google") == {"daily": 1, "monthly": 1}
+
+
+def test_each_model_call_spends_quota(monkeypatch):
+    limiter = ProviderRateLimiter({"local_fake": (10, 0)}, clock=FakeClock())
+    monkeypatch.setattr("src.services.llm_service.provider_rate_limiter", limiter)
+    monkeypatch.setattr(settings, "LLM_FAKE_LATENCY_MS", 0)
+    monkeypatch.setattr(settings, "LLM_FAKE_JITTER_MS", 0)
+    monkeypatch.setattr(settings, "LLM_FAKE_ERROR_RATE", 0.0)
+    provider = LLMProvider(provider_id="local_fake", provider_type=ProviderType.LOCAL_FAKE, priority=1)
+
+    llm = LLMService._create_llm_instance(provider)
+    assert limiter.get_stats("local_fake")["rpm_available"] == 10
+
+    llm.invoke("Quantos leitos existem?")
+    llm.invoke("Qual a taxa de ocupação?")
+    assert limiter.get_stats("local_fake")["rpm_available"] == 8
+
+
+def test_completion_cache_hits_spend_nothing(monkeypatch, tmp_path):
+    pytest.importorskip("langchain_core")
+    from src.services.completion_cache import CompletionCache
+
+    limiter = ProviderRateLimiter({"local_fake": (10, 0)}, clock=FakeClock())
+    monkeypatch.setattr("src.services.llm_service.provider_rate_limiter", limiter)
+    monkeypatch.setattr(settings, "LLM_FAKE_LATENCY_MS", 0)
+    monkeypatch.setattr(settings, "LLM_FAKE_JITTER_MS", 0)
+    monkeypatch.setattr(settings, "LLM_FAKE_ERROR_RATE", 0.0)
+    provider = LLMProvider(provider_id="local_fake", provider_type=ProviderType.LOCAL_FAKE, priority=1)
+    llm = LLMService._create_llm_instance(provider)
+
+    llm.cache = CompletionCache(str(tmp_path), max_bytes=0, mode="record")
+    for _ in range(3):
+        llm.invoke("Quantos leitos existem?")
+    assert llm.calls == 1
+    assert limiter.get_stats("local_fake")["rpm_available"] == 9
+
+    # Replay: hit não gasta; miss (CompletionCacheMiss) também não chegou ao provedor
+    llm.cache = CompletionCache(str(tmp_path), max_bytes=0, mode="replay")
+    llm.invoke("Quantos leitos existem?")
+    with pytest.raises(LookupError):
+        llm.invoke("Qual a taxa de ocupação?")
+    assert limiter.get_stats("local_fake")["rpm_available"] == 9
@@ -0,0 +1,310 @@
+"""Unit tests for the shared (Redis) response cache, using the InMemoryRedis stand-in."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from src.config import settings
+from src.domain.cache_entry import CacheEntry
+from src.services import redis_cache_store
+from src.services.cache_service import CacheService
+from src.services.cache_store import SQLiteCacheStore
+from src.services.redis_cache_store import InMemoryRedis, RedisCacheStore
+
+
+def _entry(i: int) -> CacheEntry:
+    return CacheEntry(
+        question=f"Pergunta {i}",
+        sql=f"SELECT {i} FROM leitos",
+        response_template="Resposta {count}",
+    )
+
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    """Cria "workers" (CacheService) que compartilham o mesmo Redis em memória."""
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "REDIS_URL", f"memory://{uuid4().hex}")
+    workers = []
+
+    def worker() -> CacheService:
+        service = CacheService(str(tmp_path / "response_cache.db"))
+        workers.append(service)
+        return service
+
+    yield worker
+    for service in workers:
+        service.store.close()
+
+
+class TestSharedCache:
+    """Test suite for CacheService over RedisCacheStore."""
+
+    def test_entries_propagate_between_workers(self, shared_cache):
+        first, second = shared_cache(), shared_cache()
+        assert isinstance(first.store, RedisCacheStore)
+
+        entry = _entry(1)
+        first.add_entry(entry)
+        assert second.get_entry(entry.entry_id).question == "Pergunta 1"
+
+        second.delete_entry(entry.entry_id)
+        assert first.get_entry(entry.entry_id) is None
+        assert shared_cache().get_all_entries() == []
+
+    def test_usage_from_all_workers_is_kept(self, shared_cache):
+        first, second = shared_cache(), shared_cache()
+        entry = _entry(1)
+        first.add_entry(entry)
+
+        for _ in range(3):
+            first.increment_usage(entry.entry_id)
+        for _ in range(2):
+            second.increment_usage(entry.entry_id)
+        first.flush_usage()
+        # Notificação de uso: o índice do outro worker soma os próprios usos pendentes
+        assert second.get_entry(entry.entry_id).usage_count == 5
+        second.flush_usage()
+
+        assert first.get_entry(entry.entry_id).usage_count == 5
+        assert shared_cache().get_entry(entry.entry_id).usage_count == 5
+
+    def test_update_keeps_usage_from_other_workers(self, shared_cache):
+        first, second = shared_cache(), shared_cache()
+        entry = _entry(1)
+        first.add_entry(entry)
+        for _ in range(2):
+            second.increment_usage(entry.entry_id)
+        second.flush_usage()
+
+        first.increment_usage(entry.entry_id)
+        stale = first.get_entry(entry.entry_id).model_copy(update={"usage_count": 0, "response_template": "Nova {count}"})
+        first.update_entry(stale)
+        first.flush_usage()
+
+        stored = shared_cache().get_entry(entry.entry_id)
+        assert stored.response_template == "Nova {count}"
+        assert stored.usage_count == 3
+
+    def test_restore_reloads_every_worker(self, shared_cache):
+        first, second = shared_cache(), shared_cache()
+        kept = _entry(1)
+        first.add_entry(kept)
+        first.create_backup()
+        first.add_entry(_entry(2))
+        assert len(second.get_all_entries()) == 2
+
+        first.restore_backup()
+        assert [e.entry_id for e in second.get_all_entries()] == [kept.entry_id]
+
+    def test_imports_local_cache_once(self, shared_cache, tmp_path):
+        local = SQLiteCacheStore(tmp_path / "response_cache.db")
+        local.upsert(_entry(1).model_dump(mode="json"))
+        local.close()
+
+        first = shared_cache()
+        assert len(first.get_all_entries()) == 1
+        first.delete_entry(first.get_all_entries()[0].entry_id)
+        # Já importado: um novo worker não traz a entrada de volta
+        assert shared_cache().get_all_entries() == []
+
+    def test_failed_import_is_retried(self, tmp_path, monkeypatch):
+        local = SQLiteCacheStore(tmp_path / "response_cache.db")
+        local.upsert(_entry(1).model_dump(mode="json"))
+        local.close()
+        store = RedisCacheStore(InMemoryRedis(), prefix="cache")
+
+        def fail(path):
+            raise OSError("disco indisponível")
+
+        monkeypatch.setattr(redis_cache_store, "read_sqlite_entries", fail)
+        with pytest.raises(OSError):
+            store.import_once(tmp_path / "response_cache.db")
+        monkeypatch.undo()
+
+        # A falha não marcou a importação nem deixou a trava presa
+        assert store.import_once(tmp_path / "response_cache.db") == 1
+        assert store.import_once(tmp_path / "response_cache.db") == 0
+
+    def test_import_lock_expires(self, tmp_path):
+        client = InMemoryRedis()
+        store = RedisCacheStore(client, prefix="cache")
+        # Trava de um worker que caiu no meio da importação
+        client.set("cache:import_lock", "outro", nx=True, ex=0.05)
+        assert store.import_once(legacy_json=tmp_path / "ausente.json") == 0
+        assert client.get("cache:imported") is None
+
+        time.sleep(0.06)
+        store.import_once(legacy_json=tmp_path / "ausente.json")
+        assert client.get("cache:imported") == "1"
+
+    def test_usage_for_deleted_entry_leaves_nothing_behind(self):
+        client = InMemoryRedis()
+        store = RedisCacheStore(client, prefix="cache")
+        kept, deleted = _entry(1).model_dump(mode="json"), _entry(2).model_dump(mode="json")
+        store.upsert_many([kept, deleted])
+
+        # Outro worker removeu a entrada antes de este gravar o uso pendente
+        store.delete(deleted["entry_id"])
+        store.add_usage({kept["entry_id"]: (2, "2026-01-01T00:00:00"), deleted["entry_id"]: (1, "2026-01-01T00:00:00")})
+
+        assert client.hgetall("cache:usage") == {kept["entry_id"]: "2"}
+        assert list(client.hgetall("cache:last_used")) == [kept["entry_id"]]
+
+
+class _ThreadedPubSub:
+    """Como ``redis.client.PubSub``: mensagens enfileiradas e entregues por uma thread própria."""
+
+    def __init__(self, server: InMemoryRedis):
+        self._server = server
+        self._queue: queue.Queue = queue.Queue()
+        self._handlers: dict = {}
+        # Simula a conexão caindo: a próxima mensagem se perde e get_message falha
+        self.fail_next = False
+
+    def subscribe(self, **channels) -> None:
+        for channel, handler in channels.items():
+            self._handlers[channel] = handler
+            self._server._channels.setdefault(channel, []).append(self._queue.put)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        try:
+            message = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if self.fail_next:
+            self.fail_next = False
+            raise ConnectionError("Connection closed by server.")
+        self._handlers[message["channel"]](message)
+        return None
+
+    def run_in_thread(self, sleep_time: float = 0.0, daemon: bool = False, exception_handler=None):
+        return _PubSubWorker(self, sleep_time, daemon, exception_handler)
+
+    def close(self) -> None:
+        for channel in self._handlers:
+            self._server._channels.get(channel, []).remove(self._queue.put)
+        self._handlers = {}
+
+
+class _PubSubWorker(threading.Thread):
+    """Mesmo laço de ``redis.client.PubSubWorkerThread``."""
+
+    def __init__(self, pubsub, sleep_time, daemon, exception_handler):
+        super().__init__(daemon=daemon)
+        self.pubsub = pubsub
+        self.sleep_time = sleep_time
+        self.exception_handler = exception_handler
+        self._running = threading.Event()
+        self.start()
+
+    def run(self) -> None:
+        self._running.set()
+        while self._running.is_set():
+            try:
+                self.pubsub.get_message(ignore_subscribe_messages=True, timeout=self.sleep_time)
+            except BaseException as e:
+                if self.exception_handler is None:
+                    raise
+                self.exception_handler(e, self.pubsub, self)
+        self.pubsub.close()
+
+    def stop(self) -> None:
+        self._running.clear()
+
+
+class _ThreadedRedis(InMemoryRedis):
+    @classmethod
+    def from_url(cls, url: str, decode_responses: bool = False) -> "_ThreadedRedis":
+        assert decode_responses
+        return super().from_url(url)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> _ThreadedPubSub:
+        return _ThreadedPubSub(self)
+
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def threaded_cache(tmp_path, monkeypatch):
+    """Workers que passam pelo cliente ``redis`` (com pub/sub em thread), não pelo ``memory://``."""
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "REDIS_URL", f"redis://test-{uuid4().hex}:6379/0")
+    monkeypatch.setattr(redis_cache_store, "redis", SimpleNamespace(Redis=_ThreadedRedis))
+    workers = []
+
+    def worker() -> CacheService:
+        service = CacheService(str(tmp_path / "response_cache.db"))
+        workers.append(service)
+        return service
+
+    yield worker
+    for service in workers:
+        service.store.close()
+
+
+def test_changes_arrive_through_subscriber_thread(threaded_cache):
+    first, second = threaded_cache(), threaded_cache()
+    assert isinstance(first.store.client, _ThreadedRedis)
+
+    entry = _entry(1)
+    first.add_entry(entry)
+    assert _wait_for(lambda: second.get_entry(entry.entry_id) is not None)
+
+    first.increment_usage(entry.entry_id)
+    first.flush_usage()
+    assert _wait_for(lambda: second.get_entry(entry.entry_id).usage_count == 1)
+
+    first.delete_entry(entry.entry_id)
+    assert _wait_for(lambda: second.get_entry(entry.entry_id) is None)
+
+
+def test_resubscribes_and_resyncs_after_connection_error(threaded_cache):
+    first, second = threaded_cache(), threaded_cache()
+    seen = _entry(1)
+    first.add_entry(seen)
+    assert _wait_for(lambda: second.get_entry(seen.entry_id) is not None)
+    second.increment_usage(seen.entry_id)
+
+    second.store._subscriber.pubsub.fail_next = True
+    lost = _entry(2)
+    first.add_entry(lost)
+
+    # A notificação se perdeu com a conexão; a ressincronização traz a entrada
+    assert _wait_for(lambda: second.get_entry(lost.entry_id) is not None, timeout=5.0)
+    # Uso ainda não gravado deste worker sobrevive à recarga
+    assert second.get_entry(seen.entry_id).usage_count == 1
+
+    third = _entry(3)
+    first.add_entry(third)
+    assert _wait_for(lambda: second.get_entry(third.entry_id) is not None)
+
+
+def test_requires_redis_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://localhost:6379/0")
+    monkeypatch.setattr(redis_cache_store, "redis", None)
+
+    with pytest.raises(RuntimeError, match="pacote redis"):
+        CacheService(str(tmp_path / "response_cache.db"))
+
+
+def test_requires_redis_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "REDIS_URL", None)
+
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        CacheService(str(tmp_path / "response_cache.db"))
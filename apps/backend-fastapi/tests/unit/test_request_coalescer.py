@@ -0,0 +1,124 @@
+"""Unit tests for single-flight coalescing in src.services.request_coalescer."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.services.request_coalescer import SingleFlight, chat_coalescing_key, normalize_prompt
+
+
+class TestCoalescingKey:
+    """Test suite for prompt normalization."""
+
+    def test_accents_case_and_spaces_are_ignored(self):
+        assert normalize_prompt("  Taxa de  ocupação da UTI Pediátrica ") == "taxa de ocupacao da uti pediatrica"
+
+    def test_schema_version_is_part_of_key(self):
+        prompt = "taxa de ocupação da UTI pediátrica"
+        assert chat_coalescing_key(prompt, "abc") == chat_coalescing_key(prompt.upper(), "abc")
+        assert chat_coalescing_key(prompt, "abc") != chat_coalescing_key(prompt, "def")
+
+
+@pytest.mark.asyncio
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    async def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"rows": calls}
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(10)))
+
+        assert calls == 1
+        assert all(r is results[0] for r in results)
+        stats = flight.get_stats()
+        assert stats["leaders"] == 1
+        assert stats["collapsed"] == 9
+        assert stats["in_flight"] == 0
+
+        # Concluída a chamada, a próxima requisição dispara uma nova
+        await flight.do("k", work)
+        assert calls == 2
+
+    async def test_errors_are_shared(self):
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("quota")
+
+        results = await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_cancelled_subscriber_does_not_cancel_others(self):
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(flight.do("k", work))
+        await started.wait()
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "ok"
+        assert flight.get_stats()["abandoned"] == 0
+
+    async def test_last_subscriber_leaving_cancels_call(self):
+        flight = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        stats = flight.get_stats()
+        assert stats["abandoned"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_followers_receive_progress_published_before_and_after_joining(self):
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            flight.publish("k", "tables_listed")
+            await release.wait()
+            flight.publish("k", "executing")
+            return "ok"
+
+        leader_steps, follower_steps = [], []
+        leader = asyncio.create_task(flight.do("k", work, on_progress=leader_steps.append))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work, on_progress=follower_steps.append))
+        await asyncio.sleep(0)
+        # Chegou depois do primeiro passo: recebe-o ao se juntar
+        assert follower_steps == ["tables_listed"]
+
+        release.set()
+        assert await asyncio.gather(leader, follower) == ["ok", "ok"]
+        assert leader_steps == follower_steps == ["tables_listed", "executing"]
@@ -0,0 +1,82 @@
+"""Unit tests for SchemaContextBuilder (relevance-pruned schema context)."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from src.agents.sql_agent import CUSTOM_TABLE_INFO, INCLUDE_TABLES
+from src.domain.schema_info import ColumnInfo, SchemaInfo, TableInfo
+from src.observability.metrics import LLMMetrics
+from src.services.schema_context_builder import SchemaContextBuilder, estimate_tokens
+
+
+def _build(question: str, **kwargs):
+    return SchemaContextBuilder.build(question, INCLUDE_TABLES, descriptions=CUSTOM_TABLE_INFO, **kwargs)
+
+
+def _wide_schema(table_count: int) -> SchemaInfo:
+    """Schema "grande": as tabelas do chat + ``table_count`` tabelas administrativas."""
+    tables = [
+        TableInfo(
+            name=f"registro_{i:03d}",
+            columns=[ColumnInfo(name=f"campo_{j}", type="varchar", nullable=True) for j in range(12)],
+        )
+        for i in range(table_count)
+    ]
+    tables.append(
+        TableInfo(
+            name="cirurgias",
+            columns=[
+                ColumnInfo(name="cirurgia_id", type="integer", nullable=False),
+                ColumnInfo(name="sala", type="varchar", nullable=True),
+                ColumnInfo(name="duracao_minutos", type="integer", nullable=True),
+            ],
+        )
+    )
+    return SchemaInfo(tables=tables, last_updated=datetime.utcnow())
+
+
+class TestSchemaContextBuilder:
+    """Test suite for SchemaContextBuilder."""
+
+    def test_selects_only_relevant_tables(self):
+        assert _build("Qual a taxa de ocupação da UTI pediátrica?").tables == ["leitos"]
+        assert _build("Qual o total faturado?").tables == ["atendimentos"]
+
+    def test_without_relevant_tables_keeps_all(self):
+        context = _build("Me dá um resumo")
+        assert context.tables == INCLUDE_TABLES
+        full = sum(estimate_tokens(f"- {name}:{CUSTOM_TABLE_INFO[name].rstrip()}") for name in INCLUDE_TABLES)
+        assert context.tokens == full
+
+    def test_budget_compacts_then_drops_tables(self):
+        context = _build("Me dá um resumo", max_tokens=120)
+        assert context.tokens <= 120
+        assert context.truncated
+        # Compactada: só nomes de colunas, sem a descrição
+        assert "leitos: leito_id, setor, numero, status, tipo" in context.text
+
+    def test_context_does_not_grow_with_schema(self):
+        question = "Qual a duração das cirurgias por sala?"
+        names = lambda schema: [t.name for t in schema.tables]
+
+        small = _wide_schema(5)
+        large = _wide_schema(200)
+        small_context = SchemaContextBuilder.build(question, names(small), schema=small)
+        large_context = SchemaContextBuilder.build(question, names(large), schema=large)
+
+        assert large_context.tables == ["cirurgias"]
+        assert large_context.tokens == small_context.tokens
+        # Colunas citadas na pergunta vêm antes das chaves
+        assert large_context.text == "- cirurgias: sala varchar, duracao_minutos integer, cirurgia_id integer"
+
+
+def test_token_usage_metrics():
+    metrics = LLMMetrics()
+    metrics.record_token_usage("google", 300, 40)
+    metrics.record_token_usage("google", 100, 20)
+
+    stats = metrics.get_all_stats()["google"]
+    assert stats["avg_prompt_tokens"] == 200
+    assert stats["prompt_tokens_total"] == 400
+    assert stats["completion_tokens_total"] == 60
@@ -28,6 +28,7 @@ export default function ChatStream({ sessionId }: ChatStreamProps) {
   const [loading, setLoading] = useState(false)
   const [currentSessionId, setCurrentSessionId] = useState<string | null>(sessionId)
   const [summary, setSummary] = useState<SummaryData | null>(null)
+  const [progress, setProgress] = useState<string | null>(null)
 
   useEffect(() => {
     // Criar sessão ao montar componente
@@ -63,6 +64,7 @@ export default function ChatStream({ sessionId }: ChatStreamProps) {
     setSqlExecuted(null)
     setDocuments([])
     setSummary(null)
+    setProgress(null)
     
     try {
       // Usa rota de API do Next.js que faz proxy para backend
@@ -74,6 +76,7 @@ export default function ChatStream({ sessionId }: ChatStreamProps) {
         if (e.data === '[DONE]') {
           eventSource.close()
           setLoading(false)
+          setProgress(null)
           return
         }
 
@@ -161,6 +164,18 @@ export default function ChatStream({ sessionId }: ChatStreamProps) {
         })
       }
 
+      // Passos do agente (eventos SSE "progress"): feedback enquanto o SQL é gerado
+      eventSource.addEventListener('progress', (e) => {
+        const step = JSON.parse((e as MessageEvent).data)
+        if (step.step === 'tables_listed') {
+          setProgress(`Tabelas disponíveis: ${step.tables.join(', ')}`)
+        } else if (step.step === 'schema_inspected') {
+          setProgress(`Consultando a estrutura de ${step.tables.join(', ')}...`)
+        } else if (step.step === 'sql_drafted') {
+          setProgress('SQL gerado, validando...')
+        }
+      })
+
       eventSource.onerror = () => {
         eventSource.close()
         setLoading(false)
@@ -202,6 +217,12 @@ export default function ChatStream({ sessionId }: ChatStreamProps) {
         </button>
       </div>
       
+      {loading && progress && !response && !summary && (
+        <p data-testid="chat-progress" className="text-xs sm:text-sm text-gray-500">
+          {progress}
+        </p>
+      )}
+
       {(response || summary) && (
         <div className="space-y-4">
           {summary && summary.tipo === 'uti_ocupacao' && (